@@ -53,6 +53,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.s7_tag_handler.data_received.connect(self.data_logger.log)
         self.s7_tag_handler.data_received.connect(self.gateway_handler.process_data)
         self.s7_tag_handler.data_received.connect(self.dashboard_handler.update_value)
+        self.modbus_handler.data_received.connect(self.data_logger.log)
+        self.modbus_handler.data_received.connect(self.gateway_handler.process_data)
+        self.modbus_handler.data_received.connect(self.dashboard_handler.update_value)
+        self.mqtt_handler.data_received.connect(self.data_logger.log)
+        self.mqtt_handler.data_received.connect(self.gateway_handler.process_data)
+        self.mqtt_handler.data_received.connect(self.dashboard_handler.update_value)
+        # Forwarding to MQTT (not MQTT's own samples, which would loop back to the broker)
+        self.s7_tag_handler.data_received.connect(self.mqtt_handler.forward_sample)
+        self.modbus_handler.data_received.connect(self.mqtt_handler.forward_sample)
         
         # Add other handlers here when they support data_received
 
@@ -1,65 +1,766 @@
-from PyQt6.QtCore import QThread, pyqtSignal
-from pymodbus.client import ModbusTcpClient, ModbusSerialClient
-from PyQt6.QtWidgets import QTableWidgetItem
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, QThread, QTimer, pyqtSignal
+from pymodbus.client import AsyncModbusTcpClient, ModbusTcpClient, ModbusSerialClient
+from pymodbus.pdu import ExceptionResponse
+from PyQt6.QtWidgets import (QTableWidgetItem, QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QTableView, QTableWidget, QHeaderView, QLabel, QSpinBox, QComboBox, QStyledItemDelegate)
 from protocols.base_handler import ProtocolHandlerBase
+from protocols.modbus_planner import (ADDRESS_OFFSETS, BYTE_ORDERS, MODBUS_TYPES, RTU_REQUEST_BYTES, ModbusPollPlan,
+                                      ScanSchedule, SlaveTiming, parse_host, rtu_char_time, rtu_frame_gap,
+                                      rtu_response_bytes)
+from collections import deque
+import asyncio
+import threading
 import time
 
+READ_FUNCTIONS = {
+    1: "read_coils",
+    2: "read_discrete_inputs",
+    3: "read_holding_registers",
+    4: "read_input_registers",
+}
+
+
+def read_values(client, func, address, count, slave):
+    """Runs one read request; returns the registers or bits, raises on a Modbus error."""
+    rr = getattr(client, READ_FUNCTIONS[func])(address, count, slave=slave)
+    if rr.isError():
+        raise IOError(str(rr))
+    return rr.registers if func in (3, 4) else rr.bits[:count]
+
+
 class ModbusWorker(QThread):
-    data_ready = pyqtSignal(list)
+    """Polls a single range on one client.
+
+    Cycles start on the absolute deadlines of a ScanSchedule, so latency does
+    not stretch the period. Poll groups are read by ModbusBusWorker (RTU) and
+    ModbusAsyncEngine (TCP).
+    """
+    data_ready = pyqtSignal(object)
     error_occurred = pyqtSignal(str)
+    stats_ready = pyqtSignal(object)  # [((host, period ms), ScanSchedule snapshot)], about once a second
 
     def __init__(self, client, params):
         super().__init__()
         self.client = client
         self.params = params
         self.running = False
+        self._stop_event = threading.Event()
 
     def run(self):
         self.running = True
+        schedule = ScanSchedule(self.params["interval"] / 1000, time.monotonic())
+        next_stats = schedule.deadline + 1.0
+
         while self.running:
+            delay = schedule.deadline - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            schedule.start(time.monotonic())
             try:
-                if self.params["func"] == 3:  # Holding registers
-                    rr = self.client.read_holding_registers(
-                        self.params["address"],
-                        self.params["count"],
-                        slave=self.params["slave"]
-                    )
-                elif self.params["func"] == 1:  # Coils
-                    rr = self.client.read_coils(
-                        self.params["address"],
-                        self.params["count"],
-                        slave=self.params["slave"]
-                    )
-                if rr.isError():
-                    self.error_occurred.emit(str(rr))
-                else:
-                    self.data_ready.emit(rr.registers if hasattr(rr, 'registers') else rr.bits)
+                self.data_ready.emit(read_values(
+                    self.client, self.params["func"], self.params["address"],
+                    self.params["count"], self.params["slave"]))
             except Exception as e:
                 self.error_occurred.emit(str(e))
-            time.sleep(self.params["interval"] / 1000)
+            now = time.monotonic()
+            schedule.finish(now)
+            if now >= next_stats:
+                self.stats_ready.emit([(("", self.params["interval"]), schedule.snapshot())])
+                next_stats = now + 1.0
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+
+
+class _BusCycle:
+    """One scan group of the bus and the results of its running cycle."""
+
+    def __init__(self, plan, schedule):
+        self.plan = plan
+        self.schedule = schedule
+        self.pending = 0  # requests of the running cycle still queued; 0 when idle
+        self.results = []
+
+
+class ModbusBusWorker(QThread):
+    """Polls the scan groups of a poll group over one RTU multi-drop bus.
+
+    Requests of the due cycles are queued per slave and the slaves are served
+    round robin, so a slave with many or slow requests cannot hold up the rest
+    of the bus. Frames are separated by the 3.5 character silent interval, each
+    request waits its slave's adaptive timeout (SlaveTiming), and a slave that
+    does not answer is backed off instead of costing a timeout every cycle.
+    Bus utilization is the share of time a transaction occupied the line.
+    """
+    data_ready = pyqtSignal(object)   # (plan, results) per scan group cycle
+    error_occurred = pyqtSignal(str)
+    stats_ready = pyqtSignal(object)  # [((host, period ms), ScanSchedule snapshot)], about once a second
+    bus_stats = pyqtSignal(object)    # (utilization, share lost to timeouts, SlaveTiming snapshots)
+
+    def __init__(self, client, plans, baudrate, timeout):
+        super().__init__()
+        self.client = client
+        self.plans = plans
+        self.char_time = rtu_char_time(baudrate)
+        self.gap = rtu_frame_gap(baudrate)
+        self.slaves = {}
+        for plan in plans.values():
+            for request in plan.requests:
+                if request.slave not in self.slaves:
+                    self.slaves[request.slave] = SlaveTiming(request.slave, timeout)
+        self.running = False
+        self._stop_event = threading.Event()
+        self._bus_free_at = 0.0
+        self._busy = 0.0
+        self._lost = 0.0
+
+    def run(self):
+        self.running = True
+        timeout = self.client.comm_params.timeout_connect
+        try:
+            self._serve()
+        finally:
+            # The client is shared with the single-range ModbusWorker, which expects its own timeout back
+            self._set_timeout(timeout)
+
+    def _serve(self):
+        now = time.monotonic()
+        cycles = [_BusCycle(plan, ScanSchedule(plan.period / 1000, now)) for plan in self.plans.values()]
+        queues = {slave: deque() for slave in self.slaves}  # slave -> (cycle, request)
+        ring = deque()  # slaves with queued requests, in serving order
+        window = now
+        next_stats = now + 1.0
+
+        while self.running and cycles:
+            now = time.monotonic()
+            for cycle in cycles:
+                if not cycle.pending and now >= cycle.schedule.deadline:
+                    self._start(cycle, now, queues, ring)
+
+            if ring:
+                slave = ring.popleft()
+                cycle, request = queues[slave].popleft()
+                if queues[slave]:
+                    ring.append(slave)
+                timing = self.slaves[slave]
+                values = None if timing.skipped(now) else self._transact(timing, request, cycle.plan.period / 1000)
+                self._complete(cycle, request, values)
+            else:
+                wake = min(min(cycle.schedule.deadline for cycle in cycles), next_stats)
+                if self._stop_event.wait(max(0.0, wake - time.monotonic())):
+                    break
+
+            now = time.monotonic()
+            if now >= next_stats:
+                elapsed = now - window
+                self.stats_ready.emit([(cycle.plan.key, cycle.schedule.snapshot()) for cycle in cycles])
+                self.bus_stats.emit((self._busy / elapsed, self._lost / elapsed,
+                                     [timing.snapshot() for _, timing in sorted(self.slaves.items())]))
+                window, self._busy, self._lost = now, 0.0, 0.0
+                next_stats = now + 1.0
+
+    def _start(self, cycle, now, queues, ring):
+        cycle.schedule.start(now)
+        cycle.results = []
+        cycle.pending = len(cycle.plan.requests)
+        if not cycle.pending:
+            self._finish(cycle)
+        for request in cycle.plan.requests:
+            if not queues[request.slave]:
+                ring.append(request.slave)
+            queues[request.slave].append((cycle, request))
+
+    def _complete(self, cycle, request, values):
+        cycle.results.extend(cycle.plan.split(request, values))
+        cycle.pending -= 1
+        if not cycle.pending:
+            self._finish(cycle)
+
+    def _finish(self, cycle):
+        self.data_ready.emit((cycle.plan, cycle.results))
+        cycle.schedule.finish(time.monotonic())
+
+    def _transact(self, timing, request, period):
+        """Runs one request within the slave's adaptive timeout; returns None if it failed."""
+        wire = (RTU_REQUEST_BYTES + rtu_response_bytes(request.func, request.count)) * self.char_time
+        if self.client.socket is None:
+            # pymodbus closes the port when a request gets no response; reopen it here so the
+            # reopen is not timed as part of this slave's turnaround
+            start = time.monotonic()
+            self.client.connect()
+            self._lost += time.monotonic() - start
+        self._set_timeout(timing.timeout(wire))
+        delay = self._bus_free_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)  # Silent interval after the previous frame
+
+        start = time.monotonic()
+        try:
+            rr = getattr(self.client, READ_FUNCTIONS[request.func])(request.address, request.count,
+                                                                   slave=request.slave)
+        except Exception as e:
+            rr = e
+        end = time.monotonic()
+        self._bus_free_at = end + self.gap
+        self._busy += end - start
+
+        if isinstance(rr, Exception) or (rr.isError() and not isinstance(rr, ExceptionResponse)):
+            self._lost += end - start
+            if timing.missed(end, period):
+                self.error_occurred.emit(f"Slave {request.slave}: yanıt yok, atlanıyor ({rr})")
+            return None
+        if timing.answered(end - start - wire):
+            self.error_occurred.emit(f"Slave {request.slave}: yeniden yanıt veriyor")
+        if rr.isError():
+            self.error_occurred.emit(f"Slave {request.slave} {request}: {rr}")
+            return None
+        return rr.registers if request.func in (3, 4) else rr.bits[:request.count]
+
+    def _set_timeout(self, timeout):
+        self.client.comm_params.timeout_connect = timeout
+        if isinstance(self.client, ModbusSerialClient) and self.client.socket is not None:
+            self.client.socket.timeout = timeout
 
     def stop(self):
         self.running = False
+        self._stop_event.set()
+
+
+class _PipelineRefused(IOError):
+    """A live host failed a request while more than one was outstanding on its connection."""
+
+
+class _HostState:
+    """Connections and failure backoff of one host polled by ModbusAsyncEngine."""
+
+    def __init__(self, address, connections, depth=1):
+        self.address = address  # (ip, port)
+        self.label = f"{address[0]}:{address[1]}"
+        self.clients = [None] * connections
+        # One token per request a client may have outstanding; a request holds a token of its client
+        self.depth = depth
+        self.tokens = [depth] * connections
+        self.outstanding = [0] * connections  # requests sent on each client and not yet answered
+        self.connecting = [None] * connections  # connect task of each client, shared by the waiting requests
+        self.slots = asyncio.Queue()
+        for _ in range(depth):
+            for slot in range(connections):
+                self.slots.put_nowait(slot)
+        self.down = False  # the last cycle failed; errors are only reported on the transition
+        self.retry_at = 0.0
+        self.backoff = 0.0
+
+    def release(self, slot):
+        if self.tokens[slot] > self.depth:
+            self.tokens[slot] -= 1  # Pipelining was turned off, retire the token
+        else:
+            self.slots.put_nowait(slot)
+
+
+class ModbusAsyncEngine(QThread):
+    """Polls the poll group plans of many Modbus TCP hosts on one asyncio loop.
+
+    Every plan is a scan group that runs on its own ScanSchedule, so groups of
+    different rates keep their cadence independently. Every host gets up to
+    ``connections`` clients shared by its groups, and each client carries one
+    request at a time (unless pipelining), which is the per-host concurrency limit. Every request
+    and connect is bounded by ``timeout``, so a slow host delays only its own
+    groups. Unreachable hosts are retried with a backoff of up to 30 s.
+
+    With a ``pipeline`` depth above 1 a client keeps that many requests in
+    flight; the responses are matched to their requests by the MBAP transaction
+    id. A connected host that does not answer a request while others are
+    outstanding on the same client, or answers "Slave Device Busy", falls back
+    to one request per client for the rest of the session instead of being
+    treated as down. Connect errors always count as the host being down.
+    """
+    data_ready = pyqtSignal(object)   # (plan, results) per scan group cycle
+    stats_ready = pyqtSignal(object)  # [((host, period ms), ScanSchedule snapshot)], about once a second
+    error_occurred = pyqtSignal(str)
+
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, hosts, timeout=1.0, connections=1, pipeline=1, parent=None):
+        super().__init__(parent)
+        self.hosts = hosts  # [((ip, port), ModbusPollPlan)]
+        self.timeout = timeout
+        self.connections = max(1, connections)
+        self.pipeline = max(1, pipeline)
+        self.running = True
+        self._loop = None
+        self._wakeup = None
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        states = {}
+        groups = []
+        now = time.monotonic()
+        for address, plan in self.hosts:
+            if address not in states:
+                states[address] = _HostState(address, self.connections, self.pipeline)
+            groups.append((states[address], plan, ScanSchedule(plan.period / 1000, now)))
+
+        tasks = [asyncio.create_task(self._run_group(*group)) for group in groups]
+        try:
+            while not await self._sleep(1.0):
+                self.stats_ready.emit([(plan.key, schedule.snapshot()) for _, plan, schedule in groups])
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for state in states.values():
+                for client in state.clients:
+                    if client is not None:
+                        client.close()
+
+    async def _sleep(self, delay):
+        """Waits for ``delay`` seconds; returns True once the engine is stopped."""
+        if self.running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        return not self.running
+
+    async def _run_group(self, state, plan, schedule):
+        while True:
+            delay = schedule.deadline - time.monotonic()
+            if await self._sleep(max(0.0, delay)):
+                return
+            schedule.start(time.monotonic())
+            await self._poll(state, plan)
+            schedule.finish(time.monotonic())
+
+    async def _poll(self, state, plan):
+        if time.monotonic() < state.retry_at:
+            return
+        failed = False
+        fell_back = False
+        results = []
+
+        async def run_request(request):
+            nonlocal failed, fell_back
+            slot = await state.slots.get()
+            try:
+                values = None if failed else await self._read(state, slot, request)
+            except _PipelineRefused as e:
+                if state.depth > 1:  # Requests already in flight may be refused too; reported once
+                    state.depth = 1
+                    self.error_occurred.emit(
+                        f"{state.label}: pipelining desteklenmiyor ({e}), tek istek moduna geçildi")
+                fell_back = failed = True
+                values = None
+            except Exception as e:
+                # Timeouts and connection errors: skip the rest of the host's requests this cycle
+                if not failed and not state.down:
+                    self.error_occurred.emit(f"{state.label}: {str(e) or type(e).__name__}")
+                failed = True
+                values = None
+            finally:
+                state.release(slot)
+            results.extend(plan.split(request, values))
+
+        await asyncio.gather(*(run_request(request) for request in plan.requests))
+
+        if fell_back:
+            pass  # The host answers; retried one request at a time on the next cycle
+        elif failed:
+            state.backoff = min(self.MAX_BACKOFF, max(plan.period / 1000, state.backoff * 2))
+            state.retry_at = time.monotonic() + state.backoff
+            state.down = True
+        elif state.down:
+            state.backoff = 0.0
+            state.down = False
+            self.error_occurred.emit(f"{state.label}: bağlantı yeniden kuruldu")
+        self.data_ready.emit((plan, results))
+
+    async def _read(self, state, slot, request):
+        """Runs one request on a client of the host.
+
+        Returns None for a Modbus exception response, raises if the host did
+        not answer (the client is then dropped and reconnected next time).
+        """
+        try:
+            client = state.clients[slot]
+            if client is None or not client.connected:
+                client = await self._connect(state, slot)
+            pipelined = state.depth > 1
+            state.outstanding[slot] += 1
+            try:
+                rr = await asyncio.wait_for(
+                    getattr(client, READ_FUNCTIONS[request.func])(request.address, request.count,
+                                                                  slave=request.slave),
+                    self.timeout)
+            except asyncio.TimeoutError:
+                if pipelined and state.outstanding[slot] > 1:
+                    raise _PipelineRefused("yanıt yok") from None
+                raise
+            finally:
+                state.outstanding[slot] -= 1
+        except Exception:
+            if state.clients[slot] is not None:
+                state.clients[slot].close()
+                state.clients[slot] = None
+            raise
+        if rr.isError():
+            if pipelined and getattr(rr, "exception_code", None) == 6:
+                raise _PipelineRefused("Slave Device Busy")
+            self.error_occurred.emit(f"{state.label} {request}: {rr}")
+            return None
+        return rr.registers if request.func in (3, 4) else rr.bits[:request.count]
+
+    async def _connect(self, state, slot):
+        """Connects the client of ``slot``; requests arriving meanwhile wait for the same connect."""
+        task = state.connecting[slot]
+        if task is None:
+            task = state.connecting[slot] = asyncio.ensure_future(self._open(state, slot))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done() and state.connecting[slot] is task:
+                state.connecting[slot] = None
+
+    async def _open(self, state, slot):
+        client = AsyncModbusTcpClient(state.address[0], port=state.address[1],
+                                      timeout=self.timeout, retries=0, reconnect_delay=0)
+        state.clients[slot] = client
+        await asyncio.wait_for(client.connect(), self.timeout)
+        if not client.connected:
+            raise ConnectionError("bağlantı kurulamadı")
+        return client
+
+    def stop(self):
+        self.running = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+
+class ChoiceDelegate(QStyledItemDelegate):
+    """Sabit seçenekli hücreler için açılır liste düzenleyici."""
+
+    def __init__(self, choices, parent=None):
+        super().__init__(parent)
+        self.choices = choices
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.addItems(self.choices)
+        combo.activated.connect(lambda _: self.commitData.emit(combo))
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data())
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText())
+
+
+class ModbusRegisterModel(QAbstractTableModel):
+    """Register values of the Modbus table.
+
+    Keeps the previous address and value arrays; an update with the same
+    addresses only signals the rows whose value changed. Cell texts are made
+    when the view paints them, so unchanged or scrolled-away rows cost nothing.
+    """
+    HEADERS = ["Adres", "Değer (Dec)", "Değer (Hex)", "Değer (Bin)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.addresses = []
+        self.values = []  # None for a failed read
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.addresses)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if col == 0:
+            return str(self.addresses[row])
+        val = self.values[row]
+        if val is None:
+            return "Err"
+        if col == 1:
+            return str(val)
+        if isinstance(val, float):
+            return "-"
+        return hex(val) if col == 2 else bin(val)
+
+    def update(self, addresses, values):
+        """Replaces the rows with ``addresses`` and their ``values``."""
+        if addresses != self.addresses:
+            self.beginResetModel()
+            self.addresses = addresses
+            self.values = values
+            self.endResetModel()
+            return
+        old, self.values = self.values, values
+        # One dataChanged per run of changed rows
+        first = None
+        for row, (a, b) in enumerate(zip(old, values)):
+            if a != b or type(a) is not type(b):
+                if first is None:
+                    first = row
+            elif first is not None:
+                self.dataChanged.emit(self.index(first, 1), self.index(row - 1, 3))
+                first = None
+        if first is not None:
+            self.dataChanged.emit(self.index(first, 1), self.index(len(values) - 1, 3))
+
+    def clear(self):
+        self.update([], [])
+
 
 class ModbusHandler(ProtocolHandlerBase):
+    GROUP_FIELDS = ["name", "host", "slave", "func", "address", "count", "type", "order", "period"]
+    TABLE_FPS = 20  # Tablo, okuma hızından bağımsız olarak en fazla bu sıklıkta yenilenir
+
     def __init__(self, ui):
         super().__init__(ui)
         self.client = None
         self.worker = None
+        self.engine = None
         self.polling_params = None
+        self.table_rows = {}  # poll group plan key (host, period) -> table rows of its last results
+        self.range_values = []  # last values of the single range
+        self.table_dirty = False
+        self.group_stats = ""
+        self.bus_text = ""
         self._connect_signals()
         self._setup_table()
+        self._setup_poll_group()
+        # Seri port adı elle de girilebilir (/dev/ttyUSB0, socket://127.0.0.1:5020 gibi pyserial URL'leri)
+        self.ui.modbusComCombo.setEditable(True)
 
     def _connect_signals(self):
         self.ui.modbusConnectBtn.clicked.connect(self.toggle_connection)
         self.ui.modbusPollChk.toggled.connect(self.toggle_polling)
 
     def _setup_table(self):
-        """Modbus tablosunu adres sütunuyla birlikte yeniden yapılandırır."""
-        tw = self.ui.modbusTable
-        tw.setColumnCount(4)
-        tw.setHorizontalHeaderLabels(["Adres", "Değer (Dec)", "Değer (Hex)", "Değer (Bin)"])
-        tw.resizeColumnsToContents()
+        """Modbus tablosunu model tabanlı bir görünümle değiştirir; yalnızca değişen hücreler yenilenir."""
+        self.register_model = ModbusRegisterModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.register_model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(24)
+
+        layout = self.ui.modbusLayout
+        index = layout.indexOf(self.ui.modbusTable)
+        layout.removeWidget(self.ui.modbusTable)
+        self.ui.modbusTable.setParent(None)
+        layout.insertWidget(index, self.table)
+
+        # Okuma sonuçları biriktirilir, tablo sabit kare hızında güncellenir
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(1000 // self.TABLE_FPS)
+        self.frame_timer.timeout.connect(self.refresh_table)
+
+    def _setup_poll_group(self):
+        """Okuma grubu: dağınık register/coil etiketleri, birleştirilmiş isteklerle okunur."""
+        group = QGroupBox("Okuma Grubu (boşsa yukarıdaki aralık okunur)")
+        layout = QVBoxLayout(group)
+
+        btn_layout = QHBoxLayout()
+        btn_add = QPushButton("Etiket Ekle")
+        btn_remove = QPushButton("Etiket Sil")
+        self.gap_spin = QSpinBox()
+        self.gap_spin.setRange(0, 2000)
+        self.gap_spin.setValue(8)
+        self.gap_spin.setToolTip("Aynı istekte birleştirilecek etiketler arasındaki en fazla boş adres sayısı")
+        btn_layout.addWidget(btn_add)
+        btn_layout.addWidget(btn_remove)
+        btn_layout.addWidget(QLabel("Maks. Boşluk:"))
+        btn_layout.addWidget(self.gap_spin)
+
+        # TCP: hosts are polled in parallel by the asyncio engine
+        self.conn_spin = QSpinBox()
+        self.conn_spin.setRange(1, 8)
+        self.conn_spin.setValue(1)
+        self.conn_spin.setToolTip("Bir cihaza aynı anda gönderilebilecek en fazla istek (ayrı bağlantılar üzerinden)")
+        self.timeout_spin = QSpinBox()
+        self.timeout_spin.setRange(100, 10000)
+        self.timeout_spin.setValue(1000)
+        self.timeout_spin.setSuffix(" ms")
+        btn_layout.addWidget(QLabel("Host Başına Bağlantı:"))
+        btn_layout.addWidget(self.conn_spin)
+        btn_layout.addWidget(QLabel("Zaman Aşımı:"))
+        btn_layout.addWidget(self.timeout_spin)
+
+        # Opt-in: several outstanding requests per connection, matched by transaction id
+        self.pipeline_spin = QSpinBox()
+        self.pipeline_spin.setRange(1, 16)
+        self.pipeline_spin.setValue(1)
+        self.pipeline_spin.setSpecialValueText("Kapalı")
+        self.pipeline_spin.setToolTip(
+            "Bağlantı başına aynı anda bekleyen istek sayısı (yüksek gecikmeli hatlar için). "
+            "Desteklemeyen cihazlar otomatik olarak tek istek moduna döner.")
+        btn_layout.addWidget(QLabel("Pipeline:"))
+        btn_layout.addWidget(self.pipeline_spin)
+        btn_layout.addStretch()
+        layout.addLayout(btn_layout)
+
+        self.group_table = QTableWidget()
+        self.group_table.setColumnCount(len(self.GROUP_FIELDS))
+        self.group_table.setHorizontalHeaderLabels(
+            ["Etiket", "Host", "Slave", "Fonksiyon", "Adres", "Adet", "Veri Tipi", "Bayt Sırası", "Periyot (ms)"])
+        self.group_table.horizontalHeaderItem(1).setToolTip("ip[:port]; boşsa bağlantı ayarları kullanılır")
+        self.group_table.horizontalHeaderItem(5).setToolTip("Veri tipinden kaç değer okunacağı")
+        self.group_table.horizontalHeaderItem(7).setToolTip(
+            "ABCD: big-endian, CDAB: word swap, BADC: byte swap, DCBA: little-endian")
+        self.group_table.horizontalHeaderItem(8).setToolTip(
+            "Etiketin okuma periyodu; aynı periyottaki etiketler bir tarama grubudur. Boşsa Polling süresi")
+        self.group_table.setItemDelegateForColumn(6, ChoiceDelegate(list(MODBUS_TYPES), self.group_table))
+        self.group_table.setItemDelegateForColumn(7, ChoiceDelegate(list(BYTE_ORDERS), self.group_table))
+        self.group_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.group_table.setMaximumHeight(180)
+        layout.addWidget(self.group_table)
+
+        # RTU: per-slave response times of the bus scheduler
+        self.bus_table = QTableWidget()
+        self.bus_table.setColumnCount(5)
+        self.bus_table.setHorizontalHeaderLabels(
+            ["Slave", "Yanıt Süresi (ort/maks ms)", "Zaman Aşımı (ms)", "Yanıt / Kayıp", "Durum"])
+        self.bus_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.bus_table.setMaximumHeight(150)
+        self.bus_table.hide()
+        layout.addWidget(self.bus_table)
+
+        self.ui.modbusLayout.insertWidget(2, group)
+        self.stats_label = QLabel("")
+        self.ui.modbusLayout.addWidget(self.stats_label)
+
+        btn_add.clicked.connect(lambda: self.add_group_row())
+        btn_remove.clicked.connect(self.remove_group_row)
+
+    def add_group_row(self, tag=None):
+        tag = tag or {}
+        row = self.group_table.rowCount()
+        self.group_table.insertRow(row)
+        values = [
+            tag.get("name", ""),
+            tag.get("host", ""),
+            tag.get("slave", self.ui.modbusSlaveEdit.text()),
+            tag.get("func", self.ui.modbusFuncCombo.currentText()),
+            tag.get("address", "0"),
+            tag.get("count", "1"),
+            tag.get("type", "UInt16"),
+            tag.get("order", "ABCD"),
+            tag.get("period", ""),
+        ]
+        for col, value in enumerate(values):
+            self.group_table.setItem(row, col, QTableWidgetItem(value))
+
+    def remove_group_row(self):
+        row = self.group_table.currentRow()
+        if row >= 0:
+            self.group_table.removeRow(row)
+
+    def group_rows(self):
+        rows = []
+        for row in range(self.group_table.rowCount()):
+            rows.append([self.group_table.item(row, col).text() if self.group_table.item(row, col) else ""
+                         for col in range(len(self.GROUP_FIELDS))])
+        return rows
+
+    def compile_group(self, by_host=True):
+        """Okuma grubunu cihaz ve periyot başına isteklere derler ((host, periyot) -> plan).
+
+        Grup boşsa None döner.
+        """
+        rows = self.group_rows()
+        if not rows:
+            return None
+        default_period = self.ui.modbusPollMsSpin.value()
+        definitions = {}
+        for row, (name, host, *tag, period) in enumerate(rows):
+            try:
+                period = int(period) if period.strip() else default_period
+                if period < 10:
+                    raise ValueError(period)
+            except ValueError:
+                self.log_message.emit(f"Modbus Hata: Geçersiz periyot (satır {row + 1}), atlandı.")
+                continue
+            key = (host.strip() if by_host else "", period)
+            definitions.setdefault(key, []).append((row, name, *tag))
+        plans = {}
+        for (host, period), defs in definitions.items():
+            plan = ModbusPollPlan(defs, self.gap_spin.value(), host, period)
+            for row in plan.invalid_rows:
+                self.log_message.emit(f"Modbus Hata: Geçersiz etiket (satır {row + 1}), atlandı.")
+            plans[plan.key] = plan
+        hosts = {host for host, _ in plans}
+        self.group_stats = (f"{sum(len(p) for p in plans.values())} etiket, {len(hosts)} cihaz, "
+                            f"{len(plans)} tarama grubu, {sum(len(p.requests) for p in plans.values())} istek")
+        self.stats_label.setText(self.group_stats)
+        return plans
+
+    def start_engine(self, plans):
+        """TCP okuma grubunu asyncio motoruyla başlatır; tüm cihazlar paralel okunur."""
+        hosts = []
+        for (host, _), plan in plans.items():
+            try:
+                address = parse_host(host) if host else (self.ui.modbusIpEdit.text(), int(self.ui.modbusPortEdit.text()))
+            except ValueError:
+                self.log_message.emit(f"Modbus Hata: Geçersiz host '{host}', atlandı.")
+                continue
+            hosts.append((address, plan))
+
+        self.engine = ModbusAsyncEngine(hosts, self.timeout_spin.value() / 1000, self.conn_spin.value(),
+                                        self.pipeline_spin.value(), self)
+        self.engine.data_ready.connect(self.fill_table)
+        self.engine.stats_ready.connect(self.on_stats)
+        self.engine.error_occurred.connect(lambda x: self.log_message.emit(f"Modbus Hata: {x}"))
+        self.engine.finished.connect(self.engine.deleteLater)
+        self.engine.start()
+        self.log_message.emit(f"Modbus okuma grubu {len({a for a, _ in hosts})} cihazdan paralel okunuyor.")
+
+    def stop_engine(self):
+        if self.engine:
+            # Beklemeden durdur; açık istekler zaman aşımıyla sınırlı
+            self.engine.stop()
+            self.engine = None
+
+    def on_stats(self, snapshots):
+        """Her tarama grubunun (cihaz, periyot) aşım ve jitter istatistiklerini gösterir."""
+        if self.sender() not in (self.engine, self.worker):
+            return
+        parts = [
+            f"{host + ' ' if host else ''}{period * 1000:.0f} ms: {overruns}/{cycles} aşım, "
+            f"jitter ort {jitter_avg * 1000:.1f} maks {jitter_max * 1000:.1f} ms, süre {duration * 1000:.0f} ms"
+            for (host, _), (period, cycles, overruns, jitter_avg, jitter_max, duration) in sorted(snapshots)
+        ]
+        text = " | ".join([self.group_stats] * bool(self.group_stats) + parts + [self.bus_text] * bool(self.bus_text))
+        self.stats_label.setText(text)
+
+    def on_bus_stats(self, stats):
+        """RTU hattının kullanım oranını ve slave başına yanıt sürelerini gösterir."""
+        if self.sender() is not self.worker:
+            return
+        utilization, lost, slaves = stats
+        self.bus_text = f"hat kullanımı %{utilization * 100:.0f} (zaman aşımı %{lost * 100:.0f})"
+        tw = self.bus_table
+        tw.setRowCount(len(slaves))
+        for row, (slave, turnaround, worst, timeout, responses, misses, down) in enumerate(slaves):
+            tw.setItem(row, 0, self._mk_item(str(slave)))
+            tw.setItem(row, 1, self._mk_item(
+                "-" if turnaround is None else f"{turnaround * 1000:.1f} / {worst * 1000:.1f}"))
+            tw.setItem(row, 2, self._mk_item(f"{timeout * 1000:.0f}"))
+            tw.setItem(row, 3, self._mk_item(f"{responses} / {misses}"))
+            tw.setItem(row, 4, self._mk_item("Yanıt yok" if down else "OK"))
 
     def toggle_connection(self):
         if self.client and self.client.is_socket_open():
@@ -89,6 +790,7 @@ class ModbusHandler(ProtocolHandlerBase):
             self.log_message.emit(f"Modbus hata: {e}")
 
     def disconnect(self):
+        self.stop_engine()
         if self.worker and self.worker.isRunning():
             self.worker.stop()
             self.worker.wait()
@@ -101,51 +803,95 @@ class ModbusHandler(ProtocolHandlerBase):
         self.log_message.emit("Modbus bağlantısı kesildi.")
 
     def toggle_polling(self, checked):
-        if checked and self.client and self.client.is_socket_open():
+        tcp = self.ui.modbusConnType.currentText() == "TCP"
+        plans = self.compile_group(by_host=tcp) if checked else None
+        self.table_rows = {}
+        self.range_values = []
+        self.bus_text = ""
+        self.bus_table.hide()
+        if plans and tcp:
+            # TCP okuma grubu kendi bağlantılarını açar
+            self.polling_params = {"plans": plans}
+            self.start_engine(plans)
+        elif plans and self.client and self.client.is_socket_open():
+            # RTU okuma grubu: slave'ler tek hat üzerinde sırayla okunur
+            self.polling_params = {"plans": plans}
+            self.worker = ModbusBusWorker(self.client, plans, int(self.ui.modbusBaudCombo.currentText()),
+                                          self.timeout_spin.value() / 1000)
+            self.worker.stats_ready.connect(self.on_stats)
+            self.worker.bus_stats.connect(self.on_bus_stats)
+            self.worker.data_ready.connect(self.fill_table)
+            self.worker.error_occurred.connect(lambda x: self.log_message.emit(f"Modbus Hata: {x}"))
+            self.bus_table.show()
+            self.worker.start()
+        elif checked and self.client and self.client.is_socket_open():
             self.polling_params = {
                 "func": int(self.ui.modbusFuncCombo.currentText()),
                 "address": int(self.ui.modbusAddrEdit.text()),
                 "count": int(self.ui.modbusCountEdit.text()),
                 "slave": int(self.ui.modbusSlaveEdit.text()),
-                "interval": self.ui.modbusPollMsSpin.value()
+                "interval": self.ui.modbusPollMsSpin.value(),
             }
+            self.group_stats = ""
             self.worker = ModbusWorker(self.client, self.polling_params)
+            self.worker.stats_ready.connect(self.on_stats)
             self.worker.data_ready.connect(self.fill_table)
             self.worker.error_occurred.connect(lambda x: self.log_message.emit(f"Modbus Hata: {x}"))
             self.worker.start()
         else:
+            self.stop_engine()
             if self.worker:
                 self.worker.stop()
                 self.worker.wait()
                 self.worker = None
             self.polling_params = None
+            self.frame_timer.stop()
+            return
+        self.table_dirty = False
+        self.frame_timer.start()
 
     def fill_table(self, data):
+        """Okuma sonucunu yayınlar ve saklar; tablo bir sonraki karede güncellenir."""
         if not self.polling_params:
             return
 
-        tw = self.ui.modbusTable
-        start_addr = self.polling_params["address"]
-        func_code = self.polling_params["func"]
-
-        # Modbus adresleme kuralına göre offset belirle
-        addr_offset = 0
-        if func_code == 1:    # Coils
-            addr_offset = 1
-        elif func_code == 3:  # Holding Registers
-            addr_offset = 40001
-        elif func_code == 4:  # Input Registers
-            addr_offset = 30001
-        elif func_code == 2:  # Discrete Inputs
-            addr_offset = 10001
-
-        tw.setRowCount(len(data))
-        for row, val in enumerate(data):
-            display_addr = addr_offset + start_addr + row
-            tw.setItem(row, 0, self._mk_item(str(display_addr)))
-            tw.setItem(row, 1, self._mk_item(str(val)))
-            tw.setItem(row, 2, self._mk_item(hex(val)))
-            tw.setItem(row, 3, self._mk_item(bin(val)))
+        if isinstance(data, tuple):
+            plan, results = data
+            if self.polling_params["plans"].get(plan.key) is not plan:
+                return  # Durdurulmuş ya da değişmiş bir plandan gelen sonuç
+            self.table_rows[plan.key] = self.split_group(plan, results)
+        else:
+            self.range_values = data
+        self.table_dirty = True
+
+    def refresh_table(self):
+        """Son kareden bu yana gelen en güncel değerleri tabloya yansıtır."""
+        if not self.table_dirty or not self.polling_params:
+            return
+        self.table_dirty = False
+        if "plans" in self.polling_params:
+            rows = [row for key in self.polling_params["plans"] for row in self.table_rows.get(key, ())]
+            self.register_model.update([addr for addr, _ in rows], [val for _, val in rows])
+        else:
+            # Modbus adresleme kuralına göre offset belirle
+            start = ADDRESS_OFFSETS.get(self.polling_params["func"], 0) + self.polling_params["address"]
+            values = list(self.range_values)
+            self.register_model.update(list(range(start, start + len(values))), values)
+
+    def split_group(self, plan, results):
+        """Etiket değerlerini yayınlar ve tablo satırlarını (adres, değer) olarak döndürür."""
+        rows = []
+        for i, values in results:
+            slave, func, address, _ = plan.tags[i]
+            base = ADDRESS_OFFSETS[func] + address
+            if values is None:
+                rows.append((base, None))
+                continue
+            # Çok registerlı tiplerde her değer ilk registerının adresinde gösterilir
+            step = plan.decoders[i].words if plan.decoders[i] else 1
+            rows.extend((base + k * step, val) for k, val in enumerate(values))
+            self.data_received.emit("Modbus", plan.names[i], values[0] if plan.counts[i] == 1 else values)
+        return rows
 
     def _mk_item(self, text):
         return QTableWidgetItem(text)
@@ -164,15 +910,18 @@ class ModbusHandler(ProtocolHandlerBase):
             "count": self.ui.modbusCountEdit.text(),
             "slave": self.ui.modbusSlaveEdit.text(),
             "poll": self.ui.modbusPollChk.isChecked(),
-            "poll_ms": self.ui.modbusPollMsSpin.value()
+            "poll_ms": self.ui.modbusPollMsSpin.value(),
+            "max_gap": self.gap_spin.value(),
+            "connections": self.conn_spin.value(),
+            "pipeline": self.pipeline_spin.value(),
+            "timeout_ms": self.timeout_spin.value(),
+            "group": [dict(zip(self.GROUP_FIELDS, cells)) for cells in self.group_rows()],
         }
 
     def deserialize(self, data: dict):
         self.ui.modbusIpEdit.setText(data.get("ip", "127.0.0.1"))
         self.ui.modbusPortEdit.setText(data.get("port", "502"))
-        idx = self.ui.modbusComCombo.findText(data.get("com", "COM1"))
-        if idx != -1:
-            self.ui.modbusComCombo.setCurrentIndex(idx)
+        self.ui.modbusComCombo.setCurrentText(data.get("com", "COM1"))  # Editable: also ports not in the list
         idx = self.ui.modbusBaudCombo.findText(data.get("baud", "9600"))
         if idx != -1:
             self.ui.modbusBaudCombo.setCurrentIndex(idx)
@@ -182,5 +931,12 @@ class ModbusHandler(ProtocolHandlerBase):
         self.ui.modbusAddrEdit.setText(data.get("addr", "0"))
         self.ui.modbusCountEdit.setText(data.get("count", "10"))
         self.ui.modbusSlaveEdit.setText(data.get("slave", "1"))
+        self.gap_spin.setValue(data.get("max_gap", 8))
+        self.conn_spin.setValue(data.get("connections", 1))
+        self.pipeline_spin.setValue(data.get("pipeline", 1))
+        self.timeout_spin.setValue(data.get("timeout_ms", 1000))
+        self.group_table.setRowCount(0)
+        for tag in data.get("group", []):
+            self.add_group_row(tag)
         self.ui.modbusPollChk.setChecked(data.get("poll", False))
         self.ui.modbusPollMsSpin.setValue(data.get("poll_ms", 1000))
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""Read planning for Modbus poll groups.
+
+A poll group is a list of register and coil tags. Tags of the same slave and
+function code are merged into as few read requests as the protocol limits
+allow, and every response is split back into the tags it serves. Register
+tags are decoded to their data type with NumPy views over the response.
+"""
+import math
+
+import numpy as np
+
+# Largest quantity a single read may ask for, per function code
+FUNC_LIMITS = {
+    1: 2000,  # Coils
+    2: 2000,  # Discrete inputs
+    3: 125,   # Holding registers
+    4: 125,   # Input registers
+}
+
+# Conventional display address base per function code (40001 = holding register 0)
+ADDRESS_OFFSETS = {1: 1, 2: 10001, 3: 40001, 4: 30001}
+
+# Register data types; multi-register values are big-endian ("ABCD") on the wire
+MODBUS_TYPES = {
+    "UInt16": np.dtype(">u2"),
+    "Int16": np.dtype(">i2"),
+    "UInt32": np.dtype(">u4"),
+    "Int32": np.dtype(">i4"),
+    "Float32": np.dtype(">f4"),
+    "UInt64": np.dtype(">u8"),
+    "Int64": np.dtype(">i8"),
+    "Float64": np.dtype(">f8"),
+}
+
+# ABCD: big-endian, CDAB: word swapped, BADC: bytes swapped in each word, DCBA: both
+BYTE_ORDERS = ("ABCD", "CDAB", "BADC", "DCBA")
+
+
+class RegisterDecoder:
+    """Decodes ``count`` values of one data type and byte order from registers."""
+
+    __slots__ = ("dtype", "words", "swap_words", "swap_bytes")
+
+    def __init__(self, dtype="UInt16", order="ABCD"):
+        if dtype not in MODBUS_TYPES:
+            raise ValueError(f"Unknown data type '{dtype}'")
+        if order not in BYTE_ORDERS:
+            raise ValueError(f"Unknown byte order '{order}'")
+        self.dtype = MODBUS_TYPES[dtype]
+        self.words = self.dtype.itemsize // 2
+        self.swap_words = self.words > 1 and order in ("CDAB", "DCBA")
+        self.swap_bytes = order in ("BADC", "DCBA")
+
+    def decode(self, registers, pos, count):
+        """``registers`` is a big-endian uint16 array of a whole response."""
+        regs = registers[pos:pos + count * self.words]
+        if len(regs) < count * self.words:
+            raise ValueError("Short response")
+        if self.swap_words:
+            regs = regs.reshape(count, self.words)[:, ::-1]
+        if self.swap_bytes:
+            regs = regs.byteswap()
+        return np.ascontiguousarray(regs).reshape(-1).view(self.dtype).tolist()
+
+
+class ModbusRequest:
+    """One read request and the tags that are split from its response."""
+
+    __slots__ = ("slave", "func", "address", "count", "members")
+
+    def __init__(self, slave, func, address, count):
+        self.slave = slave
+        self.func = func
+        self.address = address
+        self.count = count
+        self.members = []  # indices into the tag list
+
+    @property
+    def end(self):
+        return self.address + self.count
+
+    def __repr__(self):
+        return (f"ModbusRequest(slave={self.slave}, func={self.func}, address={self.address}, "
+                f"count={self.count}, tags={len(self.members)})")
+
+
+def plan_requests(tags, max_gap=0):
+    """Merges ``(slave, func, address, count)`` tags into the fewest read requests.
+
+    Two tags share a request when the hole between them is at most ``max_gap``
+    registers (or coils) and the merged request stays within the function's
+    limit. Request members index into ``tags``.
+    """
+    groups = {}
+    for i, (slave, func, _, _) in enumerate(tags):
+        groups.setdefault((slave, func), []).append(i)
+
+    requests = []
+    for (slave, func), indices in groups.items():
+        limit = FUNC_LIMITS[func]
+        current = None
+        for i in sorted(indices, key=lambda i: tags[i][2]):
+            address, count = tags[i][2], tags[i][3]
+            end = address + count
+            if current is not None:
+                new_end = max(current.end, end)
+                if address - current.end <= max_gap and new_end - current.address <= limit:
+                    current.count = new_end - current.address
+                    current.members.append(i)
+                    continue
+            current = ModbusRequest(slave, func, address, count)
+            current.members.append(i)
+            requests.append(current)
+    return requests
+
+
+def parse_host(text, default_port=502):
+    """Parses "10.0.0.5" or "10.0.0.5:5020" into ``(ip, port)``."""
+    ip, sep, port = text.strip().rpartition(":")
+    if not sep:
+        ip, port = port, default_port
+    if not ip:
+        raise ValueError(f"Invalid host '{text}'")
+    return ip, int(port)
+
+
+def parse_tag(slave, func, address, count):
+    """Validates a poll group row; returns ints or raises ValueError."""
+    slave, func, address, count = int(slave), int(func), int(address), int(count)
+    if func not in FUNC_LIMITS:
+        raise ValueError(f"Unsupported function code {func}")
+    if not 0 <= slave <= 247:
+        raise ValueError(f"Invalid slave id {slave}")
+    if not 0 <= address <= 0xFFFF or not 1 <= count <= FUNC_LIMITS[func] or address + count > 0x10000:
+        raise ValueError(f"Invalid range {address}+{count} for function {func}")
+    return slave, func, address, count
+
+
+class ModbusPollPlan:
+    """A poll group compiled into read requests.
+
+    Built from ``(row, name, slave, func, address, count, dtype, order)``
+    definitions, where count is the number of values of the data type.
+    Unnamed tags are named after their slave and display address, e.g.
+    ``1:40001``. A plan covers the tags of one device that are polled at the
+    same ``period`` (ms); for a device given by ``host`` the generated names
+    are prefixed with ``<host>/``.
+    """
+
+    def __init__(self, definitions, max_gap=0, host="", period=1000):
+        self.host = host
+        self.period = period
+        self.rows = []
+        self.names = []
+        self.tags = []         # (slave, func, address, register or bit count)
+        self.counts = []       # number of values of each tag
+        self.decoders = []     # RegisterDecoder, None for coils and discrete inputs
+        self.positions = []    # offset of each tag inside its request
+        self.invalid_rows = []
+
+        for row, name, slave, func, address, count, dtype, order in definitions:
+            try:
+                decoder = None
+                if int(func) in (3, 4):
+                    decoder = RegisterDecoder(dtype.strip() or "UInt16", order.strip().upper() or "ABCD")
+                    tag = parse_tag(slave, func, address, int(count) * decoder.words)
+                else:
+                    tag = parse_tag(slave, func, address, count)
+            except ValueError:
+                self.invalid_rows.append(row)
+                continue
+            self.rows.append(row)
+            self.counts.append(tag[3] // decoder.words if decoder else tag[3])
+            self.decoders.append(decoder)
+            if not name.strip():
+                name = f"{tag[0]}:{ADDRESS_OFFSETS[tag[1]] + tag[2]}"
+                if host:
+                    name = f"{host}/{name}"
+            self.names.append(name.strip())
+            self.tags.append(tag)
+
+        self.requests = plan_requests(self.tags, max_gap)
+        self.positions = [0] * len(self.tags)
+        for request in self.requests:
+            for i in request.members:
+                self.positions[i] = self.tags[i][2] - request.address
+
+    def __len__(self):
+        return len(self.tags)
+
+    @property
+    def key(self):
+        return self.host, self.period
+
+    def split(self, request, values):
+        """Splits a response into ``(tag_index, values)`` pairs of decoded values.
+
+        values is None for tags whose request failed.
+        """
+        if values is None:
+            return [(i, None) for i in request.members]
+        results = []
+        if request.func in (3, 4):
+            # One conversion per response; every tag decodes from a view of it
+            registers = np.asarray(values, dtype=">u2")
+            for i in request.members:
+                try:
+                    results.append((i, self.decoders[i].decode(registers, self.positions[i], self.counts[i])))
+                except ValueError:
+                    results.append((i, None))
+        else:
+            for i in request.members:
+                pos = self.positions[i]
+                results.append((i, list(values[pos:pos + self.counts[i]])))
+        return results
+
+
+class ScanSchedule:
+    """Fixed-rate cadence of one scan group, kept on absolute deadlines.
+
+    Cycle ``n`` is due at ``start + n * period`` no matter how long earlier
+    cycles took, so the rate does not drift with the request latency. A cycle
+    that ends past its next deadline is an overrun; the missed slots are skipped
+    instead of being run back to back. Jitter is how late a cycle started.
+    """
+
+    def __init__(self, period, now):
+        self.period = period  # seconds
+        self.deadline = now
+        self.cycles = 0
+        self.overruns = 0
+        self.jitter_avg = 0.0
+        self.jitter_max = 0.0
+        self.duration = 0.0
+        self._started = now
+
+    def start(self, now):
+        jitter = max(0.0, now - self.deadline)
+        self.jitter_avg = jitter if not self.cycles else self.jitter_avg * 0.9 + jitter * 0.1
+        self.jitter_max = max(self.jitter_max, jitter)
+        self.cycles += 1
+        self._started = now
+
+    def finish(self, now):
+        self.duration = now - self._started
+        self.deadline += self.period
+        if now > self.deadline:
+            self.overruns += 1
+            self.deadline += math.ceil((now - self.deadline) / self.period) * self.period
+
+    def snapshot(self):
+        """``(period, cycles, overruns, jitter_avg, jitter_max, duration)``, safe to hand to another thread."""
+        return self.period, self.cycles, self.overruns, self.jitter_avg, self.jitter_max, self.duration
+
+
+# RTU read request: slave, function, address, quantity, CRC
+RTU_REQUEST_BYTES = 8
+
+
+def rtu_char_time(baudrate):
+    """Seconds one 11-bit character (start, 8 data, parity or second stop, stop) takes on the wire."""
+    return 11 / baudrate
+
+
+def rtu_frame_gap(baudrate):
+    """Silent interval between RTU frames: 3.5 characters, fixed at 1.75 ms above 19200 baud."""
+    return 0.00175 if baudrate > 19200 else 3.5 * rtu_char_time(baudrate)
+
+
+def rtu_response_bytes(func, count):
+    """Length of the RTU response to a read: slave, function, byte count, data and CRC."""
+    return 5 + (count * 2 if func in (3, 4) else (count + 7) // 8)
+
+
+class SlaveTiming:
+    """Response times, adaptive timeout and backoff of one slave on a serial bus.
+
+    The turnaround (answer time minus the wire time of both frames) is smoothed
+    the way TCP estimates its round trip. A request waits the wire time plus the
+    smoothed turnaround and four deviations, never more than ``max_timeout``, so
+    a quick slave that misses an answer costs a few milliseconds of bus time
+    instead of the full timeout. A slave that does not answer is skipped for an
+    exponentially growing backoff and then probed with a single request.
+    """
+
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, slave, max_timeout, floor=0.02):
+        self.slave = slave
+        self.max_timeout = max_timeout
+        self.floor = floor          # least turnaround allowance, seconds
+        self.srtt = None
+        self.rttvar = 0.0
+        self.worst = 0.0
+        self.responses = 0
+        self.misses = 0
+        self.down = False
+        self.retry_at = 0.0
+        self.backoff = 0.0
+
+    def timeout(self, wire):
+        if self.srtt is None:
+            return self.max_timeout
+        return min(self.max_timeout, wire + max(self.floor, self.srtt + 4 * self.rttvar))
+
+    def skipped(self, now):
+        """Whether the slave is backed off at ``now``."""
+        return self.down and now < self.retry_at
+
+    def answered(self, turnaround):
+        """Records an answer; returns True if the slave was down."""
+        turnaround = max(0.0, turnaround)
+        if self.srtt is None:
+            self.srtt, self.rttvar = turnaround, turnaround / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - turnaround)
+            self.srtt = 0.875 * self.srtt + 0.125 * turnaround
+        self.worst = max(self.worst, turnaround)
+        self.responses += 1
+        recovered = self.down
+        self.down = False
+        self.backoff = 0.0
+        return recovered
+
+    def missed(self, now, period):
+        """Records a request without an answer; returns True if the slave just went down."""
+        self.misses += 1
+        if self.srtt is not None:
+            self.rttvar = max(self.rttvar * 2, self.srtt / 2)  # Wait longer before giving up next time
+        went_down = not self.down
+        self.down = True
+        self.backoff = min(self.MAX_BACKOFF, max(period, self.backoff * 2))
+        self.retry_at = now + self.backoff
+        return went_down
+
+    def snapshot(self, wire=0.0):
+        """``(slave, turnaround, worst, timeout, responses, misses, down)``, safe to hand to another thread."""
+        return (self.slave, self.srtt, self.worst, self.timeout(wire), self.responses, self.misses, self.down)
@@ -0,0 +1,97 @@
+"""Last value of every received MQTT topic, within a memory budget.
+
+The cache keeps one entry per topic with the last payload, its timestamp,
+the retained flag, the number of messages and a smoothed message rate.
+Entries are kept in least recently updated order; once the estimated memory
+use exceeds the budget, the topics that have been silent the longest are
+evicted. Topic strings are interned by the MQTT worker, so the cache, the
+message history and the topic tree share one copy of every topic.
+"""
+from collections import OrderedDict
+import math
+
+RATE_WINDOW = 5.0  # s, time constant of the rate average
+# Bytes per entry beyond the topic and payload characters: string headers, the entry, the cache
+# dictionary and the topic tree node (measured with tracemalloc, about 530 bytes for 4-level topics)
+ENTRY_OVERHEAD = 600
+
+
+class TopicEntry:
+    __slots__ = ("topic", "payload", "timestamp", "retained", "count", "rate", "updated", "size")
+
+    def __init__(self, topic, payload, timestamp, retained, now):
+        self.topic = topic
+        self.payload = payload
+        self.timestamp = timestamp  # text, as shown in the message history
+        self.retained = retained
+        self.count = 1
+        self.rate = 1 / RATE_WINDOW
+        self.updated = now
+        self.size = ENTRY_OVERHEAD + len(topic) + len(payload)
+
+    def current_rate(self, now):
+        """Messages per second, decayed over the time since the last message."""
+        return self.rate * math.exp(-(now - self.updated) / RATE_WINDOW)
+
+
+class LastValueCache:
+    def __init__(self, budget=64 * 1024 * 1024):
+        self.budget = budget
+        self.entries = OrderedDict()  # topic -> TopicEntry, least recently updated first
+        self.bytes = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, topic):
+        return self.entries.get(topic)
+
+    def update(self, messages, now):
+        """Stores a batch of ``(timestamp, topic, payload, retained)`` messages received at ``now``.
+
+        Returns ``(new topics, evicted topics)``; a topic can be in both when
+        it was evicted within the same batch.
+        """
+        entries = self.entries
+        new = []
+        for timestamp, topic, payload, retained in messages:
+            entry = entries.get(topic)
+            if entry is None:
+                entry = entries[topic] = TopicEntry(topic, payload, timestamp, retained, now)
+                self.bytes += entry.size
+                new.append(topic)
+                continue
+            entries.move_to_end(topic)
+            size = ENTRY_OVERHEAD + len(topic) + len(payload)
+            self.bytes += size - entry.size
+            entry.size = size
+            entry.payload = payload
+            entry.timestamp = timestamp
+            entry.retained = retained
+            entry.count += 1
+            if now != entry.updated:
+                entry.rate *= math.exp(-(now - entry.updated) / RATE_WINDOW)
+                entry.updated = now
+            entry.rate += 1 / RATE_WINDOW
+        return new, self._evict()
+
+    def _evict(self):
+        evicted = []
+        entries = self.entries
+        while self.bytes > self.budget and entries:
+            topic, entry = entries.popitem(last=False)
+            self.bytes -= entry.size
+            evicted.append(topic)
+        self.evicted += len(evicted)
+        return evicted
+
+    def set_budget(self, budget):
+        """Changes the budget; returns the evicted topics."""
+        self.budget = budget
+        return self._evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        self.evicted = 0
@@ -1,24 +1,119 @@
 from protocols.base_handler import ProtocolHandlerBase
 import paho.mqtt.client as mqtt
-from PyQt6.QtCore import QThread, pyqtSignal, QObject
+from PyQt6.QtCore import (QThread, pyqtSignal, QObject, QAbstractTableModel, QAbstractItemModel, QModelIndex, Qt,
+                          QTimer)
+from PyQt6.QtWidgets import (QTableView, QHBoxLayout, QLabel, QSpinBox, QGroupBox, QVBoxLayout, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QLineEdit, QCheckBox,
+                             QTabWidget, QTreeView, QWidget)
+from protocols.mqtt_topics import TopicMapper, TopicMapping, parse_value
+from protocols.mqtt_outbound import BATCH_FORMATS, InFlightWindow, TagBatcher, encode_value
+from protocols.mqtt_spool import MessageSpool
+from protocols.mqtt_cache import LastValueCache
+from protocols.sparkplug import NAMESPACE, SparkplugDecoder, SparkplugEncoder, rebirth_request, split_metric_topic
+from bisect import bisect_left
+from collections import deque
+from sys import intern
+import threading
 import time
 
 # Worker class to handle MQTT communication in a separate thread
 class MqttWorker(QObject):
     # Signals to communicate with the main thread (MqttHandler)
     status_changed = pyqtSignal(str, str)  # status_message, color
-    message_received = pyqtSignal(str, str, str) # timestamp, topic, payload
+    # One signal per batch: [(timestamp, topic, payload, retained)] and the [(tag, value)] samples of mapped topics
+    messages_received = pyqtSignal(object, object)
+    # About once a second: (sent, acked, in flight, queued, dropped, average ack time in s, spooled, spool bytes)
+    publish_stats = pyqtSignal(object)
 
-    def __init__(self, broker, port, user, pwd):
+    BATCH_SIZE = 1000  # A full batch is decoded without waiting for the batch latency
+    REBIRTH_INTERVAL = 10.0  # s between rebirth requests to the same edge node
+
+    def __init__(self, broker, port, user, pwd, max_latency=0.05, queue_size=100000):
         super().__init__()
         self.broker = broker
         self.port = port
         self.user = user
         self.pwd = pwd
+        self.mapper = None  # TopicMapper, replaced as a whole when the mappings change
+        self.max_latency = max_latency
+        # Raw messages from the paho thread; deque appends need no lock, the oldest are dropped when full
+        self.queue = deque(maxlen=queue_size)
+        self.received = 0
+        self.decoded = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+        # Outbound: queued from any thread, published from the worker thread
+        self.outbound = deque(maxlen=queue_size)  # (topic, payload, qos)
+        self.updates = deque(maxlen=queue_size)   # (topic, tag, value) for the batcher
+        self.out_sent = 0
+        self.out_dropped = 0
+        self.qos = 0
+        self.window = InFlightWindow()
+        self.batcher = None
+        self.batch_format = None
+        self.batch_interval = 1.0
+        self._next_batch = 0.0
+        self._publish_config = deque(maxlen=1)  # Latest configure_publish settings not yet applied
+        # Store and forward: MessageSpool while the broker is unreachable, replayed at drain_rate msg/s
+        self.spool = None
+        self.drain_rate = 0
+        self._drain_tokens = 0.0
+        self._drain_time = 0.0
+
+        # Sparkplug B: births and aliases of received edge nodes, and of the ones published as
+        self.sparkplug_in = SparkplugDecoder()
+        self.sparkplug = SparkplugEncoder()
+        self.sparkplug_updates = deque(maxlen=queue_size)  # (message topic, metric, value, qos)
+        self.request_rebirth = False  # Ask edge nodes for their births when DATA has unknown aliases
+        self._rebirth_requested = {}  # (group, node) -> time of the last request
+        self._births_due = False
+
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
+        self.client.on_publish = self.on_publish
+        self.client.reconnect_delay_set(1, 30)
+
+    def configure_publish(self, qos, window, batch_format=None, batch_interval=1.0):
+        """QoS and in-flight window of outbound messages; ``batch_format`` packs tag updates per topic.
+
+        Applied on the worker thread, which owns the batcher and the window.
+        """
+        self._publish_config.append((qos, max(1, window), batch_format, batch_interval))
+        self._wakeup.set()
+
+    def _apply_publish_config(self, now):
+        try:
+            qos, window, batch_format, batch_interval = self._publish_config.pop()
+        except IndexError:
+            return
+        if batch_format != self.batch_format:
+            batcher = self.batcher
+            if batcher is not None:
+                # Updates collected so far go out in the old format
+                self._add_updates(batcher)
+                self._take_batch(batcher)
+                self.out_dropped += batcher.skipped
+            self.batcher = TagBatcher(batch_format, self.sparkplug) if batch_format else None
+            self.batch_format = batch_format
+        self.qos = qos
+        self.window.size = window
+        try:
+            self.client.max_inflight_messages_set(window)
+        except RuntimeError:
+            pass  # paho takes it only before connecting; the window limits the publishes handed to it anyway
+        self._next_batch = min(self._next_batch, now + batch_interval)
+        self.batch_interval = batch_interval
+
+    def configure_spool(self, directory, max_bytes, drain_rate):
+        """Opens the disk spool in ``directory`` (None: messages are only queued in memory).
+
+        Call before the worker runs; raises OSError if the directory cannot be used.
+        """
+        self.spool = MessageSpool(directory, max_bytes) if directory else None
+        self.drain_rate = drain_rate
 
     def connect_to_broker(self):
         """Initiates connection to the MQTT broker."""
@@ -30,30 +125,242 @@ class MqttWorker(QObject):
             self.client.loop_start()  # Start network loop in a background thread
         except Exception as e:
             self.status_changed.emit(f"Bağlantı hatası: {e}", "red")
+            if self.spool is not None:
+                # Messages go to the spool meanwhile; the network loop keeps retrying
+                self.client.connect_async(self.broker, self.port, 60)
+                self.client.loop_start()
 
     def on_connect(self, client, userdata, flags, reason_code, properties):
         """Callback for when the client connects to the broker."""
         if reason_code == 0:
             self.status_changed.emit("Bağlandı", "green")
+            self._births_due = True  # Sparkplug births of a new session
             # Re-subscribe to topics if any, or subscribe to a default topic
             self.subscribe("#") # Subscribe to all topics by default
         else:
             self.status_changed.emit(f"Bağlantı başarısız: {mqtt.connack_string(reason_code)}", "red")
 
-    def on_disconnect(self, client, userdata, reason_code, properties):
-        """Callback for when the client disconnects from the broker."""
-        self.status_changed.emit("Bağlantı kesildi", "red")
-        self.client.loop_stop()
+    def on_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
+        """Callback for when the client disconnects from the broker.
+
+        Unless the disconnect was requested, the network loop keeps running and
+        reconnects by itself; queued messages wait (or are spooled) until then.
+        """
+        if self._stopped.is_set() or reason_code == 0:
+            self.status_changed.emit("Bağlantı kesildi", "red")
+        else:
+            self.status_changed.emit(f"Bağlantı koptu ({reason_code}), yeniden bağlanılıyor...", "orange")
+        self._wakeup.set()
 
     def on_message(self, client, userdata, msg):
-        """Callback for when a message is received from the broker."""
-        try:
-            payload = msg.payload.decode('utf-8')
-        except UnicodeDecodeError:
-            payload = f"[Binary Data: {len(msg.payload)} bytes]"
-        
-        timestamp = time.strftime('%H:%M:%S', time.localtime())
-        self.message_received.emit(timestamp, msg.topic, payload)
+        """Callback for when a message is received from the broker.
+
+        Only queues the message, so the paho network loop keeps up with the
+        broker; decoding runs in batches on the worker thread.
+        """
+        self.queue.append((time.time(), msg.topic, msg.payload, msg.retain))
+        self.received += 1
+        if len(self.queue) >= self.BATCH_SIZE:
+            self._wakeup.set()
+
+    def on_publish(self, client, userdata, mid, reason_code, properties):
+        """Callback for a sent (QoS 0) or acknowledged (QoS 1/2) message: the window may have room."""
+        if self.window.pending:
+            self._wakeup.set()
+
+    def run(self):
+        """Connects, then decodes received and sends queued messages until disconnected (worker thread)."""
+        now = time.monotonic()
+        self._apply_publish_config(now)
+        self.connect_to_broker()
+        self._next_batch = now + self.batch_interval
+        next_stats = now + 1.0
+        while not self._stopped.is_set():
+            timeout = self.max_latency
+            if self.batcher is not None:
+                timeout = min(timeout, max(0.0, self._next_batch - time.monotonic()))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            while self.decode_batch() == self.BATCH_SIZE:
+                pass
+            now = time.monotonic()
+            self.send_queued(now)
+            if now >= next_stats:
+                spool = self.spool
+                if spool is not None:
+                    spool.flush()
+                self.publish_stats.emit((self.out_sent, self.window.acked, len(self.window), len(self.outbound),
+                                         self.dropped_total(), self.window.take_ack_time(),
+                                         len(spool) if spool else 0, spool.size if spool else 0))
+                next_stats = now + 1.0
+        while self.decode_batch():
+            pass
+        if self.spool is not None:
+            # Unsent messages are kept for the next connection
+            self._spool_outbound()
+            self.spool.close()
+
+    def send_queued(self, now):
+        """Packs due tag batches and publishes queued messages while the in-flight window has room."""
+        self._apply_publish_config(now)
+        if self._births_due:
+            self._births_due = False
+            self.sparkplug.reset()
+        updates = self.sparkplug_updates
+        for _ in range(len(updates)):
+            topic, metric, value, qos = updates.popleft()
+            for message_topic, payload in self.sparkplug.encode(topic, {metric: value}):
+                self._queue(message_topic, payload, qos)
+
+        batcher = self.batcher
+        if batcher is not None:
+            self._add_updates(batcher)
+            if now >= self._next_batch:
+                self._take_batch(batcher)
+                self._next_batch = max(self._next_batch + self.batch_interval, now)
+        elif self.updates:
+            # Queued while batching was being switched off
+            updates = self.updates
+            for _ in range(len(updates)):
+                topic, tag, value = updates.popleft()
+                self.publish(f"{topic}/{tag}", value)
+
+        self.window.sweep(now)
+        connected = self.client.is_connected()
+        spool = self.spool
+        if spool is not None and (not connected or len(spool)):
+            # While anything is spooled, new messages queue up behind it on disk to keep their order
+            self._spool_outbound()
+        if not connected:
+            return
+        if spool is not None and len(spool):
+            self.drain_spool(now)
+            return
+        outbound = self.outbound
+        while outbound:
+            topic, payload, qos = outbound[0]
+            if qos and self.window.full():
+                break
+            info = self.client.publish(topic, payload, qos)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                break  # Not connected or paho's own queue is full; retried on the next wakeup
+            outbound.popleft()
+            self.out_sent += 1
+            if qos:
+                self.window.sent(info, now)
+
+    def drain_spool(self, now):
+        """Publishes spooled messages oldest first, at most ``drain_rate`` per second (0: unlimited)."""
+        spool = self.spool
+        rate = self.drain_rate
+        if rate:
+            # Token bucket holding at most one second of messages
+            self._drain_tokens = min(rate, self._drain_tokens + (now - self._drain_time) * rate)
+        self._drain_time = now
+        for _ in range(self.BATCH_SIZE):
+            if rate and self._drain_tokens < 1:
+                return
+            message = spool.peek()
+            if message is None:
+                return
+            topic, payload, qos = message
+            if qos and self.window.full():
+                return
+            info = self.client.publish(topic, payload, qos)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return
+            spool.advance()
+            self.out_sent += 1
+            self._drain_tokens -= 1
+            if qos:
+                self.window.sent(info, now)
+        self._wakeup.set()  # More to send without waiting for the batch latency
+
+    def _spool_outbound(self):
+        outbound = self.outbound
+        append = self.spool.append
+        for _ in range(len(outbound)):
+            append(*outbound.popleft())
+
+    def _add_updates(self, batcher):
+        updates = self.updates
+        for _ in range(len(updates)):
+            batcher.add(*updates.popleft())
+
+    def _take_batch(self, batcher):
+        for topic, payload in batcher.take():
+            self._queue(topic, payload, self.qos)
+
+    def dropped_total(self):
+        """Outbound messages lost: pushed out of the memory queue, evicted from the full spool or tag
+        updates the batch format cannot carry."""
+        return (self.out_dropped + (self.spool.evicted if self.spool is not None else 0)
+                + (self.batcher.skipped if self.batcher is not None else 0))
+
+    def _queue(self, topic, payload, qos):
+        if len(self.outbound) == self.outbound.maxlen:
+            self.out_dropped += 1  # The oldest queued message is pushed out
+        self.outbound.append((topic, payload, qos))
+
+    def decode_batch(self):
+        """Decodes up to BATCH_SIZE queued messages and emits them as one batch; returns their count."""
+        queue = self.queue
+        count = min(len(queue), self.BATCH_SIZE)
+        if not count:
+            return 0
+        mapper = self.mapper
+        sparkplug = self.sparkplug_in
+        messages = []
+        samples = []
+        second = None
+        for _ in range(count):
+            stamp, topic, payload, retained = queue.popleft()
+            topic = intern(topic)  # One string per topic in the history, the topic cache and tree
+            if int(stamp) != second:
+                second = int(stamp)
+                timestamp = time.strftime('%H:%M:%S', time.localtime(stamp))
+            if topic.startswith(NAMESPACE):
+                # Sparkplug B metrics become samples instead of going through the mappings
+                try:
+                    decoded = sparkplug.decode(topic, payload)
+                except ValueError:
+                    decoded = None
+                if decoded is not None:
+                    samples.extend(decoded[1])
+                    messages.append((timestamp, topic, decoded[2], retained))
+                    continue
+            if mapper is not None:
+                # Mapped topics become tag samples, JSON payloads are parsed here
+                samples.extend(mapper.samples(topic, payload))
+            try:
+                text = payload.decode('utf-8')
+            except UnicodeDecodeError:
+                text = f"[Binary Data: {len(payload)} bytes]"
+            messages.append((timestamp, topic, text, retained))
+        self.decoded += count
+        if sparkplug.rebirth_commands or sparkplug.needs_rebirth:
+            self._handle_rebirths()
+        self.messages_received.emit(messages, samples)
+        return count
+
+    def _handle_rebirths(self):
+        """Answers rebirth commands for the nodes published as, and asks nodes with unknown aliases for births."""
+        decoder = self.sparkplug_in
+        for group, node_id in decoder.rebirth_commands:
+            self.sparkplug.rebirth(group, node_id)
+        decoder.rebirth_commands.clear()
+        if self.request_rebirth:
+            now = time.monotonic()
+            for key in decoder.needs_rebirth:
+                if now - self._rebirth_requested.get(key, -self.REBIRTH_INTERVAL) >= self.REBIRTH_INTERVAL:
+                    self._rebirth_requested[key] = now
+                    self._queue(*rebirth_request(*key), 0)
+        decoder.needs_rebirth.clear()
+
+    @property
+    def dropped(self):
+        """Messages pushed out of the full queue before they were decoded."""
+        return self.received - self.decoded - len(self.queue)
 
     def subscribe(self, topic):
         """Subscribes to a given topic."""
@@ -61,34 +368,574 @@ class MqttWorker(QObject):
             self.client.subscribe(topic)
             print(f"Subscribed to {topic}")
 
-    def publish(self, topic, payload):
-        """Publishes a message to a given topic."""
-        if self.client.is_connected():
-            self.client.publish(topic, payload)
-            print(f"Published to {topic}: {payload}")
+    def publish(self, topic, value, qos=None):
+        """Queues a message; it is published from the worker thread within the in-flight window.
+
+        A topic of the form ``spBv1.0/<group>/<type>/<node>[/<device>]/<metric>``
+        publishes ``value`` as that metric in a Sparkplug B payload.
+        """
+        qos = self.qos if qos is None else qos
+        sparkplug = split_metric_topic(topic) if topic.startswith(NAMESPACE) else None
+        if sparkplug is not None:
+            if isinstance(value, str):
+                value = parse_value(value)  # Gateway values are text; numbers get a numeric metric type
+            # Encoded on the worker thread, which owns the Sparkplug aliases and sequence numbers
+            self.sparkplug_updates.append((*sparkplug, value, qos))
+        else:
+            self._queue(topic, encode_value(value), qos)
+        self._wakeup.set()
+
+    def publish_tag(self, topic, tag, value):
+        """Queues a tag update: packed into the next batch of ``topic``, or sent to ``topic/tag`` unbatched."""
+        if self.batcher is not None:
+            if isinstance(value, str):
+                value = parse_value(value)  # S7 and gateway values are text; batches carry numbers as numbers
+            self.updates.append((topic, tag, value))
+        else:
+            self.publish(f"{topic}/{tag}", value)
 
     def disconnect_from_broker(self):
         """Disconnects from the broker."""
+        self._stopped.set()
         self.client.disconnect()
         self.client.loop_stop()
+        self._wakeup.set()
+
+class MqttMessageModel(QAbstractTableModel):
+    """Received messages in a fixed-capacity ring, newest first.
+
+    Messages arrive in batches; once the ring is full every batch evicts the
+    same number of oldest rows, so memory stays bounded whatever the message
+    rate. ``dropped`` counts the messages that were evicted or never shown.
+    """
+    HEADERS = ["Zaman", "Topic", "Payload"]
+
+    def __init__(self, capacity=10000, parent=None):
+        super().__init__(parent)
+        self.dropped = 0
+        self._set_capacity(capacity)
+
+    def _set_capacity(self, capacity):
+        self.capacity = capacity
+        self._ring = [None] * capacity  # (timestamp, topic, payload, retained)
+        self._start = 0                 # oldest message
+        self._count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        message = self._ring[(self._start + self._count - 1 - index.row()) % self.capacity]  # (..., retained)
+        return message[index.column()]
+
+    def append_messages(self, messages):
+        """Adds a batch of messages (oldest first) to the top of the view."""
+        n = len(messages)
+        if not n:
+            return
+        if n >= self.capacity:
+            # The batch alone fills the ring
+            self.beginResetModel()
+            self.dropped += self._count + n - self.capacity
+            self._ring = list(messages[n - self.capacity:])
+            self._start = 0
+            self._count = self.capacity
+            self.endResetModel()
+            return
+
+        overflow = self._count + n - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), self._count - overflow, self._count - 1)
+            self._start = (self._start + overflow) % self.capacity
+            self._count -= overflow
+            self.dropped += overflow
+            self.endRemoveRows()
+
+        self.beginInsertRows(QModelIndex(), 0, n - 1)
+        end = self._start + self._count
+        for k, message in enumerate(messages):
+            self._ring[(end + k) % self.capacity] = message
+        self._count += n
+        self.endInsertRows()
+
+    def set_capacity(self, capacity):
+        """Changes the capacity, keeping the newest messages that fit."""
+        if capacity == self.capacity:
+            return
+        keep = min(self._count, capacity)
+        messages = [self._ring[(self._start + self._count - keep + k) % self.capacity] for k in range(keep)]
+        self.beginResetModel()
+        self.dropped += self._count - keep
+        self._set_capacity(capacity)
+        self._ring[:keep] = messages
+        self._count = keep
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._set_capacity(self.capacity)
+        self.dropped = 0
+        self.endResetModel()
+
+
+class _TopicNode:
+    __slots__ = ("name", "parent", "children", "rows", "topic", "size")
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = {}  # level name -> _TopicNode
+        self.rows = None    # sorted child names once the node was expanded
+        self.topic = None   # full topic if this level has a cached value
+        self.size = 0       # cached topics in the subtree
+
+
+class TopicTreeModel(QAbstractItemModel):
+    """Topics of a LastValueCache as a tree of topic levels.
+
+    Children are only listed when a node is expanded for the first time, so
+    the view only ever holds the expanded levels however many topics there
+    are. Value changes are announced once per frame per expanded node.
+    """
+    HEADERS = ["Topic", "Son Değer", "Zaman", "Mesaj", "msg/s", "Retained"]
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._reset_tree()
+
+    def _reset_tree(self):
+        self.root = _TopicNode("", None)
+        self.root.rows = []
+        self.nodes = {}         # topic -> node holding its value
+        self.expanded = set()   # nodes whose rows are listed
+        self._dirty = set()     # expanded nodes with changed children
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def _index(self, node, column=0):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(bisect_left(node.parent.rows, node.name), column, node)
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self._node(parent)
+        if node.rows is None or not 0 <= row < len(node.rows):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[node.rows[row]])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self._index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        rows = self._node(parent).rows
+        return len(rows) if rows is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        return parent.column() <= 0 and bool(self._node(parent).children)
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return node.rows is None and bool(node.children)
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if node.rows is not None or not node.children:
+            return
+        names = sorted(node.children)
+        self.beginInsertRows(parent, 0, len(names) - 1)
+        node.rows = names
+        self.expanded.add(node)
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if role == Qt.ItemDataRole.ToolTipRole and column == 0:
+            return node.topic
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if column == 0:
+            return node.name
+        entry = self.cache.get(node.topic) if node.topic is not None else None
+        if entry is None:
+            return f"{node.size} topic" if column == 1 and node.children else None
+        if column == 1:
+            return entry.payload[:200]
+        if column == 2:
+            return entry.timestamp
+        if column == 3:
+            return entry.count
+        if column == 4:
+            return f"{entry.current_rate(time.monotonic()):.1f}"
+        return "✓" if entry.retained else ""
+
+    def add_topics(self, topics):
+        """Adds new cache topics; only levels under expanded nodes are inserted into the view."""
+        for topic in topics:
+            if topic in self.nodes or self.cache.get(topic) is None:
+                continue  # Evicted within the same batch
+            node = self.root
+            for level in topic.split("/"):
+                child = node.children.get(level)
+                if child is None:
+                    child = _TopicNode(level, node)
+                    if node.rows is not None:
+                        row = bisect_left(node.rows, level)
+                        self.beginInsertRows(self._index(node), row, row)
+                        node.children[level] = child
+                        node.rows.insert(row, level)
+                        self.endInsertRows()
+                    else:
+                        node.children[level] = child
+                node = child
+            node.topic = topic
+            self.nodes[topic] = node
+            while node is not None:
+                node.size += 1
+                if node.rows is not None:
+                    self._dirty.add(node)  # Topic counts of the branches
+                node = node.parent
+
+    def remove_topics(self, topics):
+        """Removes evicted topics and the levels left without topics."""
+        for topic in topics:
+            node = self.nodes.pop(topic, None)
+            if node is None:
+                continue
+            node.topic = None
+            parent = node
+            while parent is not None:
+                parent.size -= 1
+                parent = parent.parent
+            while node is not self.root and node.topic is None and not node.children:
+                parent = node.parent
+                if parent.rows is not None:
+                    row = bisect_left(parent.rows, node.name)
+                    self.beginRemoveRows(self._index(parent), row, row)
+                    del parent.children[node.name]
+                    del parent.rows[row]
+                    self.endRemoveRows()
+                else:
+                    del parent.children[node.name]
+                self.expanded.discard(node)
+                self._dirty.discard(node)
+                node = parent
+            if node.parent is not None and node.parent.rows is not None:
+                self._dirty.add(node.parent)
+
+    def mark_updated(self, messages):
+        """Notes the expanded nodes whose children got new values."""
+        nodes = self.nodes
+        dirty = self._dirty
+        for message in messages:
+            node = nodes.get(message[1])
+            if node is not None and node.parent.rows is not None:
+                dirty.add(node.parent)
+
+    def refresh(self, everything=False):
+        """Announces the changed values, one range per expanded node; ``everything`` includes idle rates."""
+        nodes = self.expanded if everything else self._dirty
+        last = len(self.HEADERS) - 1
+        for node in nodes:
+            if node.rows:
+                first = node.children[node.rows[0]]
+                final = node.children[node.rows[-1]]
+                self.dataChanged.emit(self.createIndex(0, 1, first), self.createIndex(len(node.rows) - 1, last, final))
+        self._dirty.clear()
+
+    def clear(self):
+        self.beginResetModel()
+        self._reset_tree()
+        self.endResetModel()
+
 
 class MqttHandler(ProtocolHandlerBase):
+    TABLE_FPS = 20  # Messages are added to the table in batches at most this often
+
     def __init__(self, ui):
         super().__init__(ui)
         self.worker = None
         self.thread = None
+        self.pending = deque(maxlen=10000)  # received since the last frame
+        self.received = 0
+        self.rate_count = 0
+        self.rate_time = time.monotonic()
+        self.mapper = None
         self._setup_table()
+        self._setup_publishing()
+        self._setup_spool()
+        self._setup_mappings()
         self._connect_signals()
 
     def _setup_table(self):
-        """Sets up the table for displaying MQTT messages."""
-        tw = self.ui.mqttMessagesTable
-        tw.setColumnCount(3)
-        tw.setHorizontalHeaderLabels(["Zaman", "Topic", "Payload"])
-        tw.setColumnWidth(0, 80)
-        tw.setColumnWidth(1, 200)
+        """Replaces the message table with a ring buffer view fed on a frame timer."""
+        self.message_model = MqttMessageModel(10000, self)
+        self.table = QTableView()
+        self.table.setModel(self.message_model)
+        self.table.setColumnWidth(0, 80)
+        self.table.setColumnWidth(1, 200)
         # Make the last column stretch
-        tw.horizontalHeader().setStretchLastSection(True)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setDefaultSectionSize(24)
+
+        # Message history and topic tree share the place of the original table
+        self.message_tabs = QTabWidget()
+        self.message_tabs.addTab(self.table, "Mesajlar")
+        layout = self.ui.mqttSubLayout
+        index = layout.indexOf(self.ui.mqttMessagesTable)
+        layout.removeWidget(self.ui.mqttMessagesTable)
+        self.ui.mqttMessagesTable.setParent(None)
+        layout.insertWidget(index, self.message_tabs)
+
+        info_layout = QHBoxLayout()
+        self.capacity_spin = QSpinBox()
+        self.capacity_spin.setRange(100, 1000000)
+        self.capacity_spin.setSingleStep(1000)
+        self.capacity_spin.setValue(10000)
+        self.capacity_spin.setToolTip("Tabloda tutulan en fazla mesaj; eski mesajlar silinir")
+        self.capacity_spin.valueChanged.connect(self.set_capacity)
+        self.rate_label = QLabel("0 msg/s")
+        self.latency_spin = QSpinBox()
+        self.latency_spin.setRange(5, 1000)
+        self.latency_spin.setValue(50)
+        self.latency_spin.setSuffix(" ms")
+        self.latency_spin.setToolTip("Gelen mesajlar toplu olarak çözülür; bir mesaj en fazla bu kadar bekler")
+        self.latency_spin.valueChanged.connect(self.set_latency)
+        info_layout.addWidget(QLabel("Maks. Satır:"))
+        info_layout.addWidget(self.capacity_spin)
+        info_layout.addWidget(QLabel("Maks. Gecikme:"))
+        info_layout.addWidget(self.latency_spin)
+        info_layout.addStretch()
+        info_layout.addWidget(self.rate_label)
+        layout.insertLayout(index + 1, info_layout)
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(1000 // self.TABLE_FPS)
+        self.frame_timer.timeout.connect(self.flush_messages)
+        self._setup_topic_tree()
+
+    def _setup_topic_tree(self):
+        """Topic tree tab: the last value of every topic from a memory-capped cache."""
+        self.topic_cache = LastValueCache()
+        self.topic_model = TopicTreeModel(self.topic_cache, self)
+        self.topic_tree = QTreeView()
+        self.topic_tree.setModel(self.topic_model)
+        self.topic_tree.setUniformRowHeights(True)
+        self.topic_tree.setColumnWidth(0, 220)
+        self.topic_tree.setColumnWidth(1, 220)
+
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        layout.setContentsMargins(0, 0, 0, 0)
+        info_layout = QHBoxLayout()
+        self.cache_spin = QSpinBox()
+        self.cache_spin.setRange(1, 4096)
+        self.cache_spin.setValue(64)
+        self.cache_spin.setSuffix(" MB")
+        self.cache_spin.setToolTip("Topic önbelleğinin en fazla bellek kullanımı; en uzun süredir mesaj "
+                                   "gelmeyen topic'ler silinir")
+        self.cache_spin.valueChanged.connect(self.set_cache_budget)
+        btn_clear = QPushButton("Temizle")
+        btn_clear.clicked.connect(self.clear_topic_cache)
+        self.cache_label = QLabel("0 topic")
+        info_layout.addWidget(QLabel("Önbellek:"))
+        info_layout.addWidget(self.cache_spin)
+        info_layout.addWidget(btn_clear)
+        info_layout.addStretch()
+        info_layout.addWidget(self.cache_label)
+        layout.addLayout(info_layout)
+        layout.addWidget(self.topic_tree)
+        self.message_tabs.addTab(page, "Topic Ağacı")
+
+    def set_cache_budget(self, mb):
+        self.topic_model.remove_topics(self.topic_cache.set_budget(mb * 1024 * 1024))
+
+    def clear_topic_cache(self):
+        self.topic_cache.clear()
+        self.topic_model.clear()
+        self.cache_label.setText("0 topic")
+
+    def _setup_publishing(self):
+        """Outbound settings: QoS window, and forwarding of other protocols' tags as (batched) messages."""
+        group = QGroupBox("Gönderim Ayarları")
+        layout = QHBoxLayout(group)
+
+        self.qos_combo = QComboBox()
+        self.qos_combo.addItems(["0", "1", "2"])
+        self.window_spin = QSpinBox()
+        self.window_spin.setRange(1, 1000)
+        self.window_spin.setValue(20)
+        self.window_spin.setToolTip("QoS 1/2: onayı beklenen en fazla mesaj; fazlası sırada bekler")
+        self.forward_edit = QLineEdit()
+        self.forward_edit.setPlaceholderText("Kapalı")
+        self.forward_edit.setToolTip("Modbus ve S7 etiketleri bu topic altına gönderilir (topic/etiket ya da toplu)")
+        self.batch_combo = QComboBox()
+        self.batch_combo.addItems(["Kapalı", *BATCH_FORMATS])
+        self.batch_combo.setToolTip("Etiket güncellemeleri her aralıkta topic başına tek mesajda toplanır")
+        self.batch_spin = QSpinBox()
+        self.batch_spin.setRange(10, 60000)
+        self.batch_spin.setValue(1000)
+        self.batch_spin.setSuffix(" ms")
+        self.out_stats_label = QLabel("")
+
+        layout.addWidget(QLabel("QoS:"))
+        layout.addWidget(self.qos_combo)
+        layout.addWidget(QLabel("Maks. Onaysız:"))
+        layout.addWidget(self.window_spin)
+        layout.addWidget(QLabel("Etiket Yönlendirme:"))
+        layout.addWidget(self.forward_edit)
+        layout.addWidget(QLabel("Toplu Gönderim:"))
+        layout.addWidget(self.batch_combo)
+        layout.addWidget(self.batch_spin)
+        layout.addWidget(self.out_stats_label)
+
+        index = self.ui.mqttLayout.indexOf(self.ui.mqttPubLayout.parentWidget())
+        self.ui.mqttLayout.insertWidget(index + 1, group)
+
+        self.qos_combo.currentIndexChanged.connect(self.configure_publish)
+        self.window_spin.valueChanged.connect(self.configure_publish)
+        self.batch_combo.currentIndexChanged.connect(self.configure_publish)
+        self.batch_spin.valueChanged.connect(self.configure_publish)
+
+    def configure_publish(self):
+        if self.worker:
+            batch_format = self.batch_combo.currentText() if self.batch_combo.currentIndex() else None
+            self.worker.configure_publish(int(self.qos_combo.currentText()), self.window_spin.value(),
+                                          batch_format, self.batch_spin.value() / 1000)
+
+    def _setup_spool(self):
+        """Store-and-forward settings: outbound messages are spooled to disk while the broker is unreachable."""
+        group = QGroupBox("Disk Kuyruğu")
+        layout = QHBoxLayout(group)
+
+        self.spool_edit = QLineEdit()
+        self.spool_edit.setPlaceholderText("Kapalı")
+        self.spool_edit.setToolTip("Bağlantı yokken gönderilecek mesajlar bu klasörde saklanır ve bağlanınca "
+                                   "sırayla gönderilir (bağlanırken uygulanır)")
+        self.spool_size_spin = QSpinBox()
+        self.spool_size_spin.setRange(1, 100000)
+        self.spool_size_spin.setValue(256)
+        self.spool_size_spin.setSuffix(" MB")
+        self.spool_size_spin.setToolTip("Klasör dolunca en eski mesajlar silinir")
+        self.drain_spin = QSpinBox()
+        self.drain_spin.setRange(0, 1000000)
+        self.drain_spin.setValue(500)
+        self.drain_spin.setSuffix(" msg/s")
+        self.drain_spin.setSpecialValueText("Sınırsız")
+        self.drain_spin.setToolTip("Yeniden bağlanınca biriken mesajların en fazla gönderim hızı")
+
+        layout.addWidget(QLabel("Klasör:"))
+        layout.addWidget(self.spool_edit)
+        layout.addWidget(QLabel("Maks. Boyut:"))
+        layout.addWidget(self.spool_size_spin)
+        layout.addWidget(QLabel("Boşaltma Hızı:"))
+        layout.addWidget(self.drain_spin)
+
+        index = self.ui.mqttLayout.indexOf(self.ui.mqttPubLayout.parentWidget())
+        self.ui.mqttLayout.insertWidget(index + 2, group)
+
+        self.drain_spin.valueChanged.connect(self.set_drain_rate)
+
+    def set_drain_rate(self, rate):
+        if self.worker:
+            self.worker.drain_rate = rate
+
+    def _setup_mappings(self):
+        """Topic filter -> tag mappings; matched messages are published as tag samples."""
+        group = QGroupBox("Topic → Etiket Eşlemeleri")
+        layout = QVBoxLayout(group)
+
+        btn_layout = QHBoxLayout()
+        btn_add = QPushButton("Eşleme Ekle")
+        btn_remove = QPushButton("Eşleme Sil")
+        btn_layout.addWidget(btn_add)
+        btn_layout.addWidget(btn_remove)
+        btn_layout.addStretch()
+        self.rebirth_check = QCheckBox("Sparkplug Rebirth İste")
+        self.rebirth_check.setToolTip("spBv1.0 mesajları her zaman etiketlere çözülür. Bilinmeyen alias içeren "
+                                      "DATA mesajında cihazdan NCMD ile BIRTH mesajlarını yeniden ister")
+        self.rebirth_check.toggled.connect(self.set_request_rebirth)
+        btn_layout.addWidget(self.rebirth_check)
+        layout.addLayout(btn_layout)
+
+        self.mapping_table = QTableWidget()
+        self.mapping_table.setColumnCount(3)
+        self.mapping_table.setHorizontalHeaderLabels(["Topic Filtresi", "Etiket", "JSON Yolu"])
+        self.mapping_table.horizontalHeaderItem(0).setToolTip("MQTT topic filtresi, + ve # kullanılabilir")
+        self.mapping_table.horizontalHeaderItem(1).setToolTip(
+            "Etiket adı; {1}, {2}... joker karakterlerin eşleştiği seviyeler, {topic} topic'in kendisi. "
+            "Boşsa topic adı kullanılır")
+        self.mapping_table.horizontalHeaderItem(2).setToolTip(
+            "JSON mesajdan okunacak alan, örn. $.values.temp veya values[0]. values.* her alanı ayrı etiket "
+            "olarak yayınlar ({key}). Boşsa mesajın kendisi yayınlanır")
+        self.mapping_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.mapping_table.setMaximumHeight(150)
+        layout.addWidget(self.mapping_table)
+        self.ui.mqttLayout.addWidget(group)
+
+        btn_add.clicked.connect(lambda: self.add_mapping_row())
+        btn_remove.clicked.connect(self.remove_mapping_row)
+        self.mapping_table.itemChanged.connect(self.update_mapper)
+
+    def set_request_rebirth(self, enabled):
+        if self.worker:
+            self.worker.request_rebirth = enabled
+
+    def add_mapping_row(self, topic_filter="", tag="", path=""):
+        self.mapping_table.blockSignals(True)
+        row = self.mapping_table.rowCount()
+        self.mapping_table.insertRow(row)
+        for col, text in enumerate((topic_filter, tag, path)):
+            self.mapping_table.setItem(row, col, QTableWidgetItem(text))
+        self.mapping_table.blockSignals(False)
+
+    def remove_mapping_row(self):
+        row = self.mapping_table.currentRow()
+        if row >= 0:
+            self.mapping_table.removeRow(row)
+            self.update_mapper()
+
+    def mappings(self):
+        rows = []
+        for row in range(self.mapping_table.rowCount()):
+            cells = [self.mapping_table.item(row, col) for col in range(3)]
+            rows.append([cell.text().strip() if cell else "" for cell in cells])
+        return rows
+
+    def update_mapper(self):
+        """Eşlemelerden yeni bir TopicMapper derler ve çalışan bağlantıya verir."""
+        mappings = [TopicMapping(*row) for row in self.mappings() if row[0]]
+        self.mapper = TopicMapper(mappings) if mappings else None
+        for mapping in self.mapper.invalid if self.mapper else ():
+            self.log_message.emit(f"MQTT Hata: Geçersiz eşleme '{mapping.topic_filter}' {mapping.path}, atlandı.")
+        if self.worker:
+            self.worker.mapper = self.mapper
 
     def _connect_signals(self):
         """Connects UI signals to handler methods."""
@@ -116,15 +963,28 @@ class MqttHandler(ProtocolHandlerBase):
         pwd = self.ui.mqttPassEdit.text()
 
         self.thread = QThread()
-        self.worker = MqttWorker(broker, port, user, pwd)
+        self.worker = MqttWorker(broker, port, user, pwd, self.latency_spin.value() / 1000)
+        self.worker.mapper = self.mapper
+        self.worker.request_rebirth = self.rebirth_check.isChecked()
+        self.configure_publish()
+        spool_dir = self.spool_edit.text().strip()
+        try:
+            self.worker.configure_spool(spool_dir, self.spool_size_spin.value() * 1024 * 1024,
+                                        self.drain_spin.value())
+        except OSError as e:
+            self.log_message.emit(f"MQTT Hata: Disk kuyruğu açılamadı ({spool_dir}): {e}")
+        if self.worker.spool is not None and len(self.worker.spool):
+            self.log_message.emit(f"MQTT: Disk kuyruğunda {len(self.worker.spool)} mesaj gönderilmeyi bekliyor.")
         self.worker.moveToThread(self.thread)
 
         # Connect worker signals to handler slots
         self.worker.status_changed.connect(self.update_status)
-        self.worker.message_received.connect(self.add_message_to_table)
-        self.thread.started.connect(self.worker.connect_to_broker)
+        self.worker.messages_received.connect(self.on_messages)
+        self.worker.publish_stats.connect(self.on_publish_stats)
+        self.thread.started.connect(self.worker.run)
 
         self.thread.start()
+        self.frame_timer.start()
         self.ui.mqttConnectBtn.setText("Bağlantıyı Kes")
 
     def disconnect(self):
@@ -155,23 +1015,86 @@ class MqttHandler(ProtocolHandlerBase):
             topic = self.ui.mqttPublishTopicEdit.text()
             payload = self.ui.mqttPublishPayloadEdit.text()
             if topic:
-                self.worker.publish(topic, payload)
+                self.publish(topic, payload)
                 self.log_message.emit(f"'{topic}' konusuna mesaj gönderildi.")
             else:
                 self.log_message.emit("Yayınlamak için bir konu (topic) girin.")
 
+    def publish(self, topic, value, qos=None):
+        """Queues a message for the broker (used by the gateway); values that are not text are sent as JSON."""
+        if not self.worker:
+            self.log_message.emit(f"MQTT Hata: Bağlı değil, '{topic}' gönderilemedi.")
+            return
+        self.worker.publish(topic, value, qos)
+
+    def forward_sample(self, protocol, tag, value):
+        """Forwards a tag sample of another protocol to the forwarding topic."""
+        topic = self.forward_edit.text().strip()
+        if topic and self.worker:
+            self.worker.publish_tag(topic, tag, value)
+
+    def on_publish_stats(self, stats):
+        sent, acked, in_flight, queued, dropped, ack_time, spooled, spool_bytes = stats
+        text = f"gönderilen {sent}, onay bekleyen {in_flight}, sırada {queued}"
+        if spooled:
+            text += f", diskte {spooled} ({spool_bytes / 1048576:.1f} MB)"
+        if ack_time == ack_time:  # not NaN
+            text += f", onay {ack_time * 1000:.0f} ms"
+        if dropped:
+            text += f", düşen {dropped}"
+        self.out_stats_label.setText(text)
+
     def update_status(self, message, color):
         """Updates the status label in the UI."""
         self.log_message.emit(f"MQTT Durum: {message}")
 
-    def add_message_to_table(self, timestamp, topic, payload):
-        """Adds a new received message to the top of the table."""
-        from PyQt6.QtWidgets import QTableWidgetItem
-        tw = self.ui.mqttMessagesTable
-        tw.insertRow(0)
-        tw.setItem(0, 0, QTableWidgetItem(timestamp))
-        tw.setItem(0, 1, QTableWidgetItem(topic))
-        tw.setItem(0, 2, QTableWidgetItem(payload))
+    def on_messages(self, messages, samples):
+        """Receives a decoded batch: samples are published, messages wait for the next table frame."""
+        overflow = len(self.pending) + len(messages) - self.pending.maxlen
+        if overflow > 0:
+            self.message_model.dropped += overflow  # Evicted before they were ever shown
+        self.pending.extend(messages)
+        self.received += len(messages)
+        # Every message updates the topic cache, also the ones the history has no room for
+        new, evicted = self.topic_cache.update(messages, time.monotonic())
+        if new:
+            self.topic_model.add_topics(new)
+        if evicted:
+            self.topic_model.remove_topics(evicted)
+        self.topic_model.mark_updated(messages)
+        for tag, value in samples:
+            self.data_received.emit("MQTT", tag, value)
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()  # Last batches after a disconnect
+
+    def flush_messages(self):
+        """Adds the messages queued since the last frame and updates the counters."""
+        if self.pending:
+            self.message_model.append_messages(list(self.pending))
+            self.pending.clear()
+        elif self.worker is None:
+            self.frame_timer.stop()
+
+        now = time.monotonic()
+        second = now - self.rate_time >= 1.0
+        self.topic_model.refresh(everything=second)  # Rates decay once a second without new messages
+        if second:
+            cache = self.topic_cache
+            self.cache_label.setText(f"{len(cache)} topic, {cache.bytes / 1048576:.1f} MB"
+                                     + (f", çıkarılan {cache.evicted}" if cache.evicted else ""))
+            rate = (self.received - self.rate_count) / (now - self.rate_time)
+            self.rate_count, self.rate_time = self.received, now
+            dropped = self.message_model.dropped + (self.worker.dropped if self.worker else 0)
+            self.rate_label.setText(f"{rate:.0f} msg/s | gösterilmeyen: {dropped}")
+
+    def set_capacity(self, capacity):
+        self.flush_messages()
+        self.pending = deque(maxlen=capacity)
+        self.message_model.set_capacity(capacity)
+
+    def set_latency(self, ms):
+        if self.worker:
+            self.worker.max_latency = ms / 1000
 
     def get_status(self) -> str:
         """Returns the current connection status."""
@@ -186,6 +1109,20 @@ class MqttHandler(ProtocolHandlerBase):
             "pass": self.ui.mqttPassEdit.text(),
             "sub_topic": self.ui.mqttSubscribeTopicEdit.text(),
             "pub_topic": self.ui.mqttPublishTopicEdit.text(),
+            "max_rows": self.capacity_spin.value(),
+            "cache_mb": self.cache_spin.value(),
+            "batch_ms": self.latency_spin.value(),
+            "qos": self.qos_combo.currentText(),
+            "inflight": self.window_spin.value(),
+            "forward_topic": self.forward_edit.text(),
+            "out_batch": self.batch_combo.currentText(),
+            "out_batch_ms": self.batch_spin.value(),
+            "spool_dir": self.spool_edit.text(),
+            "spool_mb": self.spool_size_spin.value(),
+            "drain_rate": self.drain_spin.value(),
+            "sparkplug_rebirth": self.rebirth_check.isChecked(),
+            "mappings": [{"filter": topic_filter, "tag": tag, "path": path}
+                         for topic_filter, tag, path in self.mappings()],
         }
 
     def deserialize(self, data: dict):
@@ -195,4 +1132,20 @@ class MqttHandler(ProtocolHandlerBase):
         self.ui.mqttUserEdit.setText(data.get("user", ""))
         self.ui.mqttPassEdit.setText(data.get("pass", ""))
         self.ui.mqttSubscribeTopicEdit.setText(data.get("sub_topic", "#"))
-        self.ui.mqttPublishTopicEdit.setText(data.get("pub_topic", "test/topic"))
\ No newline at end of file
+        self.ui.mqttPublishTopicEdit.setText(data.get("pub_topic", "test/topic"))
+        self.capacity_spin.setValue(data.get("max_rows", 10000))
+        self.cache_spin.setValue(data.get("cache_mb", 64))
+        self.latency_spin.setValue(data.get("batch_ms", 50))
+        self.qos_combo.setCurrentText(data.get("qos", "0"))
+        self.window_spin.setValue(data.get("inflight", 20))
+        self.forward_edit.setText(data.get("forward_topic", ""))
+        self.batch_combo.setCurrentText(data.get("out_batch", "Kapalı"))
+        self.batch_spin.setValue(data.get("out_batch_ms", 1000))
+        self.spool_edit.setText(data.get("spool_dir", ""))
+        self.spool_size_spin.setValue(data.get("spool_mb", 256))
+        self.drain_spin.setValue(data.get("drain_rate", 500))
+        self.rebirth_check.setChecked(data.get("sparkplug_rebirth", False))
+        self.mapping_table.setRowCount(0)
+        for mapping in data.get("mappings", []):
+            self.add_mapping_row(mapping.get("filter", ""), mapping.get("tag", ""), mapping.get("path", ""))
+        self.update_mapper()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Outbound MQTT publishing: QoS in-flight window and batched tag payloads.
+
+QoS 1 and 2 messages are sent only while fewer than ``size`` of them wait for
+the broker's acknowledgement, so a slow link fills the local queue instead of
+the broker's session. Tag updates can be packed per topic and interval into
+one payload, which keeps thousands of tags per second down to a few messages:
+
+JSON: ``{"ts": <ms>, "values": {"<tag>": <value>, ...}}``
+
+Binary (big-endian): ``u64 ts (ms) | u16 count | count x (u16 name length,
+UTF-8 name, f64 value)``; only numeric and boolean values are packed, the
+others are counted in ``TagBatcher.skipped``.
+
+Sparkplug B: one metric per tag, see ``protocols.sparkplug``. On a
+``spBv1.0/<group>/DDATA/<node>/<device>`` (or NDATA) topic the births are sent
+first and DATA messages carry metric aliases only.
+"""
+import math
+import struct
+import time
+
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=str)
+except ImportError:  # orjson is optional, the standard encoder is used without it
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+BATCH_FORMATS = ("JSON", "Binary", "Sparkplug B")
+
+_HEADER = struct.Struct(">QH")
+_NAME = struct.Struct(">H")
+_VALUE = struct.Struct(">d")
+
+
+def encode_value(value):
+    """Payload of a single value: text as UTF-8, numbers as text, anything else as JSON."""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, (int, float)):
+        return str(value).encode()
+    return dumps(value)
+
+
+def pack_json(timestamp, values):
+    return dumps({"ts": timestamp, "values": values})
+
+
+def pack_binary(timestamp, values):
+    records = []
+    for tag, value in values.items():
+        if isinstance(value, (int, float)):
+            name = tag.encode()
+            records.append(_NAME.pack(len(name)) + name + _VALUE.pack(value))
+    return _HEADER.pack(timestamp, len(records)) + b"".join(records)
+
+
+def unpack_binary(payload):
+    """Returns ``(timestamp, {tag: value})`` of a binary batch."""
+    timestamp, count = _HEADER.unpack_from(payload)
+    pos = _HEADER.size
+    values = {}
+    for _ in range(count):
+        (length,) = _NAME.unpack_from(payload, pos)
+        pos += _NAME.size
+        name = payload[pos:pos + length].decode()
+        pos += length
+        (values[name],) = _VALUE.unpack_from(payload, pos)
+        pos += _VALUE.size
+    return timestamp, values
+
+
+class TagBatcher:
+    """Keeps the last value of every tag per topic until the next batch is packed.
+
+    The Sparkplug B format needs the ``SparkplugEncoder`` of the connection,
+    which keeps the aliases and sequence numbers of the edge nodes.
+    """
+
+    def __init__(self, fmt="JSON", sparkplug=None):
+        if fmt not in BATCH_FORMATS:
+            raise ValueError(f"Unknown batch format '{fmt}'")
+        self.pack = {"JSON": pack_json, "Binary": pack_binary}.get(fmt)
+        self.sparkplug = sparkplug if fmt == "Sparkplug B" else None
+        if self.pack is None and self.sparkplug is None:
+            raise ValueError("Sparkplug B batches need a SparkplugEncoder")
+        self.topics = {}
+        self.skipped = 0  # Updates the format cannot carry
+
+    def add(self, topic, tag, value):
+        if self.pack is pack_binary and not isinstance(value, (int, float)):
+            self.skipped += 1
+            return
+        self.topics.setdefault(topic, {})[tag] = value
+
+    def take(self, timestamp=None):
+        """Returns ``(topic, payload)`` per topic with updates (and Sparkplug births) and starts a new batch."""
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        if self.sparkplug is not None:
+            batches = []
+            for topic, values in self.topics.items():
+                batches.extend(self.sparkplug.encode(topic, values, timestamp))
+        else:
+            batches = [(topic, self.pack(timestamp, values)) for topic, values in self.topics.items()]
+        self.topics = {}
+        return batches
+
+
+class InFlightWindow:
+    """QoS 1/2 publishes waiting for their acknowledgement.
+
+    Holds the ``MQTTMessageInfo`` of every unacknowledged publish; ``sweep``
+    retires the acknowledged ones. Only used from the thread that publishes.
+    """
+
+    def __init__(self, size=20):
+        self.size = size
+        self.pending = []  # (MQTTMessageInfo, sent time)
+        self.acked = 0
+        self._ack_time = 0.0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def full(self):
+        return len(self.pending) >= self.size
+
+    def sent(self, info, now):
+        self.pending.append((info, now))
+
+    def sweep(self, now):
+        """Drops acknowledged messages; returns how many were acknowledged."""
+        waiting = [(info, sent) for info, sent in self.pending if not info.is_published()]
+        done = len(self.pending) - len(waiting)
+        if done:
+            for info, sent in self.pending:
+                if info.is_published():
+                    self._ack_time += now - sent
+            self.acked += done
+            self.pending = waiting
+        return done
+
+    def clear(self):
+        self.pending = []
+
+    def take_ack_time(self):
+        """Average acknowledgement time (s) since the last call, NaN without acks."""
+        average = self._ack_time / self.acked if self.acked else math.nan
+        self._ack_time = 0.0
+        self.acked = 0
+        return average
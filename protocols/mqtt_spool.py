@@ -0,0 +1,233 @@
+"""Disk-backed store-and-forward queue for outbound MQTT messages.
+
+While the broker is unreachable, outbound messages are appended to segment
+files in a spool directory instead of being dropped, and are replayed in order
+once the connection is back. Segments are only ever appended to; replay reads
+the oldest segment through a memory map and deletes it once it is fully sent.
+The spool has a size cap: when it is exceeded the oldest segment is deleted,
+read or not, and its unsent messages are counted as evicted.
+
+Segment files are named ``<sequence>.seg`` and hold records of
+
+``u32 crc32 | u32 payload length | u16 topic length | u8 qos | topic | payload``
+
+(big-endian, the CRC covers everything after it). The replay position is
+saved to ``cursor`` on ``flush``, so after a restart the spool resumes where
+it stopped; messages sent since the last flush are sent again (at least once).
+A record cut short by a crash ends its segment.
+"""
+from collections import deque
+import mmap
+import os
+import struct
+import zlib
+
+_RECORD = struct.Struct(">IIHB")
+_CURSOR = struct.Struct(">QQ")
+SEGMENT_SUFFIX = ".seg"
+
+
+def pack_record(topic, payload, qos):
+    topic = topic.encode()
+    body = _RECORD.pack(0, len(payload), len(topic), qos)[4:] + topic + payload
+    return struct.pack(">I", zlib.crc32(body)) + body
+
+
+def scan_records(buffer, start=0, end=None):
+    """Yields ``(offset, next offset)`` of the valid records in ``buffer[start:end]``."""
+    end = len(buffer) if end is None else end
+    pos = start
+    while pos + _RECORD.size <= end:
+        crc, payload_len, topic_len, _ = _RECORD.unpack_from(buffer, pos)
+        stop = pos + _RECORD.size + topic_len + payload_len
+        if stop > end or zlib.crc32(buffer[pos + 4:stop]) != crc:
+            return
+        yield pos, stop
+        pos = stop
+
+
+def unpack_record(buffer, pos):
+    """Returns ``(topic, payload, qos, next offset)`` of the record at ``pos``."""
+    _, payload_len, topic_len, qos = _RECORD.unpack_from(buffer, pos)
+    pos += _RECORD.size
+    topic = bytes(buffer[pos:pos + topic_len]).decode()
+    pos += topic_len
+    return topic, bytes(buffer[pos:pos + payload_len]), qos, pos + payload_len
+
+
+class _Segment:
+    __slots__ = ("sequence", "path", "size", "count")
+
+    def __init__(self, sequence, path, size=0, count=0):
+        self.sequence = sequence
+        self.path = path
+        self.size = size    # bytes of valid records
+        self.count = count  # records
+
+
+class MessageSpool:
+    """Append-only segment files replayed oldest first.
+
+    Not thread-safe: appends and replay must come from one thread.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, segment_bytes=4 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # At least a few segments fit under the cap, so eviction frees space in small steps
+        self.segment_bytes = max(64 * 1024, min(segment_bytes, max_bytes // 4))
+        self.segments = deque()
+        self.evicted = 0   # unsent messages deleted by the size cap
+        self._bytes = 0
+        self._unread = 0
+        self._writer = None
+        # Replay position in the oldest segment
+        self._offset = 0
+        self._read = 0
+        self._map = None
+        self._next = None  # (topic, payload, qos, next offset) of the peeked record
+        self._sequence = 0  # of the next segment; never reused, the cursor refers to it
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        """Messages not yet sent."""
+        return self._unread
+
+    @property
+    def size(self):
+        """Bytes on disk."""
+        return self._bytes
+
+    def _segment_path(self, sequence):
+        return os.path.join(self.directory, f"{sequence:012d}{SEGMENT_SUFFIX}")
+
+    def _load(self):
+        """Recovers the segments and the replay position of a previous run."""
+        sequences = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                           if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+        cursor = (0, 0)
+        try:
+            with open(os.path.join(self.directory, "cursor"), "rb") as f:
+                cursor = _CURSOR.unpack(f.read(_CURSOR.size))
+        except (OSError, struct.error):
+            pass
+
+        self._sequence = max(sequences[-1] if sequences else 0, cursor[0]) + 1
+        for sequence in sequences:
+            path = self._segment_path(sequence)
+            if sequence < cursor[0]:
+                os.remove(path)  # Sent before the last cursor was saved
+                continue
+            segment = _Segment(sequence, path)
+            read = 0
+            with open(path, "rb") as f:
+                data = f.read()
+            for start, stop in scan_records(data):
+                segment.size = stop
+                segment.count += 1
+                if sequence == cursor[0] and stop <= cursor[1]:
+                    read += 1
+            if segment.size < len(data):
+                with open(path, "r+b") as f:
+                    f.truncate(segment.size)  # Cut-off record of a crash
+            if not self.segments and sequence == cursor[0]:
+                self._offset = min(cursor[1], segment.size)
+                self._read = read
+            self.segments.append(segment)
+            self._bytes += segment.size
+            self._unread += segment.count
+        self._unread -= self._read
+
+    def append(self, topic, payload, qos=0):
+        record = pack_record(topic, payload, qos)
+        if self._writer is None or self.segments[-1].size + len(record) > self.segment_bytes:
+            self._roll()
+        self._writer.write(record)
+        segment = self.segments[-1]
+        segment.size += len(record)
+        segment.count += 1
+        self._bytes += len(record)
+        self._unread += 1
+        while self._bytes > self.max_bytes and len(self.segments) > 1:
+            self._evict()
+
+    def _roll(self):
+        """Starts a new segment for appends."""
+        if self._writer is not None:
+            self._writer.close()
+        segment = _Segment(self._sequence, self._segment_path(self._sequence))
+        self._sequence += 1
+        self.segments.append(segment)
+        self._writer = open(segment.path, "ab")
+
+    def _evict(self):
+        """Deletes the oldest segment to stay under the size cap."""
+        segment = self.segments[0]
+        self.evicted += segment.count - self._read
+        self._unread -= segment.count - self._read
+        self._drop_oldest()
+
+    def _drop_oldest(self):
+        segment = self.segments.popleft()
+        self._close_map()
+        self._offset = 0
+        self._read = 0
+        self._next = None
+        self._bytes -= segment.size
+        if not self.segments and self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        os.remove(segment.path)
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def peek(self):
+        """Returns ``(topic, payload, qos)`` of the oldest unsent message, or None."""
+        if self._next is not None:
+            return self._next[:3]
+        while self.segments:
+            segment = self.segments[0]
+            if self._offset < segment.size:
+                if self._map is None or len(self._map) < segment.size:
+                    if self._writer is not None and segment is self.segments[-1]:
+                        self._writer.flush()  # The segment still being appended to
+                    self._close_map()
+                    with open(segment.path, "rb") as f:
+                        self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._next = unpack_record(self._map, self._offset)
+                return self._next[:3]
+            if segment is self.segments[-1]:
+                return None  # Everything sent; the segment is kept for further appends
+            self._drop_oldest()
+        return None
+
+    def advance(self):
+        """Marks the message returned by ``peek`` as sent."""
+        if self._next is None:
+            return
+        self._offset = self._next[3]
+        self._read += 1
+        self._unread -= 1
+        self._next = None
+
+    def flush(self):
+        """Writes appended records through to the files and saves the replay position."""
+        if self._writer is not None:
+            self._writer.flush()
+        if not self.segments:
+            return
+        path = os.path.join(self.directory, "cursor")
+        with open(path + ".tmp", "wb") as f:
+            f.write(_CURSOR.pack(self.segments[0].sequence, self._offset))
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        self.flush()
+        self._close_map()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
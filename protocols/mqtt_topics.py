@@ -0,0 +1,269 @@
+"""Topic to tag mapping for received MQTT messages.
+
+A mapping pairs a topic filter (with the ``+`` and ``#`` wildcards) with a tag
+name. The filters are kept in a trie keyed by topic level, so a topic is
+matched by walking its levels instead of testing every filter, and recent
+topics are answered from a small LRU cache.
+
+The tag name may refer to the levels matched by the wildcards as ``{1}``,
+``{2}``, ... (``#`` captures the rest of the topic) and to the whole topic as
+``{topic}``; an empty tag name uses the topic itself. For example
+``plant/+/temp`` -> ``{1}.temp`` turns ``plant/line1/temp`` into
+``line1.temp``.
+
+A mapping with a JSON path extracts fields from JSON payloads instead of
+publishing the payload itself. Paths are dotted keys with optional indexes,
+e.g. ``$.values.temp`` or ``values[0]``; a ``*`` step (``values.*``) yields
+one sample per key or element, named ``<tag>.<key>`` or wherever the tag puts
+``{key}``. Paths are compiled once, and a payload is parsed once for all the
+mappings it matches.
+"""
+from collections import OrderedDict
+import re
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # orjson is optional, the standard parser is used without it
+    import json
+    loads = json.loads
+
+_PLACEHOLDER_RE = re.compile(r"\{(topic|\d+)\}")
+_STEP_RE = re.compile(r"\.?([^.\[\]]+)|\[(\d+|\*)\]")
+WILDCARD = object()
+_UNPARSED = object()
+
+
+def compile_path(text):
+    """Compiles a JSON path into a tuple of key, index and WILDCARD steps.
+
+    Returns None for an empty path, raises ValueError for an invalid one.
+    """
+    text = text.strip()
+    if text.startswith("$"):
+        text = text[1:]
+    if not text:
+        return None
+    steps = []
+    pos = 0
+    while pos < len(text):
+        m = _STEP_RE.match(text, pos)
+        if not m or (m.group(1) is not None and pos and text[pos] != "."):
+            raise ValueError(f"Invalid JSON path '{text}'")
+        key, index = m.group(1), m.group(2)
+        if key is not None:
+            steps.append(WILDCARD if key == "*" else key)
+        else:
+            steps.append(WILDCARD if index == "*" else int(index))
+        pos = m.end()
+    return tuple(steps)
+
+
+def extract(document, steps):
+    """Returns ``(keys, value)`` for the scalar values ``steps`` reach in ``document``.
+
+    ``keys`` holds the keys (or indexes) taken by the wildcard steps.
+    """
+    nodes = [((), document)]
+    for step in steps:
+        found = []
+        for keys, node in nodes:
+            if step is WILDCARD:
+                if isinstance(node, dict):
+                    found.extend((keys + (str(k),), v) for k, v in node.items())
+                elif isinstance(node, list):
+                    found.extend((keys + (str(k),), v) for k, v in enumerate(node))
+            elif isinstance(step, int):
+                if isinstance(node, list) and step < len(node):
+                    found.append((keys, node[step]))
+            elif isinstance(node, dict) and step in node:
+                found.append((keys, node[step]))
+        nodes = found
+    return [(keys, value) for keys, value in nodes if value is not None and not isinstance(value, (dict, list))]
+
+
+class TopicMapping:
+    """One topic filter, the tag name its messages are published under and an optional JSON path."""
+
+    __slots__ = ("topic_filter", "tag", "path", "steps")
+
+    def __init__(self, topic_filter, tag="", path=""):
+        self.topic_filter = topic_filter
+        self.tag = tag
+        self.path = path
+        self.steps = None  # compiled path, set by TopicMapper
+
+    def tag_name(self, topic, captures):
+        if not self.tag:
+            return topic
+
+        def replace(m):
+            key = m.group(1)
+            if key == "topic":
+                return topic
+            k = int(key) - 1
+            return captures[k] if 0 <= k < len(captures) else m.group(0)
+
+        return _PLACEHOLDER_RE.sub(replace, self.tag)
+
+    def sample_name(self, tag, keys):
+        """Name of a value extracted with the JSON path; ``keys`` are the wildcard keys."""
+        if not self.tag:
+            # Named after the topic and the path taken, e.g. "dev1/data/values.temp"
+            keys = iter(keys)
+            return tag + "/" + ".".join(next(keys) if step is WILDCARD else str(step) for step in self.steps)
+        if "{key}" in tag:
+            return tag.replace("{key}", ".".join(keys))
+        return f"{tag}.{'.'.join(keys)}" if keys else tag
+
+    def __repr__(self):
+        path = f" [{self.path}]" if self.path else ""
+        return f"TopicMapping({self.topic_filter!r} -> {self.tag!r}{path})"
+
+
+def validate_filter(topic_filter):
+    """Raises ValueError unless ``topic_filter`` is a valid MQTT topic filter."""
+    if not topic_filter:
+        raise ValueError("Empty topic filter")
+    levels = topic_filter.split("/")
+    for i, level in enumerate(levels):
+        if ("+" in level or "#" in level) and len(level) > 1:
+            raise ValueError(f"Wildcard must fill a whole level in '{topic_filter}'")
+        if level == "#" and i != len(levels) - 1:
+            raise ValueError(f"'#' must be the last level in '{topic_filter}'")
+    return levels
+
+
+class _Node:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children = {}
+        self.values = []
+
+
+class TopicTrie:
+    """Topic filters stored level by level.
+
+    ``match`` costs one dictionary lookup per topic level for every path that
+    can still match, independent of the number of filters.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.size = 0
+
+    def insert(self, topic_filter, value):
+        node = self.root
+        for level in validate_filter(topic_filter):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _Node()
+            node = child
+        node.values.append(value)
+        self.size += 1
+
+    def match(self, topic):
+        """Returns ``(value, captures)`` for every filter matching ``topic``.
+
+        ``captures`` holds the topic levels matched by the filter's wildcards.
+        Topics starting with ``$`` are not matched by a leading wildcard.
+        """
+        levels = topic.split("/")
+        last = len(levels)
+        results = []
+        stack = [(self.root, 0, ())]
+        while stack:
+            node, i, captures = stack.pop()
+            children = node.children
+            multi = children.get("#")
+            if i == last:
+                results.extend((value, captures) for value in node.values)
+                if multi is not None:
+                    # "a/#" also matches "a"
+                    results.extend((value, captures + ("",)) for value in multi.values)
+                continue
+            level = levels[i]
+            child = children.get(level)
+            if child is not None:
+                stack.append((child, i + 1, captures))
+            if i == 0 and level.startswith("$"):
+                continue
+            single = children.get("+")
+            if single is not None:
+                stack.append((single, i + 1, captures + (level,)))
+            if multi is not None:
+                rest = "/".join(levels[i:])
+                results.extend((value, captures + (rest,)) for value in multi.values)
+        return results
+
+
+class TopicMapper:
+    """Resolves topics to ``(mapping, tag)`` pairs through a TopicTrie and an LRU cache."""
+
+    def __init__(self, mappings, cache_size=4096):
+        self.trie = TopicTrie()
+        self.invalid = []  # mappings with an invalid topic filter
+        for mapping in mappings:
+            try:
+                mapping.steps = compile_path(mapping.path)
+                self.trie.insert(mapping.topic_filter, mapping)
+            except ValueError:
+                self.invalid.append(mapping)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return self.trie.size
+
+    def resolve(self, topic):
+        targets = self._cache.get(topic)
+        if targets is not None:
+            self._cache.move_to_end(topic)
+            return targets
+        targets = tuple((mapping, mapping.tag_name(topic, captures))
+                        for mapping, captures in self.trie.match(topic))
+        self._cache[topic] = targets
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return targets
+
+    def samples(self, topic, payload):
+        """``(tag, value)`` samples of a message with the raw ``payload`` bytes."""
+        targets = self.resolve(topic)
+        if not targets:
+            return []
+        samples = []
+        text = document = _UNPARSED
+        for mapping, tag in targets:
+            if mapping.steps is None:
+                if text is _UNPARSED:
+                    try:
+                        text = parse_value(payload.decode("utf-8"))
+                    except UnicodeDecodeError:
+                        text = None
+                if text is not None:
+                    samples.append((tag, text))
+                continue
+            if document is _UNPARSED:
+                try:
+                    document = loads(payload)
+                except ValueError:  # also covers orjson.JSONDecodeError and bad UTF-8
+                    document = None
+            if document is not None:
+                samples.extend((mapping.sample_name(tag, keys), value)
+                               for keys, value in extract(document, mapping.steps))
+        return samples
+
+
+def parse_value(text):
+    """Numbers in a payload become int or float samples, anything else stays text."""
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
@@ -1,23 +1,648 @@
 import snap7
 from snap7.util import *
-from PyQt6.QtCore import QTimer
-from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal, QAbstractTableModel, QModelIndex, Qt, QEvent
+from PyQt6.QtWidgets import (QTableWidget, QTableWidgetItem, QHeaderView, QLabel, QSpinBox, QCheckBox,
+                             QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, QTableView, QComboBox,
+                             QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication)
 from .base_handler import ProtocolHandlerBase
+from .s7_planner import ChangeFilter, S7TagPlan, max_block_size, parse_address, split_plc
+from .s7_types import load_udts, parse_type, udts_from_dict, udts_to_dict
+import ctypes
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from snap7.type import Area, S7DataItem, WordLen
+except ImportError:  # python-snap7 < 2.0
+    from snap7.types import Areas as Area, S7DataItem, WordLen
+
+# Planner area codes -> Snap7 areas
+S7_AREAS = {"DB": Area.DB, "M": Area.MK, "I": Area.PE, "Q": Area.PA}
+
+# python-snap7 3.x is a pure Python client without the Snap7 library: its read_multi_vars
+# reads an S7DataItem array with one read_area per item and never sets the item results
+NATIVE_SNAP7 = int(getattr(snap7, "__version__", "2").split(".")[0]) < 3
+
+
+def connect_client(ip, rack, slot, port=102):
+    """Creates a Snap7 client and connects it. Raises on failure."""
+    client = snap7.client.Client()
+    if port != 102:
+        c_port = ctypes.c_int(port)
+        client._lib.Cli_SetParam(client._s7_client, 2, ctypes.byref(c_port))
+    client.connect(ip, rack, slot)
+    return client
+
+
+def read_multi(client, blocks):
+    """Reads a list of planned blocks with a single read_multi_vars request.
+
+    Returns ``(buffers, requests sent)``: one bytearray per block, or None for
+    blocks the PLC rejected. Without the Snap7 library every block is a
+    request of its own.
+    """
+    if len(blocks) == 1 or not NATIVE_SNAP7:
+        return [client.read_area(S7_AREAS[block.area], block.db_number, block.start, block.size)
+                for block in blocks], len(blocks)
+
+    items = (S7DataItem * len(blocks))()
+    buffers = []
+    for item, block in zip(items, blocks):
+        item.Area = S7_AREAS[block.area].value
+        item.WordLen = WordLen.Byte.value
+        item.Result = 0
+        item.DBNumber = block.db_number
+        item.Start = block.start
+        item.Amount = block.size
+        buf = ctypes.create_string_buffer(block.size)
+        item.pData = ctypes.cast(ctypes.pointer(buf), ctypes.POINTER(ctypes.c_uint8))
+        buffers.append(buf)
+
+    client.read_multi_vars(items)
+    return [bytearray(buf.raw) if item.Result == 0 else None for item, buf in zip(items, buffers)], 1
+
+
+def write_value(client, area, db_number, byte_offset, bit_offset, data):
+    """Writes a tag value; ``data`` is a bool for Bool tags, bytes otherwise."""
+    if isinstance(data, bool):
+        # Read-modify-write so the other bits of the byte are kept
+        buf = client.read_area(S7_AREAS[area], db_number, byte_offset, 1)
+        snap7.util.set_bool(buf, 0, bit_offset, data)
+    else:
+        buf = bytearray(data)
+    client.write_area(S7_AREAS[area], db_number, byte_offset, buf)
+
+
+class S7Worker(QThread):
+    """Polls a PLC on its own thread with its own Snap7 client.
+
+    Subclasses implement poll(); whatever it returns is emitted as one
+    data_ready batch per cycle. Writes are queued and run between cycles.
+    """
+    connected = pyqtSignal(int)  # negotiated PDU length
+    data_ready = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+    write_done = pyqtSignal(str)
+
+    def __init__(self, params, parent=None):
+        super().__init__(parent)
+        self.params = params
+        self.running = False
+        self.client = None
+        self._stop_event = threading.Event()
+        self._writes = queue.Queue()
+
+    def run(self):
+        self.running = True
+        try:
+            self.client = connect_client(
+                self.params["ip"], self.params["rack"], self.params["slot"], self.params["port"])
+        except Exception as e:
+            self.error_occurred.emit(f"Connection Error: {e}")
+            self.running = False
+            return
+        self.connected.emit(self.client.get_pdu_length())
+
+        interval = self.params["interval"] / 1000
+        while self.running:
+            started = time.monotonic()
+            self._run_writes()
+            try:
+                batch = self.poll()
+                if batch is not None:
+                    self.data_ready.emit(batch)
+            except Exception as e:
+                self.error_occurred.emit(f"Read Error: {e}")
+                if self.params.get("stop_on_error"):
+                    break
+            self._stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
+
+        self.close()
+        self.running = False
+
+    def poll(self):
+        return None
+
+    def close(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+
+    def queue_write(self, area, db_number, byte_offset, bit_offset, data, label):
+        """Queues a write; ``data`` is a bool for Bool tags, bytes otherwise."""
+        self._writes.put((area, db_number, byte_offset, bit_offset, data, label))
+
+    def _run_writes(self):
+        while True:
+            try:
+                area, db_number, byte_offset, bit_offset, data, label = self._writes.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                write_value(self.client, area, db_number, byte_offset, bit_offset, data)
+                self.write_done.emit(label)
+            except Exception as e:
+                self.error_occurred.emit(f"Write Error: {e}")
+
+
+class S7BlockReader:
+    """Reads large DB ranges in chunks sized to the negotiated PDU.
+
+    Snap7 clients are synchronous, so to keep several chunk requests in flight
+    the chunks are spread over ``depth`` connections to the same PLC, each read
+    on its own thread. With a depth of 1 the chunks are read back to back on
+    the given client. The extra connections are opened on first use.
+    """
+
+    def __init__(self, client, params, depth=1):
+        self.clients = [client]
+        self.params = params
+        self.depth = max(1, depth)
+        self.executor = None
+        self.chunk_count = 0
+        self.bytes_read = 0
+        self.elapsed = 0.0
+
+    @property
+    def kb_per_s(self):
+        """Throughput of the last read."""
+        return self.bytes_read / 1024 / self.elapsed if self.elapsed > 0 else 0.0
+
+    def read(self, db_number, start, size):
+        chunk = max_block_size(self.clients[0].get_pdu_length())
+        chunks = [(offset, min(chunk, start + size - offset)) for offset in range(start, start + size, chunk)]
+        buf = bytearray(size)
+
+        started = time.monotonic()
+        clients = self._connections() if len(chunks) > 1 else self.clients
+        if len(clients) == 1:
+            self._read_chunks(clients[0], db_number, start, chunks, buf)
+        else:
+            # Contiguous shares keep every connection streaming neighbouring chunks
+            share = -(-len(chunks) // len(clients))
+            futures = [
+                self.executor.submit(self._read_chunks, client, db_number, start,
+                                     chunks[i * share:(i + 1) * share], buf)
+                for i, client in enumerate(clients)
+            ]
+            for future in futures:
+                future.result()
+        self.elapsed = time.monotonic() - started
+        self.chunk_count = len(chunks)
+        self.bytes_read = size
+        return buf
+
+    @staticmethod
+    def _read_chunks(client, db_number, start, chunks, buf):
+        for offset, length in chunks:
+            buf[offset - start:offset - start + length] = client.db_read(db_number, offset, length)
+
+    def _connections(self):
+        while len(self.clients) < self.depth:
+            try:
+                self.clients.append(connect_client(
+                    self.params["ip"], self.params["rack"], self.params["slot"], self.params["port"]))
+            except Exception:
+                # The PLC refuses more connections; work with the ones we have
+                self.depth = len(self.clients)
+                break
+        if self.executor is None and len(self.clients) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.clients), thread_name_prefix="s7-block")
+        return self.clients
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        for client in self.clients[1:]:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+        del self.clients[1:]
+
+
+class S7BlockWorker(S7Worker):
+    """Reads a raw DB range every cycle.
+
+    The batch is ``(data, chunk_count, elapsed_s, kb_per_s)``.
+    """
+
+    def __init__(self, params, parent=None):
+        super().__init__(params, parent)
+        self.reader = None
+
+    def poll(self):
+        if self.reader is None:
+            self.reader = S7BlockReader(self.client, self.params, self.params.get("depth", 1))
+        reader = self.reader
+        data = reader.read(self.params["db_num"], self.params["start"], self.params["size"])
+        return data, reader.chunk_count, reader.elapsed, reader.kb_per_s
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+        super().close()
+
+
+class S7PlcPoller:
+    """One PLC of an S7ConnectionPool.
+
+    Owns its Snap7 client, compiled plan, change filter and write queue. cycle()
+    runs on a pool thread and is never run concurrently for the same PLC.
+    """
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        self.interval = params["interval"] / 1000
+        self.client = None
+        self.plan = None  # replaced from the GUI thread; attribute swap is atomic
+        self.next_due = 0.0
+        self.busy = False
+        self.backoff = 0.0
+        self._filter = None
+        self._writes = queue.Queue()
+
+    def queue_write(self, area, db_number, byte_offset, bit_offset, data, label):
+        self._writes.put((area, db_number, byte_offset, bit_offset, data, label))
+
+    def cycle(self, pool):
+        """Connects if needed, runs queued writes and reads the plan once."""
+        if self.client is None:
+            try:
+                self.client = connect_client(
+                    self.params["ip"], self.params["rack"], self.params["slot"], self.params["port"])
+            except Exception as e:
+                self.client = None
+                self.backoff = min(self.MAX_BACKOFF, max(1.0, self.backoff * 2))
+                pool.error_occurred.emit(
+                    f"PLC '{self.name}' Connection Error: {e} (retry in {self.backoff:.0f} s)")
+                return
+            self.backoff = 0.0
+            pool.connected.emit(self.name, self.client.get_pdu_length())
+
+        while True:
+            try:
+                area, db_number, byte_offset, bit_offset, data, label = self._writes.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                write_value(self.client, area, db_number, byte_offset, bit_offset, data)
+                pool.write_done.emit(label)
+            except Exception as e:
+                pool.error_occurred.emit(f"PLC '{self.name}' Write Error: {e}")
+
+        plan = self.plan
+        if plan is None:
+            return
+        if self._filter is None or self._filter.plan is not plan:
+            self._filter = ChangeFilter(plan)
+
+        results = []
+        sent = 0
+        for request in plan.requests:
+            try:
+                buffers, count = read_multi(self.client, request)
+                sent += count
+            except Exception:
+                buffers = [None] * len(request)
+                sent += 1
+            results.extend(plan.decode(request, buffers))
+
+        if not self.client.get_connected():
+            # Drop the connection so the next cycle reconnects
+            self.close()
+            pool.error_occurred.emit(f"PLC '{self.name}' connection lost")
+        pool.data_ready.emit((plan, plan.format(self._filter.filter(results, time.monotonic())), sent))
+
+    def close(self):
+        if self.client is not None:
+            try:
+                self.client.disconnect()
+            except Exception:
+                pass
+            self.client = None
+
+
+class S7ConnectionPool(QThread):
+    """Polls several PLCs in parallel, one Snap7 client per PLC.
+
+    Each PLC has its own interval and is scheduled on a thread pool with one
+    thread per PLC, so a PLC that hangs in a Snap7 timeout only delays itself.
+    A PLC whose previous cycle is still running is skipped, not queued up.
+    Batches are ``(plan, [(tag_index, value_str), ...], requests sent)``, one per PLC cycle.
+    """
+    connected = pyqtSignal(str, int)  # PLC name, negotiated PDU length
+    data_ready = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+    write_done = pyqtSignal(str)
+
+    def __init__(self, plcs, parent=None):
+        super().__init__(parent)
+        self.pollers = {name: S7PlcPoller(name, params) for name, params in plcs.items()}
+        self.running = False
+        self._wake = threading.Event()
+
+    def set_plan(self, name, plan):
+        poller = self.pollers.get(name)
+        if poller:
+            poller.plan = plan
+
+    def queue_write(self, name, area, db_number, byte_offset, bit_offset, data, label):
+        poller = self.pollers.get(name)
+        if poller is None:
+            self.error_occurred.emit(f"Write Error: Unknown PLC '{name}'")
+            return
+        poller.queue_write(area, db_number, byte_offset, bit_offset, data, label)
+
+    def run(self):
+        self.running = True
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.pollers)), thread_name_prefix="s7-pool")
+        try:
+            while self.running:
+                now = time.monotonic()
+                wait = 0.5
+                for poller in self.pollers.values():
+                    if poller.busy:
+                        continue
+                    if now >= poller.next_due:
+                        poller.busy = True
+                        executor.submit(self._run_cycle, poller)
+                    else:
+                        wait = min(wait, poller.next_due - now)
+                self._wake.wait(wait)
+                self._wake.clear()
+        finally:
+            executor.shutdown(wait=True)
+            for poller in self.pollers.values():
+                poller.close()
+            self.running = False
+
+    def _run_cycle(self, poller):
+        started = time.monotonic()
+        try:
+            poller.cycle(self)
+        except Exception as e:
+            self.error_occurred.emit(f"PLC '{poller.name}' Read Error: {e}")
+        # Fixed cadence from the cycle start; a failed connect waits for its backoff
+        poller.next_due = max(started + poller.interval, started + poller.backoff, time.monotonic())
+        poller.busy = False
+        self._wake.set()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+
+
+def changed_ranges(old, new, chunk=64):
+    """Returns ``(first, last)`` index runs where two equally sized buffers differ.
+
+    Buffers are compared chunk by chunk (a C level memcmp per slice), so only
+    chunks that actually changed are scanned byte by byte.
+    """
+    ranges = []
+    size = len(new)
+    for base in range(0, size, chunk):
+        end = min(base + chunk, size)
+        if old[base:end] == new[base:end]:
+            continue
+        for i in range(base, end):
+            if old[i] != new[i]:
+                if ranges and ranges[-1][1] == i - 1:
+                    ranges[-1][1] = i
+                else:
+                    ranges.append([i, i])
+    return ranges
+
+
+class S7RawDataModel(QAbstractTableModel):
+    """Table model over the raw bytes of a DB read.
+
+    Cell text is produced on demand, so the view only formats the rows it
+    shows. A new read only signals dataChanged for the byte runs that differ
+    from the previous one.
+    """
+    HEADERS = ["Offset (Dec)", "Offset (Hex)", "Value (Hex)", "Value (Dec)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.start = 0
+        self.data_bytes = bytearray()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.data_bytes)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        col = index.column()
+        if col == 0:
+            return f"{self.start + row}.0"
+        if col == 1:
+            return f"{self.start + row:X}.0"
+        if col == 2:
+            return f"{self.data_bytes[row]:02X}"
+        return str(self.data_bytes[row])
+
+    def update_data(self, data, start):
+        data = bytearray(data)
+        if start != self.start or len(data) != len(self.data_bytes):
+            self.beginResetModel()
+            self.start = start
+            self.data_bytes = data
+            self.endResetModel()
+            return
+
+        old = self.data_bytes
+        self.data_bytes = data
+        for first, last in changed_ranges(old, data):
+            self.dataChanged.emit(self.index(first, 2), self.index(last, 3))
+
+
+S7_TAG_TYPES = ["Bool", "Byte", "Int", "Word", "DInt", "DWord", "Real"]
+
+
+class S7TagModel(QAbstractTableModel):
+    """Tag list of the S7 tag monitor.
+
+    Each tag is a plain list of its cell texts; the type combo and the write
+    button are delegates, so a tag costs no widgets until it is edited.
+    ``definitions_changed`` fires when anything that affects the read plan
+    changes.
+    """
+    HEADERS = ["Offset", "Type", "Value", "Write Value", "Action", "Description", "Deadband"]
+    OFFSET, TYPE, VALUE, WRITE_VALUE, ACTION, DESCRIPTION, DEADBAND = range(7)
+    EDITABLE = (OFFSET, TYPE, WRITE_VALUE, DESCRIPTION, DEADBAND)
+    PLAN_COLUMNS = (OFFSET, TYPE, DEADBAND)
+
+    definitions_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tags = []
+
+    @staticmethod
+    def new_tag(offset="0.0", dtype="Bool", desc="", deadband="", write_value="0"):
+        return [offset, dtype, "-", write_value, "Write", desc, deadband]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tags)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole) and index.isValid():
+            return self.tags[index.row()][index.column()]
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() in self.EDITABLE:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or not index.isValid() or index.column() not in self.EDITABLE:
+            return False
+        tag = self.tags[index.row()]
+        value = str(value)
+        if tag[index.column()] == value:
+            return False
+        tag[index.column()] = value
+        self.dataChanged.emit(index, index)
+        if index.column() in self.PLAN_COLUMNS:
+            self.definitions_changed.emit()
+        return True
+
+    def append_tags(self, tags):
+        if not tags:
+            return
+        first = len(self.tags)
+        self.beginInsertRows(QModelIndex(), first, first + len(tags) - 1)
+        self.tags.extend(tags)
+        self.endInsertRows()
+        self.definitions_changed.emit()
+
+    def set_tags(self, tags):
+        self.beginResetModel()
+        self.tags = list(tags)
+        self.endResetModel()
+        self.definitions_changed.emit()
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or row < 0 or count <= 0 or row + count > len(self.tags):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self.tags[row:row + count]
+        self.endRemoveRows()
+        self.definitions_changed.emit()
+        return True
+
+    def set_values(self, updates):
+        """Sets the Value column from ``(row, text)`` pairs with a single dataChanged."""
+        if not updates:
+            return
+        tags = self.tags
+        first = last = updates[0][0]
+        for row, text in updates:
+            tags[row][self.VALUE] = text
+            if row < first:
+                first = row
+            elif row > last:
+                last = row
+        self.dataChanged.emit(self.index(first, self.VALUE), self.index(last, self.VALUE))
+
+
+class S7TypeDelegate(QStyledItemDelegate):
+    """Editable type combo, created only while a Type cell is being edited."""
+
+    def __init__(self, types, parent=None):
+        super().__init__(parent)
+        self.types = types  # callable returning the current type list
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.setEditable(True)  # Arrays are typed in, e.g. "Real[100]" or "Motor[4]"
+        combo.addItems(self.types())
+        combo.activated.connect(lambda _: self.commitData.emit(combo))
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data())
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText().strip())
+
+
+class S7ButtonDelegate(QStyledItemDelegate):
+    """Paints a push button in each cell and reports the clicked row."""
+
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index.row())
+            return True
+        return False
+
 
 class S7Handler(ProtocolHandlerBase):
     def __init__(self, ui):
         super().__init__(ui)
-        self.client = None
+        self.worker = None
         self.connected = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.read_data)
         self.ui.s7ConnectBtn.clicked.connect(self.toggle_connection)
 
-        # Setup Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Offset (Dec)", "Offset (Hex)", "Value (Hex)", "Value (Dec)"])
+        # Setup Table (model/view, so large DBs do not create a widget item per byte)
+        self.model = S7RawDataModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+
+        # Large reads: PDU sized chunks, optionally several in flight over extra connections
+        self.depth_spin = QSpinBox()
+        self.depth_spin.setRange(1, 8)
+        self.depth_spin.setValue(1)
+        self.depth_spin.setToolTip("Connections used to read chunks in parallel")
+        if hasattr(self.ui, 's7ReadSettingsLayout'):
+            self.ui.s7ReadSettingsLayout.addWidget(QLabel("Parallel Requests:"))
+            self.ui.s7ReadSettingsLayout.addWidget(self.depth_spin)
+        self.throughput_label = QLabel("")
 
         # Replace s7DataOutput with table
         # Note: s7DataOutput is now in s7BlockLayout (child of s7BlockTab)
@@ -32,20 +657,9 @@ class S7Handler(ProtocolHandlerBase):
                         layout.removeWidget(self.ui.s7DataOutput)
                         self.ui.s7DataOutput.setParent(None)
                         layout.insertWidget(index, self.table)
-
-    def ensure_client(self):
-        if self.client is None:
-            try:
-                self.client = snap7.client.Client()
-            except Exception as e:
-                self.log_message.emit(f"Failed to load Snap7 library: {e}. Ensure snap7.dll is available.")
-                return False
-        return True
+                        layout.insertWidget(index + 1, self.throughput_label)
 
     def connect(self):
-        if not self.ensure_client():
-            return
-
         ip = self.ui.s7IpEdit.text()
         try:
             rack = int(self.ui.s7RackEdit.text())
@@ -56,73 +670,72 @@ class S7Handler(ProtocolHandlerBase):
             return
 
         try:
-            # Set custom port if not 102
-            if port != 102:
-                import ctypes
-                c_port = ctypes.c_int(port)
-                self.client._lib.Cli_SetParam(self.client._s7_client, 2, ctypes.byref(c_port))
-            
-            self.client.connect(ip, rack, slot)
-            self.connected = self.client.get_connected()
-            if self.connected:
-                self.log_message.emit(f"S7 Connected to {ip}:{port} (Rack={rack}, Slot={slot})")
-                self.ui.s7ConnectBtn.setText("Disconnect")
-                self.start_reading()
-        except Exception as e:
-            self.log_message.emit(f"S7 Connection Error: {e}")
+            db_number = int(self.ui.s7DbNumEdit.text())
+            start = int(self.ui.s7StartEdit.text())
+            size = int(self.ui.s7SizeEdit.text())
+        except ValueError:
+            self.log_message.emit("S7 Error: DB, Start, and Size must be integers.")
+            return
+
+        try:
+            interval = int(self.ui.s7IntervalEdit.text())
+        except ValueError:
+            interval = 1000
+
+        params = {
+            "ip": ip, "rack": rack, "slot": slot, "port": port,
+            "db_num": db_number, "start": start, "size": size,
+            "interval": interval, "stop_on_error": True, "depth": self.depth_spin.value(),
+        }
+        self.worker = S7BlockWorker(params, self)
+        self.worker.connected.connect(self.on_connected)
+        self.worker.data_ready.connect(self.fill_table)
+        self.worker.error_occurred.connect(lambda x: self.log_message.emit(f"S7 {x}"))
+        self.worker.finished.connect(self.on_worker_finished)
+        self.worker.start()
+        self.ui.s7ConnectBtn.setText("Disconnect")
+        self.log_message.emit(f"S7 Connecting to {ip}:{port} (Rack={rack}, Slot={slot})...")
+
+    def on_connected(self, pdu_length):
+        if self.sender() is not self.worker:
+            return  # A worker stopped by Disconnect while it was still connecting
+        self.connected = True
+        params = self.worker.params
+        self.log_message.emit(
+            f"S7 Connected to {params['ip']}:{params['port']} "
+            f"(Rack={params['rack']}, Slot={params['slot']}, PDU={pdu_length})")
+
+    def on_worker_finished(self):
+        worker = self.sender()
+        worker.deleteLater()
+        if worker is self.worker:
+            # The worker gave up on its own (connection or read error)
+            self.worker = None
+            self.connected = False
+            self.ui.s7ConnectBtn.setText("Connect")
 
     def disconnect(self):
-        if self.connected:
-            self.client.disconnect()
+        if self.worker:
+            # Do not wait for the thread; a blocked Snap7 call must not freeze the GUI
+            self.worker.stop()
+            self.worker = None
             self.connected = False
-            self.stop_reading()
             self.ui.s7ConnectBtn.setText("Connect")
             self.log_message.emit("S7 Disconnected")
 
     def toggle_connection(self):
-        if self.connected:
+        if self.worker:
             self.disconnect()
         else:
             self.connect()
 
-    def start_reading(self):
-        try:
-            interval = int(self.ui.s7IntervalEdit.text())
-        except ValueError:
-            interval = 1000
-        self.timer.start(interval)
-
-    def stop_reading(self):
-        self.timer.stop()
-
-    def read_data(self):
-        if not self.connected:
-            return
-            
-        try:
-            db_number = int(self.ui.s7DbNumEdit.text())
-            start = int(self.ui.s7StartEdit.text())
-            size = int(self.ui.s7SizeEdit.text())
-            
-            # Read DB
-            data = self.client.db_read(db_number, start, size)
-            
-            # Update Table
-            self.table.setRowCount(len(data))
-            for i, b in enumerate(data):
-                offset_val = start + i
-                # Offset (Dec)
-                self.table.setItem(i, 0, QTableWidgetItem(f"{offset_val}.0"))
-                # Offset (Hex)
-                self.table.setItem(i, 1, QTableWidgetItem(f"{offset_val:X}.0"))
-                # Value (Hex)
-                self.table.setItem(i, 2, QTableWidgetItem(f"{b:02X}"))
-                # Value (Dec)
-                self.table.setItem(i, 3, QTableWidgetItem(str(b)))
-            
-        except Exception as e:
-            self.log_message.emit(f"S7 Read Error: {e}")
-            self.stop_reading()
+    def fill_table(self, data):
+        if self.sender() is not self.worker:
+            return  # Late batch from a worker that was already stopped
+        data, chunks, elapsed, kb_per_s = data
+        self.model.update_data(data, self.worker.params["start"])
+        self.throughput_label.setText(
+            f"{len(data)} bytes in {chunks} requests, {elapsed * 1000:.1f} ms ({kb_per_s:.1f} KB/s)")
 
     def get_status(self) -> str:
         return "Connected" if self.connected else "Disconnected"
@@ -136,7 +749,8 @@ class S7Handler(ProtocolHandlerBase):
             "db_num": self.ui.s7DbNumEdit.text(),
             "start": self.ui.s7StartEdit.text(),
             "size": self.ui.s7SizeEdit.text(),
-            "interval": self.ui.s7IntervalEdit.text()
+            "interval": self.ui.s7IntervalEdit.text(),
+            "depth": self.depth_spin.value()
         }
 
     def deserialize(self, data: dict):
@@ -148,15 +762,23 @@ class S7Handler(ProtocolHandlerBase):
         self.ui.s7StartEdit.setText(data.get("start", "0"))
         self.ui.s7SizeEdit.setText(data.get("size", "10"))
         self.ui.s7IntervalEdit.setText(data.get("interval", "1000"))
+        self.depth_spin.setValue(data.get("depth", 1))
 
 
 class S7TagHandler(ProtocolHandlerBase):
     def __init__(self, ui):
         super().__init__(ui)
-        self.client = None
+        self.pool = None
         self.connected = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.read_tags)
+        self.pdu_lengths = {}  # PLC name -> negotiated PDU length
+        self.plans = None  # PLC name -> S7TagPlan, rebuilt after the tag list changes
+        self.stats = {}  # PLC name -> (tags, requests sent, blocks, published) of the last cycle
+        self.udts = {}  # UDT name -> UdtType, imported from a layout file
+
+        # Coalesces a burst of table edits into a single plan rebuild
+        self.plan_timer = QTimer()
+        self.plan_timer.setSingleShot(True)
+        self.plan_timer.timeout.connect(self.update_plan)
         
         # Connect UI signals
         self.ui.s7TagConnectBtn.clicked.connect(self.toggle_connection)
@@ -167,203 +789,344 @@ class S7TagHandler(ProtocolHandlerBase):
         if hasattr(self.ui, 's7TagImportBtn'):
             self.ui.s7TagImportBtn.clicked.connect(self.import_tags)
         
-        # Setup Table
-        self.table = self.ui.s7TagTable
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["Offset", "Type", "Value", "Write Value", "Action", "Description"])
+        # Setup Table (model/view with delegates, so a tag costs no widgets)
+        self.model = S7TagModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(24)
+        self.type_delegate = S7TypeDelegate(self.tag_types, self.table)
+        self.table.setItemDelegateForColumn(S7TagModel.TYPE, self.type_delegate)
+        self.write_delegate = S7ButtonDelegate(self.table)
+        self.write_delegate.clicked.connect(self.write_tag)
+        self.table.setItemDelegateForColumn(S7TagModel.ACTION, self.write_delegate)
 
-    def ensure_client(self):
-        if self.client is None:
-            try:
-                self.client = snap7.client.Client()
-            except Exception as e:
-                self.log_message.emit(f"Failed to load Snap7 library: {e}")
-                return False
-        return True
+        # Replace the QTableWidget from the .ui file with the view
+        layout = self.ui.s7TagLayout
+        index = layout.indexOf(self.ui.s7TagTable)
+        layout.removeWidget(self.ui.s7TagTable)
+        self.ui.s7TagTable.setParent(None)
+        layout.insertWidget(index, self.table)
 
-    def connect(self):
-        if not self.ensure_client():
-            return
+        # Read planner: tags separated by at most this many unused bytes share one request
+        self.gap_spin = QSpinBox()
+        self.gap_spin.setRange(0, 1024)
+        self.gap_spin.setValue(16)
+        self.ui.s7TagSettingsLayout.insertWidget(4, QLabel("Max Gap (bytes):"))
+        self.ui.s7TagSettingsLayout.insertWidget(5, self.gap_spin)
+
+        # Publishing: only changed values (or values outside the deadband) go downstream
+        self.on_change_chk = QCheckBox("On Change Only")
+        self.heartbeat_spin = QSpinBox()
+        self.heartbeat_spin.setRange(0, 86400)
+        self.heartbeat_spin.setSpecialValueText("Off")
+        self.ui.s7TagSettingsLayout.insertWidget(6, self.on_change_chk)
+        self.ui.s7TagSettingsLayout.insertWidget(7, QLabel("Heartbeat (s):"))
+        self.ui.s7TagSettingsLayout.insertWidget(8, self.heartbeat_spin)
+
+        # Array and UDT tags: one list-valued tag, or one tag per element
+        self.flatten_chk = QCheckBox("Flatten Arrays")
+        self.ui.s7TagSettingsLayout.insertWidget(9, self.flatten_chk)
+        self.udt_btn = QPushButton("Import UDTs")
+        self.ui.s7TagSettingsLayout.addWidget(self.udt_btn)
+        self.udt_btn.clicked.connect(self.import_udts)
+
+        # Additional PLCs polled in parallel; tags address them as "<name>/<address>"
+        self.setup_plc_pool()
+
+        # Per-cycle read statistics
+        self.stats_label = QLabel("")
+        self.ui.s7TagLayout.addWidget(self.stats_label)
+
+        # Any change to the tag definitions invalidates the compiled plan
+        self.model.definitions_changed.connect(self.invalidate_plan)
+        self.ui.s7TagDbNumEdit.textChanged.connect(self.invalidate_plan)
+        self.gap_spin.valueChanged.connect(self.invalidate_plan)
+        self.on_change_chk.toggled.connect(self.invalidate_plan)
+        self.heartbeat_spin.valueChanged.connect(self.invalidate_plan)
+        self.flatten_chk.toggled.connect(self.invalidate_plan)
+
+    def setup_plc_pool(self):
+        group = QGroupBox("PLC Pool (tags: Name/Address, e.g. Line1/DB10.DBD4)")
+        layout = QVBoxLayout(group)
+
+        btn_layout = QHBoxLayout()
+        btn_add = QPushButton("Add PLC")
+        btn_remove = QPushButton("Remove PLC")
+        btn_layout.addWidget(btn_add)
+        btn_layout.addWidget(btn_remove)
+        btn_layout.addStretch()
+        layout.addLayout(btn_layout)
+
+        self.plc_table = QTableWidget()
+        self.plc_table.setColumnCount(6)
+        self.plc_table.setHorizontalHeaderLabels(["Name", "IP", "Rack", "Slot", "Port", "Interval (ms)"])
+        self.plc_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.plc_table.setMaximumHeight(150)
+        layout.addWidget(self.plc_table)
+
+        self.ui.s7TagLayout.insertWidget(2, group)
+
+        btn_add.clicked.connect(lambda: self.add_plc_row())
+        btn_remove.clicked.connect(self.remove_plc_row)
+        self.plc_table.itemChanged.connect(self.invalidate_plan)
+
+    def add_plc_row(self, plc=None):
+        plc = plc or {}
+        row = self.plc_table.rowCount()
+        self.plc_table.insertRow(row)
+        values = [
+            plc.get("name", f"PLC{row + 1}"),
+            plc.get("ip", "192.168.0.1"),
+            plc.get("rack", "0"),
+            plc.get("slot", "1"),
+            plc.get("port", "102"),
+            plc.get("interval", "1000"),
+        ]
+        for col, value in enumerate(values):
+            self.plc_table.setItem(row, col, QTableWidgetItem(value))
+
+    def remove_plc_row(self):
+        row = self.plc_table.currentRow()
+        if row >= 0:
+            self.plc_table.removeRow(row)
+            self.invalidate_plan()
+
+    def plc_configs(self):
+        """Connection parameters per PLC; the fields above the table are the unnamed default PLC."""
+        def params(ip, rack, slot, port, interval):
+            try:
+                interval = int(interval)
+            except ValueError:
+                interval = 1000
+            return {"ip": ip, "rack": int(rack), "slot": int(slot), "port": int(port), "interval": interval}
 
-        ip = self.ui.s7TagIpEdit.text()
+        plcs = {}
         try:
-            rack = int(self.ui.s7TagRackEdit.text())
-            slot = int(self.ui.s7TagSlotEdit.text())
-            port = int(self.ui.s7TagPortEdit.text())
+            plcs[""] = params(self.ui.s7TagIpEdit.text(), self.ui.s7TagRackEdit.text(),
+                              self.ui.s7TagSlotEdit.text(), self.ui.s7TagPortEdit.text(),
+                              self.ui.s7TagIntervalEdit.text())
         except ValueError:
             self.log_message.emit("S7 Tag Error: Rack, Slot, and Port must be integers.")
+            return None
+
+        for row in range(self.plc_table.rowCount()):
+            cells = [self.plc_table.item(row, col).text().strip() if self.plc_table.item(row, col) else ""
+                     for col in range(6)]
+            name = cells[0]
+            if not name or "/" in name or name in plcs:
+                self.log_message.emit(f"S7 Tag Error: Invalid or duplicate PLC name '{name}' (row {row + 1}).")
+                return None
+            try:
+                plcs[name] = params(*cells[1:])
+            except ValueError:
+                self.log_message.emit(f"S7 Tag Error: PLC '{name}' Rack, Slot, and Port must be integers.")
+                return None
+        return plcs
+
+    def connect(self):
+        plcs = self.plc_configs()
+        if plcs is None:
             return
 
-        try:
-            if port != 102:
-                import ctypes
-                c_port = ctypes.c_int(port)
-                self.client._lib.Cli_SetParam(self.client._s7_client, 2, ctypes.byref(c_port))
-            
-            self.client.connect(ip, rack, slot)
-            self.connected = self.client.get_connected()
-            if self.connected:
-                self.log_message.emit(f"S7 Tag Monitor Connected to {ip}:{port}")
-                self.ui.s7TagConnectBtn.setText("Disconnect")
-                self.start_reading()
-        except Exception as e:
-            self.log_message.emit(f"S7 Tag Connection Error: {e}")
+        self.pdu_lengths = {}
+        self.stats = {}
+        self.pool = S7ConnectionPool(plcs, self)
+        self.pool.connected.connect(self.on_connected)
+        self.pool.data_ready.connect(self.on_data_ready)
+        self.pool.error_occurred.connect(lambda x: self.log_message.emit(f"S7 Tag {x}"))
+        self.pool.write_done.connect(lambda x: self.log_message.emit(f"S7 Write Success: {x}"))
+        self.pool.finished.connect(self.pool.deleteLater)
+        self.update_plan()
+        self.pool.start()
+        self.ui.s7TagConnectBtn.setText("Disconnect")
+        self.log_message.emit(f"S7 Tag Monitor Connecting to {len(plcs)} PLC(s)...")
+
+    def on_connected(self, name, pdu_length):
+        if self.sender() is not self.pool:
+            return
+        self.connected = True
+        if self.pdu_lengths.get(name) != pdu_length:
+            self.pdu_lengths[name] = pdu_length
+            self.invalidate_plan()  # Re-plan with the real PDU size
+        params = self.pool.pollers[name].params
+        self.log_message.emit(
+            f"S7 Tag Monitor Connected to {name or 'default PLC'} at {params['ip']}:{params['port']} (PDU={pdu_length})")
 
     def disconnect(self):
-        if self.connected:
-            self.client.disconnect()
+        if self.pool:
+            # Do not wait for the thread; a blocked Snap7 call must not freeze the GUI
+            self.pool.stop()
+            self.pool = None
             self.connected = False
-            self.stop_reading()
             self.ui.s7TagConnectBtn.setText("Connect")
             self.log_message.emit("S7 Tag Monitor Disconnected")
 
     def toggle_connection(self):
-        if self.connected:
+        if self.pool:
             self.disconnect()
         else:
             self.connect()
 
-    def start_reading(self):
+    def invalidate_plan(self, *args):
+        self.plans = None
+        if self.pool:
+            self.plan_timer.start(0)
+
+    def update_plan(self):
+        """Recompiles the plans and hands them to the polling threads."""
+        self.compile_plan()
+        if self.pool:
+            for name in self.pool.pollers:
+                self.pool.set_plan(name, self.plans.get(name))
+
+    def compile_plan(self):
+        """Compiles the tag table into an S7TagPlan so the poll cycle never parses the widgets."""
         try:
-            interval = int(self.ui.s7TagIntervalEdit.text())
+            default_db = int(self.ui.s7TagDbNumEdit.text())
         except ValueError:
-            interval = 1000
-        self.timer.start(interval)
+            default_db = None
+
+        plc_names = {""}
+        for row in range(self.plc_table.rowCount()):
+            item = self.plc_table.item(row, 0)
+            if item:
+                plc_names.add(item.text().strip())
 
-    def stop_reading(self):
-        self.timer.stop()
+        definitions = {}  # PLC name -> tag definitions
+        invalid_rows = []
+        for row, tag in enumerate(self.model.tags):
+            plc, address = split_plc(tag[S7TagModel.OFFSET])
+            if plc not in plc_names:
+                invalid_rows.append(row)
+                continue
+            definitions.setdefault(plc, []).append(
+                (row, address, tag[S7TagModel.TYPE], tag[S7TagModel.DEADBAND]))
+
+        self.plans = {}
+        for plc, defs in definitions.items():
+            plan = S7TagPlan(defs, default_db, self.pdu_lengths.get(plc), self.gap_spin.value(),
+                             self.on_change_chk.isChecked(), self.heartbeat_spin.value(), plc,
+                             self.udts, self.flatten_chk.isChecked())
+            invalid_rows.extend(plan.invalid_rows)
+            self.plans[plc] = plan
+        self.model.set_values([(row, "Err") for row in invalid_rows])
 
     def add_row(self):
-        from PyQt6.QtWidgets import QComboBox, QPushButton, QLineEdit
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        
-        # Offset
-        self.table.setItem(row, 0, QTableWidgetItem("0.0")) 
-        
-        # Type Combo
-        combo = QComboBox()
-        combo.addItems(["Bool", "Byte", "Int", "Word", "DInt", "DWord", "Real"])
-        self.table.setCellWidget(row, 1, combo)
-        
-        # Value (Read-only)
-        item_val = QTableWidgetItem("-")
-        item_val.setFlags(item_val.flags() ^ QtCore.Qt.ItemFlag.ItemIsEditable)
-        self.table.setItem(row, 2, item_val)
-
-        # Write Value (Editable)
-        self.table.setItem(row, 3, QTableWidgetItem("0"))
-
-        # Write Button
-        btn = QPushButton("Write")
-        btn.clicked.connect(lambda _, r=row: self.write_tag(r))
-        self.table.setCellWidget(row, 4, btn)
-        
-        # Description
-        self.table.setItem(row, 5, QTableWidgetItem(""))
+        self.model.append_tags([S7TagModel.new_tag()])
 
     def remove_row(self):
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row >= 0:
-            self.table.removeRow(row)
+            self.model.removeRows(row, 1)
+
+    def tag_types(self):
+        return S7_TAG_TYPES + sorted(self.udts)
+
+    def match_type(self, dtype, cache):
+        """Maps an imported type name onto a known type, like the old type combo did."""
+        if dtype not in cache:
+            text = dtype.strip()
+            try:
+                parse_type(text, self.udts)
+                cache[dtype] = text
+            except ValueError:
+                # Find closest match for type
+                lowered = text.lower()
+                cache[dtype] = next((t for t in self.tag_types() if lowered and lowered in t.lower()), "Bool")
+        return cache[dtype]
 
     def import_tags(self):
         from PyQt6.QtWidgets import QFileDialog
         import csv
+        import json
         
-        file, _ = QFileDialog.getOpenFileName(self.ui, "Import Tags", "", "CSV Files (*.csv);;All Files (*.*)")
+        file, _ = QFileDialog.getOpenFileName(
+            self.ui, "Import Tags", "", "CSV Files (*.csv);;JSON Files (*.json);;All Files (*.*)")
         if not file:
             return
             
         try:
-            with open(file, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                # Optional: Skip header if present. Simple heuristic: check if first col is "Offset"
-                rows = list(reader)
-                if not rows:
-                    return
-                    
-                if rows[0][0].lower() == "offset":
+            if file.lower().endswith(".json"):
+                # A tag list as saved in the configuration, or a whole S7 tag configuration
+                with open(file, encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    data = data.get("tags", [])
+                rows = [(t.get("offset", "0.0"), t.get("type", "Byte"), t.get("desc", ""), t.get("deadband", ""))
+                        for t in data]
+            else:
+                with open(file, newline='', encoding='utf-8') as csvfile:
+                    reader = csv.reader(csvfile)
+                    # Optional: Skip header if present. Simple heuristic: check if first col is "Offset"
+                    rows = list(reader)
+                if rows and rows[0] and rows[0][0].lower() == "offset":
                     rows = rows[1:]
-                
-                for row_data in rows:
-                    if len(row_data) < 2:
-                        continue
-                        
-                    offset = row_data[0]
-                    dtype = row_data[1]
-                    desc = row_data[2] if len(row_data) > 2 else ""
-                    
-                    self.add_row()
-                    row_idx = self.table.rowCount() - 1
-                    
-                    self.table.setItem(row_idx, 0, QTableWidgetItem(offset))
-                    
-                    combo = self.table.cellWidget(row_idx, 1)
-                    if combo:
-                        # Find closest match for type
-                        index = combo.findText(dtype, QtCore.Qt.MatchFlag.MatchContains)
-                        if index >= 0:
-                            combo.setCurrentIndex(index)
-                        else:
-                            # Default or try to guess
-                            pass
-                            
-                    self.table.setItem(row_idx, 5, QTableWidgetItem(desc))
-                    
-            self.log_message.emit(f"Imported {len(rows)} tags from {file}")
+
+            types = {}
+            tags = []
+            for row_data in rows:
+                if len(row_data) < 2:
+                    continue
+                desc = row_data[2] if len(row_data) > 2 else ""
+                deadband = row_data[3] if len(row_data) > 3 else ""
+                tags.append(S7TagModel.new_tag(row_data[0], self.match_type(row_data[1], types), desc, deadband))
+
+            # One insert for the whole file; the view only renders the visible rows
+            self.model.append_tags(tags)
+            self.log_message.emit(f"Imported {len(tags)} tags from {file}")
             
         except Exception as e:
             self.log_message.emit(f"Import Error: {e}")
 
+    def import_udts(self):
+        from PyQt6.QtWidgets import QFileDialog
+
+        file, _ = QFileDialog.getOpenFileName(self.ui, "Import UDTs", "", "JSON Files (*.json);;All Files (*.*)")
+        if not file:
+            return
+
+        try:
+            self.udts.update(load_udts(file))
+        except Exception as e:
+            self.log_message.emit(f"UDT Import Error: {e}")
+            return
+
+        self.invalidate_plan()
+        self.log_message.emit(f"Imported {len(self.udts)} UDTs from {file}")
+
     def write_tag(self, row):
-        if not self.connected:
+        if not self.pool or not self.connected:
             self.log_message.emit("S7 Write Error: Not connected.")
             return
 
         try:
             db_number = int(self.ui.s7TagDbNumEdit.text())
         except ValueError:
-            self.log_message.emit("S7 Write Error: Invalid DB Number.")
-            return
+            db_number = None  # Only addresses with an explicit area can be written
 
-        offset_item = self.table.item(row, 0)
-        write_val_item = self.table.item(row, 3)
-        combo = self.table.cellWidget(row, 1)
-
-        if not offset_item or not write_val_item or not combo:
+        if not 0 <= row < len(self.model.tags):
             return
 
-        offset_str = offset_item.text()
-        dtype = combo.currentText()
-        write_val_str = write_val_item.text()
+        tag = self.model.tags[row]
+        offset_str = tag[S7TagModel.OFFSET]
+        dtype = tag[S7TagModel.TYPE]
+        write_val_str = tag[S7TagModel.WRITE_VALUE]
 
         import struct
 
         try:
-            # Parse offset
-            byte_offset = 0
-            bit_offset = 0
-            if '.' in offset_str:
-                parts = offset_str.split('.')
-                byte_offset = int(parts[0])
-                if len(parts) > 1:
-                    bit_offset = int(parts[1])
-            else:
-                byte_offset = int(offset_str)
+            if parse_type(dtype, self.udts) is not None:
+                raise ValueError(f"Array and UDT tags cannot be written ({dtype})")
+            plc, address = split_plc(offset_str)
+            area, db_number, byte_offset, bit_offset, _ = parse_address(address, db_number)
 
             # Prepare data buffer
             data = bytearray()
             
             if dtype == "Bool":
-                # For Bool, we need to read the byte first, modify the bit, and write back
-                # Or use write_area? snap7 has set_bool but it works on a buffer.
-                # Let's read 1 byte first to be safe and not overwrite other bits
-                current_byte = self.client.db_read(db_number, byte_offset, 1)
-                val_bool = (write_val_str.lower() in ['true', '1', 'on'])
-                snap7.util.set_bool(current_byte, 0, bit_offset, val_bool)
-                data = current_byte
+                # The worker reads the byte first and only changes this bit
+                data = (write_val_str.lower() in ['true', '1', 'on'])
             elif dtype == "Byte":
                 val = int(write_val_str)
                 data = bytearray([val])
@@ -383,106 +1146,53 @@ class S7TagHandler(ProtocolHandlerBase):
                 val = float(write_val_str)
                 data = struct.pack('>f', val)
 
-            # Write to DB
-            self.client.db_write(db_number, byte_offset, data)
-            self.log_message.emit(f"S7 Write Success: Row {row+1} -> {write_val_str}")
+            # The polling thread owns the connection, it runs the write between cycles
+            self.pool.queue_write(plc, area, db_number, byte_offset, bit_offset, data,
+                                  f"Row {row+1} -> {write_val_str}")
             
         except Exception as e:
             self.log_message.emit(f"S7 Write Error: {e}")
 
+    def on_data_ready(self, batch):
+        if self.sender() is not self.pool:
+            return  # Late batch from a pool that was already stopped
+        plan, results, sent = batch
+        if not self.plans or self.plans.get(plan.plc) is not plan:
+            return  # Decoded with a plan that has been replaced since
 
-    def read_tags(self):
-        if not self.connected:
-            return
-            
-        try:
-            db_number = int(self.ui.s7TagDbNumEdit.text())
-        except ValueError:
-            return
-
-        import struct
-
-        for row in range(self.table.rowCount()):
-            offset_item = self.table.item(row, 0)
-            if not offset_item:
-                continue
-            
-            offset_str = offset_item.text()
-            
-            # Get Type
-            combo = self.table.cellWidget(row, 1)
-            if not combo:
+        rows = plan.rows
+        updates = []
+        for i, val_str, samples in results:
+            if val_str is None:
+                updates.append((rows[i], "Err"))
                 continue
-            dtype = combo.currentText()
-            
-            try:
-                # Parse offset
-                byte_offset = 0
-                bit_offset = 0
-                if '.' in offset_str:
-                    parts = offset_str.split('.')
-                    byte_offset = int(parts[0])
-                    if len(parts) > 1:
-                        bit_offset = int(parts[1])
-                else:
-                    byte_offset = int(offset_str)
-                
-                # Determine size and read
-                size = 1
-                if dtype in ["Bool", "Byte"]:
-                    size = 1
-                elif dtype in ["Int", "Word"]:
-                    size = 2
-                elif dtype in ["DInt", "DWord", "Real"]:
-                    size = 4
-                
-                data = self.client.db_read(db_number, byte_offset, size)
-                
-                val_str = "Error"
-                
-                if dtype == "Bool":
-                    # Get bit
-                    val = snap7.util.get_bool(data, 0, bit_offset)
-                    val_str = str(val)
-                elif dtype == "Byte":
-                    val = data[0]
-                    val_str = str(val)
-                elif dtype == "Int":
-                    val = struct.unpack('>h', data)[0]
-                    val_str = str(val)
-                elif dtype == "Word":
-                    val = struct.unpack('>H', data)[0]
-                    val_str = f"{val:04X}" # Hex display for Word
-                elif dtype == "DInt":
-                    val = struct.unpack('>i', data)[0]
-                    val_str = str(val)
-                elif dtype == "DWord":
-                    val = struct.unpack('>I', data)[0]
-                    val_str = f"{val:08X}" # Hex display for DWord
-                elif dtype == "Real":
-                    val = struct.unpack('>f', data)[0]
-                    val_str = f"{val:.4f}"
-                
-                self.table.setItem(row, 2, QTableWidgetItem(val_str))
-                self.data_received.emit("S7", f"DB{db_number}.{offset_str}", val_str)
-                
-            except Exception as e:
-                self.table.setItem(row, 2, QTableWidgetItem("Err"))
-                # self.log_message.emit(f"Tag Read Error Row {row}: {e}")
+            updates.append((rows[i], val_str))
+            if samples is None:
+                self.data_received.emit("S7", plan.names[i], val_str)
+            else:
+                for name, value in samples:
+                    self.data_received.emit("S7", name, value)
+        self.model.set_values(updates)
+
+        self.stats[plan.plc] = (len(plan), sent, len(plan.blocks), len(results))
+        tags, requests, blocks, published = (sum(col) for col in zip(*self.stats.values()))
+        self.stats_label.setText(
+            f"{tags} tags served by {requests} requests ({blocks} blocks) on {len(self.stats)} PLC(s), "
+            f"{published} published")
 
     def get_status(self) -> str:
         return "Connected" if self.connected else "Disconnected"
 
     def serialize(self) -> dict:
-        tags = []
-        for row in range(self.table.rowCount()):
-            off = self.table.item(row, 0).text() if self.table.item(row, 0) else ""
-            
-            combo = self.table.cellWidget(row, 1)
-            dtype = combo.currentText() if combo else "Byte"
-            
-            desc = self.table.item(row, 5).text() if self.table.item(row, 5) else ""
-            tags.append({"offset": off, "type": dtype, "desc": desc})
+        plcs = []
+        for row in range(self.plc_table.rowCount()):
+            cells = [self.plc_table.item(row, col).text() if self.plc_table.item(row, col) else ""
+                     for col in range(6)]
+            plcs.append(dict(zip(["name", "ip", "rack", "slot", "port", "interval"], cells)))
+
+        tags = [{"offset": t[S7TagModel.OFFSET], "type": t[S7TagModel.TYPE],
+                 "desc": t[S7TagModel.DESCRIPTION], "deadband": t[S7TagModel.DEADBAND]}
+                for t in self.model.tags]
             
         return {
             "ip": self.ui.s7TagIpEdit.text(),
@@ -491,6 +1201,12 @@ class S7TagHandler(ProtocolHandlerBase):
             "port": self.ui.s7TagPortEdit.text(),
             "db_num": self.ui.s7TagDbNumEdit.text(),
             "interval": self.ui.s7TagIntervalEdit.text(),
+            "gap": self.gap_spin.value(),
+            "on_change": self.on_change_chk.isChecked(),
+            "heartbeat": self.heartbeat_spin.value(),
+            "flatten": self.flatten_chk.isChecked(),
+            "udts": udts_to_dict(self.udts),
+            "plcs": plcs,
             "tags": tags
         }
 
@@ -501,16 +1217,21 @@ class S7TagHandler(ProtocolHandlerBase):
         self.ui.s7TagPortEdit.setText(data.get("port", "102"))
         self.ui.s7TagDbNumEdit.setText(data.get("db_num", "1"))
         self.ui.s7TagIntervalEdit.setText(data.get("interval", "1000"))
+        self.gap_spin.setValue(data.get("gap", 16))
+        self.on_change_chk.setChecked(data.get("on_change", False))
+        self.heartbeat_spin.setValue(data.get("heartbeat", 0))
+        self.flatten_chk.setChecked(data.get("flatten", False))
+        try:
+            self.udts = udts_from_dict(data.get("udts", {}))
+        except (KeyError, TypeError, ValueError) as e:
+            self.udts = {}
+            self.log_message.emit(f"UDT Load Error: {e}")
+
+        self.plc_table.setRowCount(0)
+        for plc in data.get("plcs", []):
+            self.add_plc_row(plc)
         
-        tags = data.get("tags", [])
-        self.table.setRowCount(0)
-        for t in tags:
-            self.add_row()
-            row = self.table.rowCount() - 1
-            self.table.setItem(row, 0, QTableWidgetItem(t.get("offset", "0.0")))
-            
-            combo = self.table.cellWidget(row, 1)
-            if combo:
-                combo.setCurrentText(t.get("type", "Byte"))
-                
-            self.table.setItem(row, 5, QTableWidgetItem(t.get("desc", "")))
+        self.model.set_tags([
+            S7TagModel.new_tag(t.get("offset", "0.0"), t.get("type", "Byte"), t.get("desc", ""), t.get("deadband", ""))
+            for t in data.get("tags", [])
+        ])
@@ -0,0 +1,388 @@
+"""Read planning for S7 tag polling.
+
+Instead of one ``db_read`` per tag, the tag offsets are merged into a small set
+of contiguous byte ranges per memory area. Each range is read once and every
+tag is decoded from a slice of that buffer. The ranges are then packed into
+as few ``read_multi_vars`` requests as the negotiated PDU allows.
+"""
+import re
+import struct
+from array import array
+
+from .s7_types import parse_type
+
+# Bytes of a read response that are not payload (TPKT/COTP/S7 header, param and
+# data item header). Snap7 uses the same figure to size its own read chunks.
+S7_READ_OVERHEAD = 18
+DEFAULT_PDU_LENGTH = 240
+
+# Multi-variable read limits. A request carries a 12 byte item spec per variable,
+# a response a 4 byte item header per variable plus the data padded to even length.
+S7_MAX_VARS = 20
+S7_MULTI_REQUEST_OVERHEAD = 19
+S7_MULTI_REQUEST_ITEM = 12
+S7_MULTI_RESPONSE_OVERHEAD = 14
+S7_MULTI_RESPONSE_ITEM = 4
+
+# Bytes occupied by each tag type in the PLC memory
+TYPE_SIZES = {
+    "Bool": 1,
+    "Byte": 1,
+    "Int": 2,
+    "Word": 2,
+    "DInt": 4,
+    "DWord": 4,
+    "Real": 4,
+}
+
+# Prebuilt big-endian decoders; Bool is extracted from its byte directly
+TYPE_STRUCTS = {
+    "Byte": struct.Struct(">B"),
+    "Int": struct.Struct(">h"),
+    "Word": struct.Struct(">H"),
+    "DInt": struct.Struct(">i"),
+    "DWord": struct.Struct(">I"),
+    "Real": struct.Struct(">f"),
+}
+
+# Display formatting, matching what the tag table has always shown
+TYPE_FORMATS = {
+    "Word": "{:04X}".format,
+    "DWord": "{:08X}".format,
+    "Real": "{:.4f}".format,
+}
+
+
+def max_block_size(pdu_length):
+    """Largest payload a single read request can return for the given PDU."""
+    return max(1, (pdu_length or DEFAULT_PDU_LENGTH) - S7_READ_OVERHEAD)
+
+
+class ReadBlock:
+    """A contiguous byte range and the tags that are decoded from it."""
+
+    __slots__ = ("area", "db_number", "start", "size", "members")
+
+    def __init__(self, start, size, area="DB", db_number=0):
+        self.area = area
+        self.db_number = db_number
+        self.start = start
+        self.size = size
+        self.members = []  # indices into the span list passed to plan_blocks
+
+    @property
+    def end(self):
+        return self.start + self.size
+
+    def __repr__(self):
+        return (f"ReadBlock(area={self.area}, db={self.db_number}, start={self.start}, "
+                f"size={self.size}, tags={len(self.members)})")
+
+
+# DB10.DBX4.3 / DB10.DBW4 / DB10.4 / M20.3 / MW20 / IW64 / Q0.1 ...
+_ADDRESS_RE = re.compile(
+    r"^(?:DB(?P<db>\d+)\.(?:DB(?P<db_width>[XBWD]))?|(?P<area>[MIQ])(?P<width>[XBWD])?)"
+    r"(?P<byte>\d+)(?:\.(?P<bit>[0-7]))?$",
+    re.IGNORECASE,
+)
+# Plain offsets ("8", "8.3") refer to the default DB of the tag monitor
+_OFFSET_RE = re.compile(r"^(?P<byte>\d+)(?:\.(?P<bit>[0-7]))?$")
+
+
+def split_plc(text):
+    """Splits "Line1/DB10.DBD4" into ("Line1", "DB10.DBD4"); no prefix gives ("", text)."""
+    plc, sep, address = text.strip().rpartition("/")
+    return plc.strip(), address
+
+
+def parse_address(text, default_db=None):
+    """Parses a tag address into ``(area, db_number, byte, bit, name)``.
+
+    ``area`` is one of "DB", "M", "I" or "Q". Plain offsets use ``default_db``
+    and keep the historic ``DB<n>.<offset>`` tag name so existing gateway and
+    dashboard configurations still match. An X width letter needs a bit and
+    B/W/D take none. Raises ValueError for anything else.
+    """
+    text = text.strip()
+    m = _OFFSET_RE.match(text)
+    if m:
+        if default_db is None:
+            raise ValueError(f"No DB number for offset '{text}'")
+        return "DB", default_db, int(m.group("byte")), int(m.group("bit") or 0), f"DB{default_db}.{text}"
+
+    m = _ADDRESS_RE.match(text)
+    if not m:
+        raise ValueError(f"Invalid S7 address '{text}'")
+    width = (m.group("db_width") or m.group("width") or "").upper()
+    if width and (width == "X") != (m.group("bit") is not None):
+        # X addresses a bit and needs one, B/W/D address whole bytes and take none
+        raise ValueError(f"Invalid S7 address '{text}'")
+    if m.group("db") is not None:
+        area, db_number = "DB", int(m.group("db"))
+    else:
+        area, db_number = m.group("area").upper(), 0
+    return area, db_number, int(m.group("byte")), int(m.group("bit") or 0), text.upper()
+
+
+def plan_blocks(spans, max_block, gap=0):
+    """Merges ``(offset, size)`` spans into the fewest contiguous read blocks.
+
+    Two spans end up in the same block when the hole between them is at most
+    ``gap`` bytes and the merged block still fits in ``max_block`` bytes. A
+    single span larger than ``max_block`` gets a block of its own; the driver
+    splits such reads itself.
+    """
+    order = sorted(range(len(spans)), key=lambda i: spans[i][0])
+    blocks = []
+    current = None
+    for i in order:
+        offset, size = spans[i]
+        end = offset + size
+        if current is not None:
+            new_end = max(current.end, end)
+            if offset - current.end <= gap and new_end - current.start <= max_block:
+                current.size = new_end - current.start
+                current.members.append(i)
+                continue
+        current = ReadBlock(offset, size)
+        current.members.append(i)
+        blocks.append(current)
+    return blocks
+
+
+def plan_area_blocks(addresses, max_block, gap=0):
+    """Plans read blocks for ``(area, db_number, offset, size)`` tuples.
+
+    Addresses are grouped by memory area and DB, then merged with plan_blocks.
+    Block members index into ``addresses``.
+    """
+    groups = {}
+    for i, (area, db_number, _, _) in enumerate(addresses):
+        groups.setdefault((area, db_number), []).append(i)
+
+    blocks = []
+    for (area, db_number), indices in groups.items():
+        spans = [(addresses[i][2], addresses[i][3]) for i in indices]
+        for block in plan_blocks(spans, max_block, gap):
+            block.area = area
+            block.db_number = db_number
+            block.members = [indices[m] for m in block.members]
+            blocks.append(block)
+    return blocks
+
+
+def pack_requests(blocks, pdu_length, max_vars=S7_MAX_VARS):
+    """Packs read blocks into multi-variable requests that fit the PDU.
+
+    Returns a list of block lists; each list is one ``read_multi_vars`` call.
+    """
+    pdu_length = pdu_length or DEFAULT_PDU_LENGTH
+    requests = []
+    current = []
+    request_size = S7_MULTI_REQUEST_OVERHEAD
+    response_size = S7_MULTI_RESPONSE_OVERHEAD
+    for block in blocks:
+        item_response = S7_MULTI_RESPONSE_ITEM + block.size + (block.size & 1)
+        if current and (len(current) >= max_vars
+                        or request_size + S7_MULTI_REQUEST_ITEM > pdu_length
+                        or response_size + item_response > pdu_length):
+            requests.append(current)
+            current = []
+            request_size = S7_MULTI_REQUEST_OVERHEAD
+            response_size = S7_MULTI_RESPONSE_OVERHEAD
+        current.append(block)
+        request_size += S7_MULTI_REQUEST_ITEM
+        response_size += item_response
+    if current:
+        requests.append(current)
+    return requests
+
+
+class S7TagPlan:
+    """A tag list compiled for polling.
+
+    Built once from ``(row, address, dtype, deadband)`` definitions when polling
+    starts or the tag list changes. Per-tag data lives in flat arrays indexed by
+    tag, so a poll cycle only slices buffers and runs prebuilt ``struct.Struct``
+    decoders. ``on_change`` and ``heartbeat`` configure the ChangeFilter used
+    to publish the decoded values. A plan covers the tags of one PLC; tag names
+    of a named PLC are prefixed with ``<plc>/``.
+
+    Array and UDT types (``Real[500]``, ``Motor[4]``, see s7_types) are decoded
+    with NumPy in one call per tag. ``flatten`` publishes each of their elements
+    as a tag of its own instead of one list-valued tag.
+    """
+
+    def __init__(self, definitions, default_db=None, pdu_length=None, gap=0,
+                 on_change=False, heartbeat=0.0, plc="", udts=None, flatten=False):
+        self.rows = array("i")       # table row of each tag
+        self.positions = array("i")  # byte position inside the tag's read block
+        self.bits = array("b")       # bit number for Bool tags
+        self.sizes = array("i")
+        self.deadbands = array("d")  # 0 means no deadband
+        self.percent = array("b")    # deadband is a percentage of the last value
+        self.structs = []            # struct.Struct, ArrayType, or None for Bool
+        self.arrays = {}             # tag index -> ArrayType for array and UDT tags
+        self.formats = []
+        self.names = []
+        self.invalid_rows = []       # rows whose address, type or deadband could not be parsed
+        self.on_change = on_change
+        self.heartbeat = heartbeat
+        self.plc = plc
+        self.flatten = flatten
+
+        addresses = []
+        for row, address, dtype, deadband in definitions:
+            try:
+                area, db_number, byte_offset, bit_offset, name = parse_address(address, default_db)
+                deadband, percent = parse_deadband(deadband)
+                array_type = parse_type(dtype, udts)
+            except ValueError:
+                self.invalid_rows.append(row)
+                continue
+            if array_type is not None:
+                self.arrays[len(self.rows)] = array_type
+                size = array_type.size(bit_offset)
+            else:
+                size = TYPE_SIZES.get(dtype, 1)
+            self.rows.append(row)
+            self.positions.append(byte_offset)
+            self.bits.append(bit_offset)
+            self.sizes.append(size)
+            self.deadbands.append(deadband)
+            self.percent.append(percent)
+            if plc:
+                name = f"{plc}/{name}"
+            self.structs.append(array_type or TYPE_STRUCTS.get(dtype))
+            self.formats.append(TYPE_FORMATS.get(dtype, str))
+            self.names.append(name)
+            addresses.append((area, db_number, byte_offset, size))
+
+        self.blocks = plan_area_blocks(addresses, max_block_size(pdu_length), gap)
+        self.requests = pack_requests(self.blocks, pdu_length)
+
+        # Absolute offsets become positions relative to the owning block
+        for block in self.blocks:
+            for i in block.members:
+                self.positions[i] -= block.start
+
+    def __len__(self):
+        return len(self.rows)
+
+    def decode(self, request, buffers):
+        """Decodes the buffers returned for one request.
+
+        Returns ``(tag_index, value)`` pairs; value is None for tags whose block
+        could not be read.
+        """
+        positions = self.positions
+        bits = self.bits
+        structs = self.structs
+        arrays = self.arrays
+        results = []
+        for block, data in zip(request, buffers):
+            if data is None:
+                results.extend((i, None) for i in block.members)
+                continue
+            for i in block.members:
+                decoder = structs[i]
+                try:
+                    if decoder is None:
+                        value = bool((data[positions[i]] >> bits[i]) & 1)
+                    elif i in arrays:
+                        value = decoder.decode(data, positions[i], bits[i])
+                    else:
+                        value = decoder.unpack_from(data, positions[i])[0]
+                except (IndexError, ValueError, struct.error):
+                    value = None
+                results.append((i, value))
+        return results
+
+    def format(self, results):
+        """Turns ``(tag_index, value)`` pairs into ``(tag_index, value_str, samples)``.
+
+        ``samples`` is None for scalar tags, which publish ``value_str`` under
+        their own name. For array tags value_str is a short preview and samples
+        lists the ``(tag, value)`` pairs to publish.
+        """
+        formats = self.formats
+        arrays = self.arrays
+        if not arrays:
+            return [(i, None if value is None else formats[i](value), None) for i, value in results]
+
+        formatted = []
+        for i, value in results:
+            if value is None:
+                formatted.append((i, None, None))
+            elif i in arrays:
+                array_type = arrays[i]
+                formatted.append((i, array_type.preview(value),
+                                  array_type.publish(self.names[i], value, self.flatten)))
+            else:
+                formatted.append((i, formats[i](value), None))
+        return formatted
+
+
+def parse_deadband(text):
+    """Parses "0.5" (absolute) or "2%" (percent of the last value) into (value, percent)."""
+    text = (text or "").strip()
+    if not text:
+        return 0.0, False
+    if text.endswith("%"):
+        value, percent = float(text[:-1]), True
+    else:
+        value, percent = float(text), False
+    if value < 0:
+        raise ValueError(f"Negative deadband '{text}'")
+    return value, percent
+
+
+_UNSET = object()
+
+
+class ChangeFilter:
+    """Decides which decoded values of a plan are published.
+
+    Tags with a deadband are published when they move by more than it since the
+    last published value. Without a deadband they are published on every cycle,
+    or only when they change if the plan's ``on_change`` is set. A non-zero
+    heartbeat republishes a tag that has been quiet for that many seconds.
+    Read errors are published once, when a tag enters the error state. Array
+    tags are published when any element moves outside the deadband.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.last_values = [_UNSET] * len(plan)
+        self.last_times = array("d", bytes(8 * len(plan)))
+
+    def filter(self, results, now):
+        plan = self.plan
+        deadbands = plan.deadbands
+        percent = plan.percent
+        on_change = plan.on_change
+        heartbeat = plan.heartbeat or float("inf")
+        arrays = plan.arrays
+        last_values = self.last_values
+        last_times = self.last_times
+
+        published = []
+        for i, value in results:
+            last = last_values[i]
+            if last is not _UNSET and now - last_times[i] < heartbeat:
+                if value is None or last is None:
+                    if value is last:
+                        continue
+                elif arrays and i in arrays:
+                    if not arrays[i].changed(value, last, deadbands[i], percent[i], on_change):
+                        continue
+                elif deadbands[i] > 0:
+                    limit = abs(last) * deadbands[i] / 100 if percent[i] else deadbands[i]
+                    if abs(value - last) <= limit:
+                        continue
+                elif on_change and value == last:
+                    continue
+            last_values[i] = value
+            last_times[i] = now
+            published.append((i, value))
+        return published
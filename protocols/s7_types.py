@@ -0,0 +1,200 @@
+"""Array and UDT tag types for the S7 tag monitor.
+
+Types such as ``Real[500]`` or a UDT imported from a layout file are decoded in
+one shot with big-endian NumPy dtypes straight from the read buffer.
+
+A UDT layout file is JSON mapping UDT names to their fields::
+
+    {"Motor": {"size": 8, "fields": [
+        {"name": "speed", "type": "Real", "offset": 0},
+        {"name": "current", "type": "Int", "offset": 4},
+        {"name": "running", "type": "Bool", "offset": 6, "bit": 0}]}}
+
+``size`` is optional and defaults to the end of the last field rounded up to
+an even byte count, which is how S7 aligns structures.
+"""
+import json
+import re
+
+import numpy as np
+
+# S7 elementary types -> big-endian NumPy dtypes. Bool is stored as its byte.
+BASE_DTYPES = {
+    "Bool": np.dtype("u1"),
+    "Byte": np.dtype("u1"),
+    "Int": np.dtype(">i2"),
+    "Word": np.dtype(">u2"),
+    "DInt": np.dtype(">i4"),
+    "DWord": np.dtype(">u4"),
+    "Real": np.dtype(">f4"),
+}
+
+# Display formatting of single elements, matching the scalar tags
+ELEMENT_FORMATS = {
+    "Word": "{:04X}".format,
+    "DWord": "{:08X}".format,
+    "Real": "{:.4f}".format,
+}
+
+_TYPE_RE = re.compile(r"^(?P<name>[A-Za-z_]\w*)\s*(?:\[\s*(?P<count>\d+)\s*\])?$")
+
+PREVIEW_ELEMENTS = 8
+
+
+class UdtType:
+    """A UDT layout compiled into a NumPy structured dtype."""
+
+    def __init__(self, name, fields, size=None):
+        self.name = name
+        self.fields = []  # (name, base type, offset, bit)
+        names, formats, offsets = [], [], []
+        end = 0
+        for field in fields:
+            ftype = field["type"]
+            if ftype not in BASE_DTYPES:
+                raise ValueError(f"UDT {name}: unsupported field type '{ftype}'")
+            offset = int(field["offset"])
+            # Bool fields may share a byte; the dtype reads the byte, decode picks the bit
+            self.fields.append((field["name"], ftype, offset, int(field.get("bit", 0))))
+            names.append(field["name"])
+            formats.append(BASE_DTYPES[ftype])
+            offsets.append(offset)
+            end = max(end, offset + BASE_DTYPES[ftype].itemsize)
+        self.size = int(size) if size else end + (end & 1)
+        self.dtype = np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": self.size})
+
+
+def load_udts(path):
+    """Loads a UDT layout file into a name -> UdtType mapping."""
+    with open(path, encoding="utf-8") as f:
+        return udts_from_dict(json.load(f))
+
+
+def udts_from_dict(data):
+    return {name: UdtType(name, spec["fields"], spec.get("size")) for name, spec in data.items()}
+
+
+def udts_to_dict(udts):
+    return {
+        udt.name: {
+            "size": udt.size,
+            "fields": [{"name": n, "type": t, "offset": o, "bit": b} for n, t, o, b in udt.fields],
+        }
+        for udt in udts.values()
+    }
+
+
+def parse_type(text, udts=None):
+    """Returns an ArrayType for array or UDT type text, None for plain scalar types.
+
+    Raises ValueError for unknown types.
+    """
+    m = _TYPE_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"Invalid S7 type '{text}'")
+    name, count = m.group("name"), m.group("count")
+    udt = (udts or {}).get(name)
+    if udt is None and name not in BASE_DTYPES:
+        raise ValueError(f"Unknown S7 type '{name}'")
+    if count is None and udt is None:
+        return None
+    return ArrayType(name, int(count) if count is not None else None, udt)
+
+
+class ArrayType:
+    """Decodes an array of elementary values, a UDT, or an array of UDTs.
+
+    ``count`` is None for a single UDT instance.
+    """
+
+    def __init__(self, name, count, udt=None):
+        if count is not None and count <= 0:
+            raise ValueError(f"Invalid array length for '{name}'")
+        self.name = name
+        self.count = count
+        self.udt = udt
+        self.element_format = ELEMENT_FORMATS.get(name, str)
+
+    def size(self, bit_offset=0):
+        n = self.count or 1
+        if self.udt is not None:
+            return self.udt.size * n
+        if self.name == "Bool":
+            # Bool arrays are packed eight to a byte, starting at the address bit
+            return (bit_offset + n + 7) // 8
+        return BASE_DTYPES[self.name].itemsize * n
+
+    @property
+    def numeric(self):
+        return self.udt is None and self.name != "Bool"
+
+    def decode(self, data, pos, bit_offset=0):
+        """Returns the decoded NumPy array (structured for UDTs).
+
+        The array is a copy, so it stays valid as the last published value after
+        the read buffer is reused. Raises ValueError if the buffer is too short.
+        """
+        n = self.count or 1
+        if self.udt is not None:
+            return np.frombuffer(data, self.udt.dtype, n, pos).copy()
+        if self.name == "Bool":
+            raw = np.frombuffer(data, np.uint8, self.size(bit_offset), pos)
+            return np.unpackbits(raw, bitorder="little")[bit_offset:bit_offset + n].astype(bool)
+        return np.frombuffer(data, BASE_DTYPES[self.name], n, pos).copy()
+
+    def changed(self, value, last, deadband, percent, on_change):
+        """Whether an array value should be published again (see ChangeFilter)."""
+        if deadband > 0 and self.numeric:
+            last = last.astype(np.float64)
+            limit = np.abs(last) * (deadband / 100) if percent else deadband
+            return bool(np.any(np.abs(value.astype(np.float64) - last) > limit))
+        if deadband > 0 or on_change:
+            return not np.array_equal(value, last)
+        return True
+
+    def preview(self, value):
+        """Short display text for the tag table."""
+        items = self._records(value[:PREVIEW_ELEMENTS]) if self.udt is not None else [
+            self.element_format(v) for v in value[:PREVIEW_ELEMENTS].tolist()]
+        if self.count is None:
+            return str(items[0])
+        more = ", ..." if self.count > PREVIEW_ELEMENTS else ""
+        return f"[{self.count}] " + ", ".join(str(v) for v in items) + more
+
+    def publish(self, name, value, flatten):
+        """``(tag, value)`` samples for data_received.
+
+        Unflattened, the tag carries the whole array as a list (a dict per UDT
+        instance). Flattened, every element or UDT field becomes its own tag.
+        """
+        if not flatten:
+            if self.udt is not None:
+                records = self._records(value)
+                return [(name, records[0] if self.count is None else records)]
+            return [(name, value.tolist())]
+
+        if self.udt is None:
+            fmt = self.element_format
+            return [(f"{name}[{k}]", fmt(v)) for k, v in enumerate(value.tolist())]
+
+        samples = []
+        columns = self._columns(value)
+        for k in range(len(value)):
+            prefix = name if self.count is None else f"{name}[{k}]"
+            for field, ftype, column in columns:
+                v = column[k]
+                samples.append((f"{prefix}.{field}", ELEMENT_FORMATS.get(ftype, str)(v)))
+        return samples
+
+    def _columns(self, value):
+        columns = []
+        for field, ftype, _, bit in self.udt.fields:
+            column = value[field]
+            if ftype == "Bool":
+                column = ((column >> bit) & 1).astype(bool)
+            columns.append((field, ftype, column.tolist()))
+        return columns
+
+    def _records(self, value):
+        columns = self._columns(value)
+        return [{field: column[k] for field, _, column in columns} for k in range(len(value))]
@@ -0,0 +1,537 @@
+"""Sparkplug B payloads without a protobuf dependency.
+
+Sparkplug B messages are published under
+``spBv1.0/<group>/<message type>/<edge node>[/<device>]`` with a protobuf
+``Payload`` (timestamp, seq and a list of metrics). Only the parts of the
+schema needed for tag values are encoded and decoded here: metric name, alias,
+timestamp, datatype, the null flag and the scalar and array values. Data sets,
+templates, properties and metadata are skipped.
+
+Births (NBIRTH/DBIRTH) carry metric names and may assign numeric aliases;
+later DATA messages then only carry the alias. ``SparkplugDecoder`` keeps one
+alias table per edge node (aliases are unique across a node and its devices),
+so a DATA metric resolves with one dictionary lookup. ``SparkplugEncoder``
+does the reverse for outbound tags: it sends births when a node, device or
+metric is new and DATA messages with aliases only afterwards.
+
+Received metrics become samples named ``<group>/<node>[/<device>]/<metric>``.
+"""
+import struct
+import time
+
+NAMESPACE = "spBv1.0"
+REBIRTH_METRIC = "Node Control/Rebirth"
+
+# Metric datatypes
+INT8, INT16, INT32, INT64, UINT8, UINT16, UINT32, UINT64 = 1, 2, 3, 4, 5, 6, 7, 8
+FLOAT, DOUBLE, BOOLEAN, STRING, DATETIME, TEXT, UUID = 9, 10, 11, 12, 13, 14, 15
+BYTES, FILE = 17, 18
+BOOLEAN_ARRAY, STRING_ARRAY = 32, 33
+
+_SIGNED_BITS = {INT8: 8, INT16: 16, INT32: 32, INT64: 64}
+# Int8Array ... DoubleArray, DateTimeArray: little-endian values packed in bytes_value
+_ARRAY_FORMATS = {22: "b", 23: "h", 24: "i", 25: "q", 26: "B", 27: "H", 28: "I", 29: "Q",
+                  30: "f", 31: "d", 34: "q"}
+_INT_ARRAY, _DOUBLE_ARRAY = 25, 31
+# A metric keeps the wider type once it had it, so values alternating between both do not cause births
+_WIDER = {FLOAT: DOUBLE, INT32: INT64}
+
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+_U32 = struct.Struct("<I")
+
+_VARINT, _FIXED64, _LENGTH, _FIXED32 = 0, 1, 2, 5
+
+
+# --- Protobuf wire format ---
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(buf, pos, end):
+    """Yields ``(field number, value)``; varints as int, everything else as the raw bytes."""
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        wire = key & 7
+        if wire == _VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire == _LENGTH:
+            length, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire == _FIXED32:
+            value = buf[pos:pos + 4]
+            pos += 4
+        elif wire == _FIXED64:
+            value = buf[pos:pos + 8]
+            pos += 8
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire}")
+        if pos > end:
+            raise ValueError("Truncated protobuf message")
+        yield key >> 3, value
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _key(field, wire):
+    return _varint(field << 3 | wire)
+
+
+def _length_field(field, data):
+    return _key(field, _LENGTH) + _varint(len(data)) + data
+
+
+# --- Payload ---
+
+class Metric:
+    __slots__ = ("name", "alias", "timestamp", "datatype", "value")
+
+    def __init__(self, name=None, alias=None, timestamp=None, datatype=None, value=None):
+        self.name = name
+        self.alias = alias
+        self.timestamp = timestamp
+        self.datatype = datatype
+        self.value = value
+
+    def __repr__(self):
+        return f"Metric({self.name!r}, alias={self.alias}, type={self.datatype}, value={self.value!r})"
+
+
+def decode_payload(payload):
+    """Returns ``(timestamp, seq, [Metric])`` of a Sparkplug B payload; raises ValueError if it is not one.
+
+    Integer values are left unsigned: their sign depends on the datatype,
+    which DATA messages usually leave to the birth (see ``convert``).
+    """
+    try:
+        timestamp = seq = None
+        metrics = []
+        for field, value in _fields(payload, 0, len(payload)):
+            if field == 2:
+                metrics.append(_decode_metric(value))
+            elif field == 1:
+                timestamp = value
+            elif field == 3:
+                seq = value
+        return timestamp, seq, metrics
+    except (IndexError, struct.error, UnicodeDecodeError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid Sparkplug B payload: {e}") from None
+
+
+def _decode_metric(buf):
+    metric = Metric()
+    is_null = False
+    pos, end = 0, len(buf)
+    # Fast path for the fields DATA metrics consist of (alias, scalar value); the rest go through _fields
+    while pos < end:
+        key = buf[pos]
+        if key == 0x10:    # alias
+            metric.alias, pos = _read_varint(buf, pos + 1)
+        elif key == 0x65:  # float_value
+            (metric.value,) = _FLOAT.unpack_from(buf, pos + 1)
+            pos += 5
+        elif key == 0x69:  # double_value
+            (metric.value,) = _DOUBLE.unpack_from(buf, pos + 1)
+            pos += 9
+        elif key in (0x50, 0x58, 0x70):  # int, long and boolean values
+            metric.value, pos = _read_varint(buf, pos + 1)
+            if key == 0x70:
+                metric.value = bool(metric.value)
+        else:
+            break
+    if pos > end:
+        raise IndexError("Truncated metric")
+    for field, value in _fields(buf, pos, end):
+        if field == 1:
+            metric.name = value.decode()
+        elif field == 2:
+            metric.alias = value
+        elif field == 3:
+            metric.timestamp = value
+        elif field == 4:
+            metric.datatype = value
+        elif field == 7:
+            is_null = bool(value)
+        elif field in (10, 11):
+            metric.value = value
+        elif field == 12:
+            (metric.value,) = _FLOAT.unpack(value)
+        elif field == 13:
+            (metric.value,) = _DOUBLE.unpack(value)
+        elif field == 14:
+            metric.value = bool(value)
+        elif field == 15:
+            metric.value = value.decode()
+        elif field == 16:
+            metric.value = bytes(value)
+    if is_null:
+        metric.value = None
+    return metric
+
+
+def convert(value, datatype):
+    """Value of a decoded metric as its datatype: signed integers and arrays are unpacked."""
+    if value is None or datatype is None:
+        return value
+    bits = _SIGNED_BITS.get(datatype)
+    if bits is not None and isinstance(value, int):
+        value &= (1 << bits) - 1
+        return value - (1 << bits) if value >> (bits - 1) else value
+    if isinstance(value, bytes):
+        fmt = _ARRAY_FORMATS.get(datatype)
+        if fmt is not None:
+            # A trailing partial element (a truncated payload) is ignored
+            return list(struct.unpack_from(f"<{len(value) // struct.calcsize(fmt)}{fmt}", value))
+        if datatype == BOOLEAN_ARRAY and len(value) >= 4:
+            (count,) = _U32.unpack_from(value)
+            return [bool(value[4 + i // 8] >> (7 - i % 8) & 1) for i in range(min(count, (len(value) - 4) * 8))]
+        if datatype == STRING_ARRAY:
+            return [s.decode() for s in value.split(b"\0")[:-1]]
+    return value
+
+
+def infer_datatype(value):
+    """Smallest Sparkplug datatype holding a Python (or NumPy) value exactly.
+
+    Floats that are exact in single precision (e.g. values read from a PLC
+    REAL) become Float, integers within 32 bits Int32.
+    """
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if value is None:
+        return STRING
+    if isinstance(value, bool):
+        return BOOLEAN
+    if isinstance(value, int):
+        if -(1 << 31) <= value < (1 << 31):
+            return INT32
+        return INT64 if -(1 << 63) <= value < (1 << 63) else UINT64 if 0 <= value < (1 << 64) else STRING
+    if isinstance(value, float):
+        try:
+            return FLOAT if _FLOAT.unpack(_FLOAT.pack(value))[0] == value else DOUBLE
+        except OverflowError:
+            return DOUBLE
+    if isinstance(value, bytes):
+        return BYTES
+    if isinstance(value, (list, tuple)) and value:
+        if all(isinstance(v, bool) for v in value):
+            return BOOLEAN_ARRAY
+        if all(isinstance(v, int) and not isinstance(v, bool) and -(1 << 63) <= v < (1 << 63) for v in value):
+            return _INT_ARRAY
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+            return _DOUBLE_ARRAY
+        if all(isinstance(v, str) for v in value):
+            return STRING_ARRAY
+    return STRING
+
+
+def encode_metric(name=None, alias=None, datatype=None, value=None, timestamp=None, typed=True):
+    """One ``Metric`` message.
+
+    ``datatype`` (inferred when None) selects the value field; it is written
+    unless ``typed`` is false, as DATA metrics leave it to the birth.
+    """
+    out = bytearray()
+    if name is not None:
+        out += _length_field(1, name.encode())
+    if alias is not None:
+        out += _key(2, _VARINT) + _varint(alias)
+    if timestamp is not None:
+        out += _key(3, _VARINT) + _varint(timestamp)
+    dt = infer_datatype(value) if datatype is None else datatype
+    if typed:
+        out += _key(4, _VARINT) + _varint(dt)
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if value is None:
+        out += _key(7, _VARINT) + b"\x01"
+    elif dt in (INT8, INT16, INT32, UINT8, UINT16, UINT32):
+        out += _key(10, _VARINT) + _varint(int(value) & 0xFFFFFFFF)
+    elif dt in (INT64, UINT64, DATETIME):
+        out += _key(11, _VARINT) + _varint(int(value) & 0xFFFFFFFFFFFFFFFF)
+    elif dt == FLOAT:
+        out += _key(12, _FIXED32) + _FLOAT.pack(value)
+    elif dt == DOUBLE:
+        out += _key(13, _FIXED64) + _DOUBLE.pack(value)
+    elif dt == BOOLEAN:
+        out += _key(14, _VARINT) + (b"\x01" if value else b"\x00")
+    elif dt in (BYTES, FILE):
+        out += _length_field(16, bytes(value))
+    elif dt in _ARRAY_FORMATS:
+        fmt = _ARRAY_FORMATS[dt]
+        out += _length_field(16, struct.pack(f"<{len(value)}{fmt}", *value))
+    elif dt == BOOLEAN_ARRAY:
+        bits = bytearray((len(value) + 7) // 8)
+        for i, v in enumerate(value):
+            if v:
+                bits[i // 8] |= 0x80 >> (i % 8)
+        out += _length_field(16, _U32.pack(len(value)) + bits)
+    elif dt == STRING_ARRAY:
+        out += _length_field(16, b"".join(s.encode() + b"\0" for s in value))
+    else:
+        out += _length_field(15, str(value).encode())
+    return bytes(out)
+
+
+def encode_payload(metrics, timestamp=None, seq=None):
+    """``Payload`` message from encoded metrics."""
+    out = bytearray()
+    if timestamp is not None:
+        out += _key(1, _VARINT) + _varint(timestamp)
+    for metric in metrics:
+        out += _length_field(2, metric)
+    if seq is not None:
+        out += _key(3, _VARINT) + _varint(seq)
+    return bytes(out)
+
+
+# --- Topics ---
+
+def parse_topic(topic):
+    """Returns ``(group, message type, edge node, device or None)``, or None outside the namespace."""
+    levels = topic.split("/")
+    if len(levels) < 4 or levels[0] != NAMESPACE or levels[1] == "STATE":
+        return None
+    return levels[1], levels[2], levels[3], levels[4] if len(levels) > 4 else None
+
+
+def split_metric_topic(topic):
+    """Splits ``spBv1.0/<group>/<type>/<node>[/<device>]/<metric>`` into message topic and metric name.
+
+    Node messages (N...) have no device level, device messages (D...) have
+    one. Metric names may contain ``/``. Returns None outside the namespace
+    or without a metric name.
+    """
+    levels = topic.split("/")
+    if len(levels) < 4 or levels[0] != NAMESPACE or levels[2][:1] not in ("N", "D"):
+        return None
+    depth = 4 if levels[2][0] == "N" else 5
+    if len(levels) <= depth:
+        return None
+    return "/".join(levels[:depth]), "/".join(levels[depth:])
+
+
+# --- Host side: received messages ---
+
+class _NodeState:
+    __slots__ = ("aliases", "types", "seq")
+
+    def __init__(self):
+        self.aliases = {}  # alias -> (sample name, datatype)
+        self.types = {}    # sample name -> datatype, for DATA metrics sent by name
+        self.seq = None    # expected seq of the next message
+
+
+class SparkplugDecoder:
+    """Turns received Sparkplug B messages into tag samples.
+
+    Not thread-safe; used from the thread that decodes received messages.
+    """
+
+    def __init__(self):
+        self.nodes = {}          # (group, node) -> _NodeState
+        self.unknown_aliases = 0
+        self.seq_gaps = 0
+        self.needs_rebirth = set()    # (group, node) of DATA with unknown aliases
+        self.rebirth_commands = set()  # (group, node) told to rebirth by an NCMD
+
+    def decode(self, topic, payload):
+        """Returns ``(message type, samples, summary text)``, or None if ``topic`` is not Sparkplug B.
+
+        Raises ValueError for a Sparkplug topic with an invalid payload.
+        """
+        parsed = parse_topic(topic)
+        if parsed is None:
+            return None
+        timestamp, seq, metrics = decode_payload(payload)
+        try:
+            return self._decode(parsed, seq, metrics)
+        except (IndexError, struct.error, UnicodeDecodeError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid Sparkplug B metric: {e}") from None
+
+    def _decode(self, parsed, seq, metrics):
+        group, message_type, node_id, device = parsed
+        key = (group, node_id)
+        prefix = f"{group}/{node_id}/{device}/" if device else f"{group}/{node_id}/"
+
+        if message_type == "NBIRTH":
+            node = self.nodes[key] = _NodeState()  # New session: earlier aliases are void
+        elif message_type == "NDEATH":
+            self.nodes.pop(key, None)
+            return message_type, [], f"[Sparkplug {message_type}]"
+        else:
+            node = self.nodes.get(key)
+        if node is not None and seq is not None and message_type not in ("NCMD", "DCMD"):
+            if node.seq is not None and seq != node.seq and message_type != "NBIRTH":
+                self.seq_gaps += 1
+            node.seq = (seq + 1) % 256
+
+        samples = []
+        if message_type in ("NBIRTH", "DBIRTH"):
+            if node is None:
+                node = self.nodes[key] = _NodeState()
+            for metric in metrics:
+                if metric.name is None:
+                    continue
+                name = prefix + metric.name
+                node.types[name] = metric.datatype
+                if metric.alias is not None:
+                    node.aliases[metric.alias] = (name, metric.datatype)
+                samples.append((name, convert(metric.value, metric.datatype)))
+        elif message_type in ("NDATA", "DDATA"):
+            aliases = node.aliases if node is not None else {}
+            types = node.types if node is not None else {}
+            for metric in metrics:
+                if metric.name is not None:
+                    name = prefix + metric.name
+                    datatype = metric.datatype or types.get(name)
+                else:
+                    known = aliases.get(metric.alias)
+                    if known is None:
+                        self.unknown_aliases += 1
+                        self.needs_rebirth.add(key)
+                        continue
+                    name, datatype = known
+                    datatype = metric.datatype or datatype
+                samples.append((name, convert(metric.value, datatype)))
+        elif message_type == "NCMD":
+            for metric in metrics:
+                if metric.name == REBIRTH_METRIC and metric.value:
+                    self.rebirth_commands.add(key)
+
+        shown = samples or [(prefix + (m.name or f"#{m.alias}"), convert(m.value, m.datatype)) for m in metrics]
+        text = ", ".join(f"{name[len(prefix):]}={value}" for name, value in shown[:8])
+        if len(shown) > 8:
+            text += f", ... ({len(shown)} metrik)"
+        return message_type, samples, f"[Sparkplug {message_type}] {text}"
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def rebirth_request(group, node_id):
+    """``(topic, payload)`` of the NCMD asking an edge node to send its births again."""
+    metric = encode_metric(REBIRTH_METRIC, datatype=BOOLEAN, value=True)
+    return f"{NAMESPACE}/{group}/NCMD/{node_id}", encode_payload([metric], _now())
+
+
+# --- Edge side: outbound tags ---
+
+class _EdgeNode:
+    __slots__ = ("metrics", "devices", "born", "born_devices", "seq", "bd_seq", "next_alias")
+
+    def __init__(self):
+        self.metrics = {}        # name -> [alias, datatype, value]
+        self.devices = {}        # device -> {name: [alias, datatype, value]}
+        self.born = False
+        self.born_devices = set()
+        self.seq = 0
+        self.bd_seq = 0
+        self.next_alias = 1
+
+
+class SparkplugEncoder:
+    """Encodes outbound tag values as Sparkplug B messages.
+
+    For NDATA/DDATA topics the births are sent first (again whenever a new
+    metric appears), assigning an alias to every metric; DATA messages then
+    carry aliases only. Other topics, e.g. NCMD/DCMD, get metrics by name.
+    Not thread-safe; used from the thread that publishes.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # (group, node) -> _EdgeNode
+
+    def reset(self):
+        """Births are sent again, e.g. after a reconnect."""
+        for node in self.nodes.values():
+            node.born = False
+
+    def rebirth(self, group, node_id):
+        node = self.nodes.get((group, node_id))
+        if node is not None:
+            node.born = False
+
+    def encode(self, topic, values, timestamp=None):
+        """Returns the ``[(topic, payload)]`` messages publishing ``values`` (metric name -> value)."""
+        if timestamp is None:
+            timestamp = _now()
+        parsed = parse_topic(topic)
+        if parsed is None or parsed[1] not in ("NDATA", "DDATA"):
+            metrics = [encode_metric(name, value=value) for name, value in values.items()]
+            return [(topic, encode_payload(metrics, timestamp))]
+
+        group, message_type, node_id, device = parsed
+        node = self.nodes.get((group, node_id))
+        if node is None:
+            node = self.nodes[(group, node_id)] = _EdgeNode()
+        if message_type == "NDATA":
+            device = None
+        elif device is None:
+            return []
+        metrics = node.metrics if device is None else node.devices.setdefault(device, {})
+        new = False
+        for name, value in values.items():
+            metric = metrics.get(name)
+            datatype = metric[1] if value is None and metric is not None else infer_datatype(value)
+            if metric is None:
+                metrics[name] = [node.next_alias, datatype, value]
+                node.next_alias += 1
+                new = True
+            else:
+                if metric[1] != datatype and _WIDER.get(datatype) != metric[1]:
+                    metric[1] = datatype
+                    new = True
+                metric[2] = value
+
+        messages = []
+        node_topic = f"{NAMESPACE}/{group}/{{}}/{node_id}"
+        if not node.born or (new and device is None):
+            messages.append((node_topic.format("NBIRTH"), self._node_birth(node, timestamp)))
+            if device is None:
+                return messages  # The birth carries the new values
+        if device not in node.born_devices or new:
+            node.born_devices.add(device)
+            payload = self._birth(node, node.devices[device], timestamp)
+            messages.append((f"{node_topic.format('DBIRTH')}/{device}", payload))
+            return messages
+        data = [encode_metric(alias=metrics[name][0], datatype=metrics[name][1], value=value, typed=False)
+                for name, value in values.items()]
+        messages.append((topic, encode_payload(data, timestamp, self._next_seq(node))))
+        return messages
+
+    def _next_seq(self, node):
+        seq = node.seq
+        node.seq = (seq + 1) % 256
+        return seq
+
+    def _node_birth(self, node, timestamp):
+        node.born = True
+        node.born_devices.clear()  # Devices are born again after their node
+        node.seq = 0
+        control = [encode_metric("bdSeq", datatype=INT64, value=node.bd_seq),
+                   encode_metric(REBIRTH_METRIC, datatype=BOOLEAN, value=False)]
+        node.bd_seq = (node.bd_seq + 1) % 256
+        return self._birth(node, node.metrics, timestamp, control)
+
+    def _birth(self, node, metrics, timestamp, extra=()):
+        encoded = list(extra)
+        encoded.extend(encode_metric(name, alias, datatype, value) for name, (alias, datatype, value) in metrics.items())
+        return encode_payload(encoded, timestamp, self._next_seq(node))
@@ -0,0 +1,90 @@
+"""Pseudo-serial Modbus RTU multi-drop bus for trying the RTU bus scheduler.
+
+Serves RTU frames (with CRC) over TCP, so pyserial opens it as a serial port:
+select RTU in the tool, type ``socket://127.0.0.1:5020`` as the COM port and
+use the same baud rate as the server. Every slave answers after its own
+turnaround time, a few slaves never answer, and frames take their wire time at
+the configured baud rate on one shared half-duplex line.
+
+    python tests/modbus_rtu_bus_server.py [port] [baud] [slaves]
+"""
+import asyncio
+import random
+import struct
+import sys
+
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 5020
+BAUD = int(sys.argv[2]) if len(sys.argv) > 2 else 19200
+SLAVES = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+CHAR_TIME = 11 / BAUD
+DEAD = {7, 19, 23}                                                     # Hiç yanıt vermeyen slave'ler
+TURNAROUND = {s: random.uniform(0.005, 0.040) for s in range(1, SLAVES + 1)}
+TURNAROUND[12] = 0.150                                                 # Yavaş bir cihaz
+
+
+def crc16(data):
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return struct.pack("<H", crc)
+
+
+def respond(slave, func, address, count):
+    if func in (3, 4):
+        # Register değeri adresi ve slave numarasını taşır
+        values = [(slave * 1000 + address + i) & 0xFFFF for i in range(count)]
+        body = struct.pack(f">B{count}H", count * 2, *values)
+    elif func in (1, 2):
+        bits = bytearray((count + 7) // 8)
+        for i in range(count):
+            if (address + i + slave) % 3 == 0:
+                bits[i // 8] |= 1 << (i % 8)
+        body = bytes([len(bits)]) + bits
+    else:
+        body = bytes([1])  # Illegal function
+        func |= 0x80
+    frame = bytes([slave, func]) + body
+    return frame + crc16(frame)
+
+
+async def handle(reader, writer):
+    print("İstemci bağlandı:", writer.get_extra_info("peername"))
+    buffer = b""
+    try:
+        while True:
+            data = await reader.read(256)
+            if not data:
+                break
+            buffer += data
+            while len(buffer) >= 8:
+                frame, buffer = buffer[:8], buffer[8:]
+                if crc16(frame[:6]) != frame[6:]:
+                    print("CRC hatası, hat temizlendi:", frame.hex())
+                    buffer = b""
+                    break
+                slave, func, address, count = struct.unpack(">BBHH", frame[:6])
+                await asyncio.sleep(8 * CHAR_TIME)  # İsteğin hattaki süresi
+                if slave in DEAD or slave not in TURNAROUND:
+                    continue
+                response = respond(slave, func, address, count)
+                await asyncio.sleep(TURNAROUND[slave] + len(response) * CHAR_TIME)
+                writer.write(response)
+                await writer.drain()
+    finally:
+        writer.close()
+        print("İstemci ayrıldı")
+
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", PORT)
+    print(f"Modbus RTU hattı socket://127.0.0.1:{PORT} üzerinde, {BAUD} baud, slave 1-{SLAVES} "
+          f"(yanıtsız: {sorted(DEAD)})")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,22 @@
-import paho.mqtt.client as mqtt
+"""MQTT test araçları.
+
+    python tests/mqtt_live_server.py                      # localhost:1883'e sıcaklık yayınlar
+    python tests/mqtt_live_server.py broker [port] [aralık] [süre]
+
+``broker`` modu yerel bir MQTT 3.1.1 broker'ı başlatır (QoS 0/1/2 publish,
+subscribe, ping ve retained mesajlar; oturum yok). ``aralık`` verilirse broker her
+``aralık`` saniyede bir bütün bağlantıları kapatır ve ``süre`` saniye boyunca
+bağlantı kabul etmez; disk kuyruğunu (store & forward) denemek için. Gelen
+mesaj sayısı her saniye yazdırılır; tamsayı payload'lar topic başına sayaç
+kabul edilir ve tekrar gelen ya da hiç gelmeyen değerler de sayılır.
+"""
+import asyncio
+import struct
+import sys
 import time
 
+import paho.mqtt.client as mqtt
+
 # Broker ayarları
 broker_adresi = "localhost"  # Halka açık bir test broker'ı
 port = 1883
@@ -13,35 +29,186 @@ def on_connect(client, userdata, flags, rc):
     else:
         print(f"Bağlantı hatası! Kod: {rc}")
 
-# İstemci (client) oluşturma
-client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, "PythonPublisher") # Benzersiz bir client ID verin
-client.on_connect = on_connect # Bağlantı durumunda on_connect fonksiyonunu çağır
 
-# Broker'a bağlanma
-client.connect(broker_adresi, port, 60)
+def publisher():
+    # İstemci (client) oluşturma
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, "PythonPublisher") # Benzersiz bir client ID verin
+    client.on_connect = on_connect # Bağlantı durumunda on_connect fonksiyonunu çağır
+
+    # Broker'a bağlanma
+    client.connect(broker_adresi, port, 60)
+
+    # Mesaj göndermek için bir döngü
+    # Bu döngü, programın hemen kapanmasını engeller ve mesaj gönderimini sağlar.
+    client.loop_start()
+
+    try:
+        sicaklik = 24.5
+        while True:
+            # Mesajı oluşturma ve gönderme
+            mesaj = f"Sıcaklık: {sicaklik:.1f} C"
+            result = client.publish(konu, mesaj)
+
+            # Gönderim durumunu kontrol etme
+            status = result[0]
+            if status == 0:
+                print(f"'{konu}' konusuna mesaj gönderildi: '{mesaj}'")
+            else:
+                print(f"'{konu}' konusuna mesaj gönderilemedi.")
+
+            sicaklik += 0.1 # Sıcaklığı her seferinde biraz artır
+            time.sleep(5) # 5 saniye bekle
+
+    except KeyboardInterrupt:
+        print("Program sonlandırılıyor.")
+        client.loop_stop()
+        client.disconnect()
+
+
+# --- Yerel broker ---
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
 
-# Mesaj göndermek için bir döngü
-# Bu döngü, programın hemen kapanmasını engeller ve mesaj gönderimini sağlar.
-client.loop_start()
 
-try:
-    sicaklik = 24.5
+def topic_matches(topic_filter, topic):
+    filter_levels, levels = topic_filter.split("/"), topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(levels) or level not in ("+", levels[i]):
+            return False
+    return len(filter_levels) == len(levels)
+
+
+def packet(packet_type, body, flags=0):
+    length = bytearray()
+    n = len(body)
+    while True:
+        byte, n = n % 128, n // 128
+        length.append(byte | (0x80 if n else 0))
+        if not n:
+            break
+    return bytes([packet_type << 4 | flags]) + bytes(length) + body
+
+
+class Broker:
+    def __init__(self):
+        self.clients = {}  # writer -> abonelik filtreleri
+        self.received = 0
+        self.repeated = 0
+        self.missing = 0
+        self.last_seq = {}  # topic -> en büyük sayaç değeri
+        self.retained = {}  # topic -> son retained payload
+
+    async def handle(self, reader, writer):
+        self.clients[writer] = []
+        print("İstemci bağlandı:", writer.get_extra_info("peername"))
+        try:
+            while True:
+                first = (await reader.readexactly(1))[0]
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+                packet_type = first >> 4
+                if packet_type == CONNECT:
+                    writer.write(packet(CONNACK, b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    self.on_publish(writer, (first >> 1) & 3, first & 1, body)
+                elif packet_type == PUBREL:
+                    writer.write(packet(PUBCOMP, body[:2]))
+                elif packet_type == SUBSCRIBE:
+                    pos, granted = 2, b""
+                    while pos < len(body):
+                        (n,) = struct.unpack_from(">H", body, pos)
+                        topic_filter = body[pos + 2:pos + 2 + n].decode()
+                        self.clients[writer].append(topic_filter)
+                        pos += 3 + n
+                        granted += b"\x00"
+                    writer.write(packet(SUBACK, body[:2] + granted))
+                    for topic, payload in self.retained.items():
+                        if topic_matches(topic_filter, topic):
+                            name = topic.encode()
+                            writer.write(packet(PUBLISH, struct.pack(">H", len(name)) + name + payload, flags=1))
+                elif packet_type == PINGREQ:
+                    writer.write(packet(PINGRESP, b""))
+                elif packet_type == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.pop(writer, None)
+            writer.close()
+            print("İstemci ayrıldı")
+
+    def on_publish(self, writer, qos, retain, body):
+        (n,) = struct.unpack_from(">H", body)
+        topic = body[2:2 + n].decode()
+        pos = 2 + n
+        if qos:
+            packet_id = body[pos:pos + 2]
+            pos += 2
+            writer.write(packet(PUBACK if qos == 1 else PUBREC, packet_id))
+        payload = body[pos:]
+        self.received += 1
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        try:
+            seq = int(payload)
+        except ValueError:
+            seq = None
+        if seq is not None:
+            last = self.last_seq.get(topic, seq - 1)
+            if seq <= last:
+                self.repeated += 1  # QoS 1 tekrarı ya da sıra dışı
+            else:
+                self.missing += seq - last - 1
+                self.last_seq[topic] = seq
+        for client, filters in list(self.clients.items()):
+            if any(topic_matches(f, topic) for f in filters):
+                client.write(packet(PUBLISH, body[:2 + n] + payload))
+
+    def disconnect_all(self):
+        for writer in list(self.clients):
+            writer.close()
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(1)
+            print(f"Alınan: {self.received}, tekrar: {self.repeated}, eksik: {self.missing}, "
+                  f"bağlı: {len(self.clients)}", flush=True)
+
+
+async def run_broker(port, interval, outage):
+    broker = Broker()
+    asyncio.create_task(broker.report())
+    print(f"MQTT broker 127.0.0.1:{port} üzerinde")
     while True:
-        # Mesajı oluşturma ve gönderme
-        mesaj = f"Sıcaklık: {sicaklik:.1f} C"
-        result = client.publish(konu, mesaj)
-        
-        # Gönderim durumunu kontrol etme
-        status = result[0]
-        if status == 0:
-            print(f"'{konu}' konusuna mesaj gönderildi: '{mesaj}'")
-        else:
-            print(f"'{konu}' konusuna mesaj gönderilemedi.")
-            
-        sicaklik += 0.1 # Sıcaklığı her seferinde biraz artır
-        time.sleep(5) # 5 saniye bekle
-
-except KeyboardInterrupt:
-    print("Program sonlandırılıyor.")
-    client.loop_stop()
-    client.disconnect()
\ No newline at end of file
+        server = await asyncio.start_server(broker.handle, "127.0.0.1", port)
+        if not interval:
+            async with server:
+                await server.serve_forever()
+        await asyncio.sleep(interval)
+        print(f"Kesinti: bağlantılar kapatıldı, {outage} s bağlantı kabul edilmeyecek")
+        server.close()
+        broker.disconnect_all()
+        await server.wait_closed()
+        await asyncio.sleep(outage)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "broker":
+        args = sys.argv[2:]
+        asyncio.run(run_broker(int(args[0]) if args else port,
+                               float(args[1]) if len(args) > 1 else 0,
+                               float(args[2]) if len(args) > 2 else 10))
+    else:
+        publisher()
@@ -0,0 +1,140 @@
+"""ModbusAsyncEngine hata ve pipelining testleri: python -m pytest tests/test_modbus_engine.py
+
+Sunucular test içinde asyncio ile açılır; donanım gerekmez.
+"""
+import asyncio
+import os
+import socket
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocols.modbus_handler import ModbusAsyncEngine, _HostState  # noqa: E402
+from protocols.modbus_planner import ModbusPollPlan  # noqa: E402
+
+TIMEOUT = 0.3
+
+
+class ModbusServer:
+    """Modbus TCP server answering function 3 with ``address + i`` after ``delay`` seconds.
+
+    ``mode``: "pipeline" answers every request, "busy" answers requests that
+    arrive while another is in progress with exception 6 (Slave Device Busy),
+    "drop" does not answer them at all.
+    """
+
+    def __init__(self, mode, delay=0.02):
+        self.mode = mode
+        self.delay = delay
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def handle(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                tid, _, length, unit = struct.unpack(">HHHB", header)
+                pdu = await reader.readexactly(length - 1)
+                func, address, count = struct.unpack(">BHH", pdu[:5])
+                if pending and self.mode != "pipeline":
+                    if self.mode == "busy":
+                        writer.write(struct.pack(">HHHBBB", tid, 0, 3, unit, func | 0x80, 6))
+                    continue
+                task = asyncio.create_task(self.answer(writer, tid, unit, func, address, count))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # Client gone or test over
+        finally:
+            writer.close()
+
+    async def answer(self, writer, tid, unit, func, address, count):
+        await asyncio.sleep(self.delay)
+        data = struct.pack(f">{count}H", *range(address, address + count))
+        writer.write(struct.pack(">HHHBBB", tid, 0, len(data) + 3, unit, func, len(data)) + data)
+
+    def close(self):
+        self.server.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_plan():
+    # Three separate requests, so a pipelining client sends them together
+    definitions = [(i, "", "1", "3", str(address), "2", "UInt16", "ABCD") for i, address in enumerate((0, 200, 400))]
+    return ModbusPollPlan(definitions, 0, "", 100)
+
+
+def run_polls(address, cycles=2, pipeline=3):
+    """Polls one host ``cycles`` times; returns (engine messages, host state, values of every cycle)."""
+    plan = make_plan()
+    engine = ModbusAsyncEngine([(address, plan)], TIMEOUT, 1, pipeline)
+    messages, values = [], []
+    engine.error_occurred.connect(messages.append)
+    engine.data_ready.connect(lambda data: values.append(sorted(data[1])))
+
+    async def main():
+        state = _HostState(address, 1, pipeline)
+        for _ in range(cycles):
+            await engine._poll(state, plan)
+        for client in state.clients:
+            if client is not None:
+                client.close()
+        return state
+
+    state = asyncio.run(main())
+    return messages, state, values
+
+
+def run_with_server(mode, **kwargs):
+    async def main():
+        server = ModbusServer(mode)
+        address = await server.start()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: run_polls(address, **kwargs))
+        finally:
+            server.close()
+
+    return asyncio.run(main())
+
+
+def test_pipelining_host_keeps_depth():
+    messages, state, values = run_with_server("pipeline")
+    assert state.depth == 3 and not state.down
+    assert messages == []
+    assert values[-1] == [(0, [0, 1]), (1, [200, 201]), (2, [400, 401])]
+
+
+def test_busy_host_falls_back_without_going_down():
+    messages, state, values = run_with_server("busy")
+    assert state.depth == 1
+    assert not state.down and state.retry_at == 0.0
+    assert len(messages) == 1 and "pipelining desteklenmiyor" in messages[0]
+    # The next cycle is polled one request at a time and every tag is read
+    assert all(v is not None for _, v in values[-1])
+
+
+def test_silent_host_falls_back_on_timeout():
+    messages, state, values = run_with_server("drop")
+    assert len(messages) == 1 and "pipelining desteklenmiyor" in messages[0]
+    assert state.depth == 1 and not state.down
+    assert [m for m in messages if "yeniden kuruldu" in m] == []
+    assert all(v is not None for _, v in values[-1])
+
+
+def test_offline_host_keeps_pipelining_and_backs_off():
+    messages, state, values = run_polls(("127.0.0.1", free_port()), cycles=2)
+    assert state.depth == 3
+    assert state.down and state.backoff > 0 and state.retry_at > 0
+    assert len(messages) == 1 and "pipelining" not in messages[0]
+    assert values[0] and all(v is None for _, v in values[0])
+    assert len(values) == 1  # the second cycle waits for the backoff
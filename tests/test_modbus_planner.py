@@ -0,0 +1,76 @@
+"""Modbus okuma planlayıcısı testleri: python -m pytest tests/test_modbus_planner.py"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocols.modbus_planner import FUNC_LIMITS, ModbusPollPlan, ScanSchedule, plan_requests  # noqa: E402
+
+
+def spans(requests):
+    return sorted((r.slave, r.func, r.address, r.count, sorted(r.members)) for r in requests)
+
+
+def test_adjacent_tags_share_a_request():
+    tags = [(1, 3, 0, 2), (1, 3, 2, 2), (1, 3, 4, 1)]
+    assert spans(plan_requests(tags)) == [(1, 3, 0, 5, [0, 1, 2])]
+
+
+def test_gap_is_merged_only_up_to_max_gap():
+    tags = [(1, 3, 0, 2), (1, 3, 5, 2)]
+    assert len(plan_requests(tags, max_gap=2)) == 2
+    assert spans(plan_requests(tags, max_gap=3)) == [(1, 3, 0, 7, [0, 1])]
+
+
+def test_slaves_and_functions_are_never_merged():
+    tags = [(1, 3, 0, 1), (2, 3, 1, 1), (1, 4, 1, 1), (1, 1, 0, 8)]
+    assert len(plan_requests(tags, max_gap=100)) == 4
+
+
+def test_requests_stay_within_the_function_limit():
+    tags = [(1, 3, i * 10, 10) for i in range(30)]  # 300 registers back to back
+    requests = plan_requests(tags)
+    assert all(r.count <= FUNC_LIMITS[3] for r in requests)
+    assert sum(r.count for r in requests) == 300
+    assert sorted(i for r in requests for i in r.members) == list(range(30))
+
+
+def test_overlapping_tags_are_served_by_one_request():
+    tags = [(1, 3, 10, 4), (1, 3, 12, 1), (1, 3, 8, 4)]
+    assert spans(plan_requests(tags)) == [(1, 3, 8, 6, [0, 1, 2])]
+
+
+def test_plan_splits_and_decodes_responses():
+    definitions = [(0, "a", "1", "3", "0", "1", "UInt16", "ABCD"),
+                   (1, "b", "1", "3", "1", "1", "Float32", "ABCD"),
+                   (2, "", "1", "1", "0", "3", "", ""),
+                   (3, "bad", "1", "9", "0", "1", "", "")]
+    plan = ModbusPollPlan(definitions)
+    assert plan.invalid_rows == [3]
+    assert plan.names == ["a", "b", "1:1"]
+    registers = {r.func: r for r in plan.requests}
+    results = dict(plan.split(registers[3], [7, 0x3FC0, 0x0000]))
+    assert results == {0: [7], 1: [1.5]}
+    assert dict(plan.split(registers[1], [True, False, True, False])) == {2: [True, False, True]}
+    assert dict(plan.split(registers[3], None)) == {0: None, 1: None}
+
+
+def test_schedule_keeps_absolute_deadlines():
+    schedule = ScanSchedule(0.1, 10.0)
+    for n in range(5):
+        schedule.start(10.0 + n * 0.1 + 0.01)  # Always 10 ms late
+        schedule.finish(10.0 + n * 0.1 + 0.03)
+    assert abs(schedule.deadline - 10.5) < 1e-9  # The lateness does not accumulate
+    assert schedule.overruns == 0
+    assert abs(schedule.jitter_max - 0.01) < 1e-9
+
+
+def test_overrun_skips_the_missed_slots():
+    schedule = ScanSchedule(0.1, 0.0)
+    schedule.start(0.0)
+    schedule.finish(0.35)  # Ran past the slots at 0.1, 0.2 and 0.3
+    assert schedule.overruns == 1
+    assert abs(schedule.deadline - 0.4) < 1e-9
+    period, cycles, overruns, jitter_avg, jitter_max, duration = schedule.snapshot()
+    assert (period, cycles, overruns) == (0.1, 1, 1)
+    assert abs(duration - 0.35) < 1e-9
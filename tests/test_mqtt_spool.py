@@ -0,0 +1,101 @@
+"""MQTT disk kuyruğu testleri: python -m pytest tests/test_mqtt_spool.py"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocols.mqtt_spool import SEGMENT_SUFFIX, MessageSpool, pack_record  # noqa: E402
+
+
+def drain(spool, limit=None):
+    sent = []
+    while limit is None or len(sent) < limit:
+        message = spool.peek()
+        if message is None:
+            break
+        sent.append(message)
+        spool.advance()
+    return sent
+
+
+def segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def test_replays_in_order_across_segments(tmp_path):
+    spool = MessageSpool(str(tmp_path), segment_bytes=1)  # minimum segment size, several segments
+    messages = [(f"t/{i % 3}", str(i).encode() * 5000, i % 3) for i in range(40)]
+    for message in messages:
+        spool.append(*message)
+    assert len(spool) == 40
+    assert len(segments(tmp_path)) > 1
+    assert drain(spool) == messages
+    assert len(spool) == 0 and spool.peek() is None
+    assert len(segments(tmp_path)) == 1  # Sent segments are deleted, the one being appended to is kept
+
+
+def test_appends_during_replay_keep_their_order(tmp_path):
+    spool = MessageSpool(str(tmp_path))
+    spool.append("a", b"1")
+    spool.append("a", b"2")
+    assert drain(spool, 1) == [("a", b"1", 0)]
+    spool.append("a", b"3")
+    assert drain(spool) == [("a", b"2", 0), ("a", b"3", 0)]
+
+
+def test_restart_resumes_after_the_last_flush(tmp_path):
+    spool = MessageSpool(str(tmp_path))
+    for i in range(10):
+        spool.append("t", str(i).encode(), 1)
+    drain(spool, 4)
+    spool.close()  # Saves the cursor
+
+    spool = MessageSpool(str(tmp_path))
+    assert len(spool) == 6
+    drain(spool, 2)  # Sent but not flushed (a crash): sent again after the restart
+    spool = MessageSpool(str(tmp_path))
+    assert [payload for _, payload, _ in drain(spool)] == [str(i).encode() for i in range(4, 10)]
+
+
+def test_cut_off_record_is_dropped(tmp_path):
+    spool = MessageSpool(str(tmp_path))
+    spool.append("t", b"kept")
+    spool.close()
+    path = os.path.join(tmp_path, segments(tmp_path)[-1])
+    with open(path, "ab") as f:
+        f.write(pack_record("t", b"torn", 0)[:-2])
+
+    spool = MessageSpool(str(tmp_path))
+    assert len(spool) == 1
+    assert drain(spool) == [("t", b"kept", 0)]
+    spool.append("t", b"after")
+    assert drain(spool) == [("t", b"after", 0)]
+
+
+def test_size_cap_evicts_the_oldest_segments(tmp_path):
+    spool = MessageSpool(str(tmp_path), max_bytes=256 * 1024, segment_bytes=64 * 1024)
+    payload = b"x" * 1000
+    for i in range(1000):
+        spool.append("t", str(i).encode() + payload)
+    assert spool.size <= 256 * 1024
+    assert spool.evicted > 0
+    assert len(spool) + spool.evicted == 1000
+    left = len(spool)
+    sent = drain(spool)
+    assert len(sent) == left
+    first = int(sent[0][1][:-len(payload)])
+    assert first == spool.evicted  # the newest messages survive, in order
+    assert [int(p[:-len(payload)]) for _, p, _ in sent] == list(range(first, 1000))
+
+
+def test_eviction_during_replay_skips_to_the_next_segment(tmp_path):
+    spool = MessageSpool(str(tmp_path), max_bytes=256 * 1024, segment_bytes=64 * 1024)
+    payload = b"y" * 1000
+    for i in range(100):
+        spool.append("t", str(i).encode() + payload)
+    drain(spool, 10)
+    for i in range(100, 1000):
+        spool.append("t", str(i).encode() + payload)
+    sent = [int(p[:-len(payload)]) for _, p, _ in drain(spool)]
+    assert sent == list(range(sent[0], 1000))
+    assert 10 + spool.evicted + len(sent) == 1000
@@ -0,0 +1,69 @@
+"""MQTT topic eşleme testleri: python -m pytest tests/test_mqtt_topics.py"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocols.mqtt_topics import TopicTrie, parse_value, validate_filter  # noqa: E402
+
+
+def make_trie(*filters):
+    trie = TopicTrie()
+    for topic_filter in filters:
+        trie.insert(topic_filter, topic_filter)
+    return trie
+
+
+def matches(trie, topic):
+    return sorted(trie.match(topic))
+
+
+def test_exact_and_single_level_wildcards():
+    trie = make_trie("a/b/c", "a/+/c", "+/+/+", "a/b")
+    assert matches(trie, "a/b/c") == [("+/+/+", ("a", "b", "c")), ("a/+/c", ("b",)), ("a/b/c", ())]
+    assert matches(trie, "a/x/c") == [("+/+/+", ("a", "x", "c")), ("a/+/c", ("x",))]
+    assert matches(trie, "a/b") == [("a/b", ())]
+    assert matches(trie, "a/b/c/d") == []
+
+
+def test_multi_level_wildcard():
+    trie = make_trie("a/#", "#", "a/+/#")
+    assert matches(trie, "a/b/c") == [("#", ("a/b/c",)), ("a/#", ("b/c",)), ("a/+/#", ("b", "c"))]
+    # "a/#" also matches the parent level itself
+    assert matches(trie, "a") == [("#", ("a",)), ("a/#", ("",))]
+    assert matches(trie, "b") == [("#", ("b",))]
+
+
+def test_empty_levels_are_levels():
+    trie = make_trie("a/+/c", "+")
+    assert matches(trie, "a//c") == [("a/+/c", ("",))]
+    assert matches(trie, "") == [("+", ("",))]
+
+
+def test_system_topics_are_not_matched_by_leading_wildcards():
+    trie = make_trie("#", "+/broker/load", "$SYS/#")
+    assert matches(trie, "$SYS/broker/load") == [("$SYS/#", ("broker/load",))]
+
+
+def test_several_values_per_filter():
+    trie = TopicTrie()
+    trie.insert("a/+", 1)
+    trie.insert("a/+", 2)
+    assert trie.size == 2
+    assert sorted(trie.match("a/x")) == [(1, ("x",)), (2, ("x",))]
+
+
+@pytest.mark.parametrize("topic_filter", ["", "a/#/b", "a/b+", "a#", "+a/b"])
+def test_invalid_filters(topic_filter):
+    with pytest.raises(ValueError):
+        validate_filter(topic_filter)
+    with pytest.raises(ValueError):
+        TopicTrie().insert(topic_filter, None)
+
+
+def test_parse_value():
+    assert parse_value(" 42 ") == 42
+    assert parse_value("12.5") == 12.5
+    assert parse_value("on") == "on"
@@ -0,0 +1,89 @@
+"""S7 okuma planlayıcısı testleri: python -m pytest tests/test_s7_planner.py"""
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocols.s7_planner import (S7_MAX_VARS, S7_MULTI_REQUEST_ITEM, S7_MULTI_REQUEST_OVERHEAD,  # noqa: E402
+                                  S7_MULTI_RESPONSE_ITEM, S7_MULTI_RESPONSE_OVERHEAD, ReadBlock, S7TagPlan,
+                                  pack_requests, parse_address, plan_area_blocks)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("DB10.DBD4", ("DB", 10, 4, 0, "DB10.DBD4")),
+    ("DB10.DBX4.3", ("DB", 10, 4, 3, "DB10.DBX4.3")),
+    ("db1.dbb2", ("DB", 1, 2, 0, "DB1.DBB2")),
+    ("DB10.4.2", ("DB", 10, 4, 2, "DB10.4.2")),
+    ("M20.3", ("M", 0, 20, 3, "M20.3")),
+    ("MW20", ("M", 0, 20, 0, "MW20")),
+    ("IW64", ("I", 0, 64, 0, "IW64")),
+    ("Q0.1", ("Q", 0, 0, 1, "Q0.1")),
+    (" ix0.7 ", ("I", 0, 0, 7, "IX0.7")),
+])
+def test_valid_addresses(text, expected):
+    assert parse_address(text) == expected
+
+
+@pytest.mark.parametrize("text", ["DB10.DBW4.3", "DB1.DBX4", "DB1.DBB4.1", "MX20", "MW20.1", "DB1.DBX4.8",
+                                  "T5", "DB.DBW4", "DB1.DBQ4", ""])
+def test_invalid_addresses(text):
+    with pytest.raises(ValueError):
+        parse_address(text)
+
+
+def test_plain_offsets_use_the_default_db():
+    assert parse_address("8.3", default_db=5) == ("DB", 5, 8, 3, "DB5.8.3")
+    with pytest.raises(ValueError):
+        parse_address("8")
+
+
+def test_blocks_are_planned_per_area_and_db():
+    addresses = [("DB", 1, 0, 4), ("DB", 1, 4, 2), ("DB", 2, 0, 4), ("M", 0, 10, 1), ("DB", 1, 20, 4)]
+    blocks = sorted((b.area, b.db_number, b.start, b.size, sorted(b.members))
+                    for b in plan_area_blocks(addresses, max_block=100, gap=0))
+    assert blocks == [("DB", 1, 0, 6, [0, 1]), ("DB", 1, 20, 4, [4]), ("DB", 2, 0, 4, [2]), ("M", 0, 10, 1, [3])]
+    assert len(plan_area_blocks(addresses, max_block=100, gap=14)) == 3  # DB1 0..24 merged
+
+
+def request_sizes(request):
+    sent = S7_MULTI_REQUEST_OVERHEAD + S7_MULTI_REQUEST_ITEM * len(request)
+    received = S7_MULTI_RESPONSE_OVERHEAD + sum(S7_MULTI_RESPONSE_ITEM + b.size + (b.size & 1) for b in request)
+    return sent, received
+
+
+def test_requests_respect_the_variable_limit():
+    blocks = [ReadBlock(i * 10, 1) for i in range(45)]
+    requests = pack_requests(blocks, 960)
+    assert [len(r) for r in requests] == [S7_MAX_VARS, S7_MAX_VARS, 5]
+    assert [b for r in requests for b in r] == blocks
+
+
+@pytest.mark.parametrize("pdu", [240, 480, 960])
+def test_requests_fit_the_pdu(pdu):
+    blocks = [ReadBlock(i * 100, size) for i, size in enumerate([3, 50, 17, 90, 1, 64, 33, 120, 8, 41])]
+    requests = pack_requests(blocks, pdu)
+    for request in requests:
+        sent, received = request_sizes(request)
+        assert sent <= pdu and received <= pdu
+    assert [b for r in requests for b in r] == blocks
+
+
+def test_oversized_block_gets_a_request_of_its_own():
+    blocks = [ReadBlock(0, 10), ReadBlock(100, 500), ReadBlock(1000, 10)]
+    assert [len(r) for r in pack_requests(blocks, 240)] == [1, 1, 1]
+
+
+def test_plan_decodes_tags_from_their_blocks():
+    definitions = [(0, "DB1.DBD0", "Real", ""), (1, "DB1.DBX4.2", "Bool", ""), (2, "DB1.DBW6", "Int", ""),
+                   (3, "DB1.DBW4.1", "Int", ""), (4, "MW0", "Word", "")]
+    plan = S7TagPlan(definitions, pdu_length=240, gap=1)
+    assert plan.invalid_rows == [3]
+    assert len(plan.requests) == 1 and len(plan.blocks) == 2
+    db_data = struct.pack(">fBxh", 2.5, 0b100, -7)
+    buffers = [db_data if block.area == "DB" else b"\x12\x34" for block in plan.requests[0]]
+    assert dict(plan.decode(plan.requests[0], buffers)) == {0: 2.5, 1: True, 2: -7, 3: 0x1234}
+    failed = [None if block.area == "M" else data for block, data in zip(plan.requests[0], buffers)]
+    assert dict(plan.decode(plan.requests[0], failed))[3] is None
@@ -0,0 +1,39 @@
+"""Sparkplug B çözücü testleri: python -m pytest tests/test_sparkplug.py"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocols import sparkplug  # noqa: E402
+from protocols.sparkplug import SparkplugDecoder, encode_metric, encode_payload  # noqa: E402
+
+INT32_ARRAY = 24
+
+
+def truncated_array_metric(name, alias):
+    """Int32Array metric whose 7-byte value is not a whole number of elements."""
+    return (sparkplug._length_field(1, name.encode())
+            + sparkplug._key(2, sparkplug._VARINT) + sparkplug._varint(alias)
+            + sparkplug._key(4, sparkplug._VARINT) + sparkplug._varint(INT32_ARRAY)
+            + sparkplug._length_field(16, bytes([1, 0, 0, 0, 2, 0, 0])))
+
+
+def test_array_round_trip():
+    payload = encode_payload([encode_metric("arr", 1, INT32_ARRAY, [1, -2, 3])], seq=0)
+    _, samples, _ = SparkplugDecoder().decode("spBv1.0/g/NBIRTH/n", payload)
+    assert samples == [("g/n/arr", [1, -2, 3])]
+
+
+def test_truncated_array_metric():
+    payload = encode_payload([truncated_array_metric("arr", 1), encode_metric("t", 2, sparkplug.FLOAT, 1.5)],
+                             seq=0)
+    _, samples, _ = SparkplugDecoder().decode("spBv1.0/g/NBIRTH/n", payload)
+    assert samples == [("g/n/arr", [1]), ("g/n/t", 1.5)]
+
+
+def test_invalid_metric_raises_value_error():
+    # Metric field with wire type 7, which does not exist
+    with pytest.raises(ValueError):
+        SparkplugDecoder().decode("spBv1.0/g/NBIRTH/n", encode_payload([b"\x0f"], seq=0))